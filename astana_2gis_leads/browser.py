@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+# Что не нужно для сбора ссылок и контактов: картинки, шрифты, тайлы карты и счётчики.
+# Шаблоны в формате CDP Network.setBlockedURLs ("*" — любая подстрока).
+BLOCKED_URL_PATTERNS = [
+    # картинки
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    # шрифты
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # тайлы и растры карты 2GIS
+    "*tile*.maps.2gis.com*", "*.maps.2gis.com/tiles*", "*raster*.2gis.com*",
+    # аналитика и трекеры
+    "*google-analytics.com*", "*googletagmanager.com*", "*mc.yandex.ru*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*top-fwz1.mail.ru*", "*counter.2gis.ru*", "*stat.2gis.ru*",
+]
+
+
+def block_resources_in_tab(driver) -> None:
+    """
+    Включить блокировку BLOCKED_URL_PATTERNS в текущей вкладке.
+    CDP-команды chromedriver действуют на текущую вкладку, поэтому для новых вкладок вызов нужно повторять.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+
+def make_chrome_driver(
+    headless: bool = False,
+    eager: bool = False,
+    block_resources: bool = False,
+    disk_cache_dir: str | Path | None = None,
+    perf_log: bool = False,
+    window_size: tuple[int, int] = (1920, 1080),
+):
+    """
+    Общая фабрика Chrome для run_batch и run_selenium_list:
+    - headless: без окна (размер окна задаётся явно — выдача 2GIS зависит от ширины)
+    - eager: pageLoadStrategy=eager — driver.get возвращается после DOMContentLoaded, не дожидаясь картинок
+    - block_resources: блокировка BLOCKED_URL_PATTERNS на уровне CDP (в стартовой вкладке)
+      плюс запрет картинок в профиле — он действует и на вкладки, открытые позже
+    - disk_cache_dir: HTTP-кэш Chrome, который переживает перезапуски (статика 2GIS не качается заново)
+    - perf_log: performance-лог (события Network.*) — для замеров трафика
+    По умолчанию — прежний профиль: обычное развёрнутое окно.
+    """
+    options = Options()
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+    else:
+        options.add_argument("--start-maximized")
+    if eager:
+        options.page_load_strategy = "eager"
+    if disk_cache_dir is not None:
+        cache_dir = Path(disk_cache_dir).resolve()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        options.add_argument(f"--disk-cache-dir={cache_dir}")
+    if perf_log:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if block_resources:
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    driver = webdriver.Chrome(options=options)
+
+    if block_resources:
+        block_resources_in_tab(driver)
+
+    return driver
@@ -0,0 +1,270 @@
+import asyncio
+import itertools
+import json
+import threading
+
+import requests
+from selenium.common.exceptions import TimeoutException
+
+from astana_2gis_leads.browser import BLOCKED_URL_PATTERNS
+from astana_2gis_leads.deadline import BudgetExhausted, Deadline
+from astana_2gis_leads.metrics import METRICS
+from astana_2gis_leads.two_gis_lead_collector import CLICK_CAPTURE_JS, LINKS_SNAPSHOT_JS
+
+try:
+    import websockets
+except ImportError:  # CDP-бэкенд опционален, Selenium-путь работает без websockets
+    websockets = None
+
+
+class CDPError(RuntimeError):
+    """Ошибка, которую вернул DevTools (или оборванное соединение)."""
+
+
+def browser_ws_url(driver) -> str:
+    """WebSocket браузера, которым управляет chromedriver (второй CDP-клиент к тому же Chrome)."""
+    address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+    return requests.get(f"http://{address}/json/version", timeout=5).json()["webSocketDebuggerUrl"]
+
+
+def _as_function(js_body: str, *args) -> str:
+    # скрипты сборщика написаны для execute_script (тело функции с return и arguments[i])
+    return f"(function(){{{js_body}}}).apply(null, {json.dumps(list(args), ensure_ascii=False)})"
+
+
+class CDPConnection:
+    """
+    Одно WebSocket-соединение с браузером; вкладки — flatten-сессии (sessionId в каждом сообщении),
+    поэтому команды разных вкладок идут параллельно по одному сокету.
+    """
+
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader: asyncio.Task | None = None
+
+    async def connect(self) -> None:
+        if websockets is None:
+            raise RuntimeError("Для CDP-бэкенда нужен websockets: pip install websockets")
+        self._ws = await websockets.connect(self.ws_url, max_size=None)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        try:
+            async for raw in self._ws:
+                msg = json.loads(raw)
+                fut = self._pending.pop(msg.get("id"), None)  # события (без id) не нужны — готовность опрашиваем
+                if fut is None or fut.done():
+                    continue
+                if "error" in msg:
+                    fut.set_exception(CDPError(msg["error"].get("message", "CDP error")))
+                else:
+                    fut.set_result(msg.get("result", {}))
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(CDPError("CDP-соединение закрыто"))
+            self._pending.clear()
+
+    async def send(self, method: str, params: dict | None = None, session_id: str | None = None) -> dict:
+        msg_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = fut
+        msg = {"id": msg_id, "method": method, "params": params or {}}
+        if session_id is not None:
+            msg["sessionId"] = session_id
+        await self._ws.send(json.dumps(msg))
+        return await fut
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await self._reader
+
+
+class CDPTab:
+    """Вкладка карточек фирм: своя target + сессия на общем соединении."""
+
+    def __init__(self, conn: CDPConnection, target_id: str, session_id: str):
+        self.conn = conn
+        self.target_id = target_id
+        self.session_id = session_id
+
+    @classmethod
+    async def open(cls, conn: CDPConnection, block_resources: bool = False) -> "CDPTab":
+        target = await conn.send("Target.createTarget", {"url": "about:blank"})
+        attached = await conn.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        tab = cls(conn, target["targetId"], attached["sessionId"])
+        if block_resources:
+            await tab.send("Network.enable")
+            await tab.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        return tab
+
+    async def send(self, method: str, params: dict | None = None) -> dict:
+        return await self.conn.send(method, params, self.session_id)
+
+    async def evaluate(self, expression: str):
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        if "exceptionDetails" in result:
+            raise CDPError(result["exceptionDetails"].get("text", "JS exception"))
+        return result.get("result", {}).get("value")
+
+    async def wait_for(self, expression: str, timeout: float, interval: float = 0.1) -> bool:
+        """Опрос JS-условия до timeout. Пока идёт навигация, контекст может пропадать — это не ошибка."""
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        while True:
+            try:
+                if await self.evaluate(expression):
+                    return True
+            except CDPError:
+                pass
+            if loop.time() >= end:
+                return False
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        await self.conn.send("Target.closeTarget", {"targetId": self.target_id})
+
+
+class CDPEnrichmentEngine:
+    """
+    Асинхронный бэкенд обогащения: один Chrome, K вкладок карточек, которые грузятся параллельно.
+    Логика извлечения — та же, что у TwoGisLeadCollector в режиме перехвата (intercept_popups):
+    снимок ссылок, выбор сайта/контакта, клики с перехватом window.open только для недостающего.
+    Кэш обогащения, бюджет firm_budget и статусы enrich_status — общие с Selenium-путём.
+    """
+
+    def __init__(self, collector, ws_url: str, tabs: int = 4, block_resources: bool = False,
+                 page_timeout: float = 12):
+        if tabs < 1:
+            raise ValueError("tabs должно быть >= 1")
+        self.collector = collector
+        self.ws_url = ws_url
+        self.tabs = tabs
+        self.block_resources = block_resources
+        self.page_timeout = page_timeout
+        self._conn: CDPConnection | None = None
+        self._idle: asyncio.Queue | None = None
+        self._all_tabs: list[CDPTab] = []
+
+    async def start(self) -> None:
+        self._conn = CDPConnection(self.ws_url)
+        await self._conn.connect()
+        self._all_tabs = list(await asyncio.gather(
+            *(CDPTab.open(self._conn, self.block_resources) for _ in range(self.tabs))
+        ))
+        self._idle = asyncio.Queue()
+        for tab in self._all_tabs:
+            self._idle.put_nowait(tab)
+
+    async def close(self) -> None:
+        for tab in self._all_tabs:
+            try:
+                await tab.close()
+            except CDPError:
+                pass
+        self._all_tabs = []
+        if self._conn is not None:
+            await self._conn.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def enrich(self, firm_id: str, force_refresh: bool = False) -> dict:
+        """Аналог collector.enrich_firm: ждёт свободную вкладку, остальные вкладки в это время работают."""
+        # кэш — синхронный SQLite: в пуле потоков, чтобы не стоял цикл событий всех вкладок
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.collector.cached_result, firm_id, force_refresh)
+        if cached is not None:
+            return cached
+        tab = await self._idle.get()
+        try:
+            with METRICS.timer("cdp_enrich"):
+                return await self._enrich_in_tab(tab, firm_id)
+        finally:
+            self._idle.put_nowait(tab)
+
+    async def enrich_many(self, firm_ids: list[str], force_refresh: bool = False) -> list[dict]:
+        """Результаты в порядке firm_ids; одновременно в работе не больше tabs фирм."""
+        return list(await asyncio.gather(*(self.enrich(fid, force_refresh) for fid in firm_ids)))
+
+    async def _enrich_in_tab(self, tab: CDPTab, firm_id: str) -> dict:
+        collector = self.collector
+        deadline = Deadline(collector.firm_budget)
+        primary_contact, website_url = "", None
+        status = None
+        try:
+            await tab.send("Page.navigate", {"url": f"{collector.base_url}/firm/{firm_id}"})
+            ready_js = f"location.href.includes({json.dumps(str(firm_id))}) && document.readyState === 'complete'"
+            if not await tab.wait_for(ready_js, deadline.timeout(self.page_timeout)):
+                if deadline.expired():
+                    raise BudgetExhausted
+                METRICS.inc("timeouts", stage="cdp_navigation")
+                raise TimeoutException(f"Карточка {firm_id} не загрузилась за {self.page_timeout} с")
+
+            snapshot = await tab.evaluate(_as_function(LINKS_SNAPSHOT_JS)) or {"hrefs": [], "labels": []}
+            website_url = collector._pick_website(snapshot.get("hrefs", []))
+            primary_contact = collector._pick_primary(snapshot.get("hrefs", []))
+
+            groups = collector._intercept_groups(snapshot, website_url, primary_contact)
+            if groups:
+                METRICS.inc("capture_clicks", n=len(groups))
+                timeout = deadline.timeout(collector.capture_timeout)
+                clicked = await tab.evaluate(_as_function(CLICK_CAPTURE_JS, [list(w) for w in groups]))
+                if clicked:
+                    if not await tab.wait_for(f"(window.__twogis_opened || []).length >= {int(clicked)}", timeout):
+                        METRICS.inc("timeouts", stage="capture_click")
+                    urls = await tab.evaluate("window.__twogis_opened || []") or []
+                    website_url = website_url or collector._pick_website(urls)
+                    primary_contact = primary_contact or collector._pick_primary(urls)
+        except BudgetExhausted:
+            status = "budget_exhausted"
+        return await asyncio.get_running_loop().run_in_executor(
+            None, collector.record_result, firm_id, primary_contact, website_url, status
+        )
+
+
+class CDPEnrichmentPool:
+    """
+    Синхронный фасад CDP-бэкенда с интерфейсом EnrichmentPool (submit -> Future, close):
+    цикл asyncio живёт в отдельном потоке, run_batch листает выдачу, пока вкладки обогащают фирмы.
+    """
+
+    def __init__(self, engine: CDPEnrichmentEngine):
+        self.engine = engine
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cdp-engine", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(engine.start(), self._loop).result()
+
+    @classmethod
+    def from_driver(cls, collector, driver, tabs: int = 4, **kwargs) -> "CDPEnrichmentPool":
+        """Подключиться к Chrome уже запущенного Selenium-драйвера (без второго браузера)."""
+        return cls(CDPEnrichmentEngine(collector, browser_ws_url(driver), tabs, **kwargs))
+
+    def submit(self, firm_id: str):
+        return asyncio.run_coroutine_threadsafe(self.engine.enrich(firm_id), self._loop)
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.engine.close(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
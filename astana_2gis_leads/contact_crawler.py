@@ -0,0 +1,375 @@
+import asyncio
+import html
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from astana_2gis_leads.metrics import METRICS
+from astana_2gis_leads.site_check import HEADERS, MAX_REDIRECTS, domain_of
+
+# Контакты меняются редко — повторный прогон неделю берёт их из кэша
+DEFAULT_TTL = 7 * 24 * 3600
+# Страницы сайта, где обычно лежат контакты (главная — всегда первой)
+CONTACT_PATHS = ("/", "/contacts", "/about")
+# Ссылки с главной, похожие на страницу контактов: их берём раньше угаданных путей
+CONTACT_LINK_RE = re.compile(r"contact|kontakt|контакт|about|o-nas|o_nas|о-нас|о нас", re.IGNORECASE)
+MAX_PAGE_BYTES = 512 * 1024
+ROBOTS_AGENT = "*"
+# Общие хосты соцсетей, маркетплейсов и конструкторов «ссылка в профиле»: страница фирмы там — лишь путь,
+# а главная и /contacts — контакты самой платформы. Такие сайты не обходим (поддомены — тоже платформа)
+PLATFORM_HOSTS = (
+    "instagram.com", "facebook.com", "vk.com", "ok.ru", "tiktok.com", "youtube.com", "twitter.com", "x.com",
+    "wa.me", "whatsapp.com", "t.me", "telegram.me", "linktr.ee", "taplink.cc", "taplink.ws", "taplink.at",
+    "kaspi.kz", "satu.kz", "olx.kz", "market.kz", "wildberries.ru", "wildberries.kz", "ozon.ru", "ozon.kz",
+    "2gis.kz", "2gis.ru", "2gis.com", "google.com", "yandex.kz", "yandex.ru", "hh.kz",
+)
+
+EMAIL_RE = re.compile(r"(?<![\w.+-])[\w.+-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{2,24}(?![\w-])", re.IGNORECASE)
+# «Почты» из имён файлов ретина-картинок и сборок (logo@2x.png, lib@1.2.3.js)
+EMAIL_JUNK_RE = re.compile(r"\.(?:png|jpe?g|gif|svg|webp|js|css)$|@\d+x\.|^(?:example|email|name|user)@", re.IGNORECASE)
+# Номер с кодом страны 7 / 8 и ещё 10 цифр через пробелы, дефисы и скобки
+PHONE_RE = re.compile(r"(?<![\d+])(?:\+\s*7|8|7)[\s\-()]*\d(?:[\s\-()]*\d){9}(?!\d)")
+HREF_RE = re.compile(r"""href\s*=\s*["']([^"'#]+)""", re.IGNORECASE)
+TAG_RE = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+
+def normalize_kz_phone(raw: str) -> str | None:
+    """
+    Номер Казахстана в E.164: "+7 (701) 123-45-67", "8 701 1234567", "tel:87172123456" -> "+77011234567".
+    После кода страны у казахстанских номеров идёт 7 (мобильные 70x/747/77x, городские 7xxx);
+    российские (+7 9xx, +7 495 ...) и всё, что не складывается в 11 цифр, — None.
+    """
+    digits = re.sub(r"\D", "", raw)
+    if len(digits) != 11 or digits[0] not in "78" or digits[1] != "7":
+        return None
+    return "+7" + digits[1:]
+
+
+def extract_contacts(page: str) -> tuple[list[str], list[str]]:
+    """(emails, phones) страницы: из mailto:/tel: ссылок и из видимого текста, без дублей, в порядке появления."""
+    page = html.unescape(page)
+    text = TAG_RE.sub(" ", page)
+    emails: dict[str, None] = {}
+    phones: dict[str, None] = {}
+    for href in HREF_RE.findall(page):
+        if href.lower().startswith("mailto:"):
+            for m in EMAIL_RE.finditer(href[7:].split("?")[0]):
+                emails.setdefault(m.group(0).lower())
+        elif href.lower().startswith("tel:"):
+            phone = normalize_kz_phone(href[4:])
+            if phone:
+                phones.setdefault(phone)
+    for m in EMAIL_RE.finditer(text):
+        emails.setdefault(m.group(0).lower())
+    for m in PHONE_RE.finditer(text):
+        phone = normalize_kz_phone(m.group(0))
+        if phone:
+            phones.setdefault(phone)
+    return [e for e in emails if not EMAIL_JUNK_RE.search(e)], list(phones)
+
+
+def is_platform(domain: str) -> bool:
+    """Домен — общая платформа (соцсеть, маркетплейс, taplink и т.п.), а не собственный сайт фирмы."""
+    return any(domain == h or domain.endswith("." + h) for h in PLATFORM_HOSTS)
+
+
+def contact_links(base_url: str, page: str) -> list[str]:
+    """Ссылки главной на страницы контактов / «о нас» того же домена."""
+    domain = domain_of(base_url)
+    links: dict[str, None] = {}
+    for href in HREF_RE.findall(page):
+        url = urljoin(base_url, html.unescape(href.strip()))
+        if url.startswith("http") and domain_of(url) == domain and CONTACT_LINK_RE.search(urlsplit(url).path):
+            links.setdefault(url.split("#")[0])
+    return list(links)
+
+
+class CrawlCache:
+    """Дисковый кэш найденных контактов по домену (SQLite), по образцу EnrichmentCache / SiteCheckCache."""
+
+    def __init__(self, path: str | Path, ttl: float | None = DEFAULT_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS site_contacts (
+                domain TEXT PRIMARY KEY,
+                emails TEXT NOT NULL,
+                phones TEXT NOT NULL,
+                pages INTEGER NOT NULL,
+                error TEXT,
+                crawled_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, domain: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT emails, phones, pages, error, crawled_at FROM site_contacts WHERE domain = ?", (domain,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and time.time() - row[4] > self.ttl):
+            return None
+        return {"domain": domain, "emails": json.loads(row[0]), "phones": json.loads(row[1]), "pages": row[2],
+                "error": row[3]}
+
+    def put(self, result: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO site_contacts (domain, emails, phones, pages, error, crawled_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (result["domain"], json.dumps(result["emails"]), json.dumps(result["phones"]), result["pages"],
+                 result["error"], time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ContactCrawler:
+    """
+    Ограниченный обход сайтов фирм ради почты и телефонов (asyncio):
+    - на сайт не больше max_pages страниц: главная, ссылки «контакты / о нас» с неё, затем /contacts и /about
+      (угаданные пути пробуются и тогда, когда главная ответила 4xx/5xx)
+    - одновременно не больше concurrency запросов всего и per_domain на один домен
+    - robots.txt (urllib.robotparser) читается один раз на домен; запрещённые страницы не запрашиваются,
+      Crawl-delay выдерживается между запросами к домену
+    - редиректы проходятся вручную: каждый шаг — через robots.txt, Crawl-delay и per_domain;
+      на другой домен не переходим (главная с таким редиректом — ошибка, контактов нет)
+    - общие платформы (PLATFORM_HOSTS: соцсети, маркетплейсы, taplink) не обходятся: их контакты — не фирмы
+    - результат по домену кэшируется (в памяти и в CrawlCache): повторный прогон сайт не обходит;
+      результаты с ошибкой (сеть, HTTP-ошибка, чужой домен) на диск не пишутся — следующий прогон попробует снова
+    HTTP — пул keep-alive соединений requests в собственном пуле потоков на concurrency потоков
+    (run_in_executor; стандартный пул asyncio.to_thread меньше и урезал бы параллелизм):
+    отдельного async-клиента у проекта нет.
+    Результат: {"domain", "emails": [...], "phones": [...] (E.164, +77XXXXXXXXX), "pages", "error"}.
+    """
+
+    def __init__(self, max_pages: int = 3, concurrency: int = 32, per_domain: int = 2,
+                 timeout: tuple[float, float] = (3.05, 8.0), cache: CrawlCache | None = None,
+                 respect_robots: bool = True, session: requests.Session | None = None):
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.timeout = timeout
+        self.cache = cache
+        self.respect_robots = respect_robots
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._results: dict[str, dict] = {}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="contact-crawl")
+
+    async def _in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get(self, url: str) -> tuple[int, str | None, str]:
+        """(status, Location редиректа или None, html) — один блокирующий запрос без редиректов, в потоке."""
+        with self.session.get(url, timeout=self.timeout, stream=True, allow_redirects=False) as resp:
+            if resp.is_redirect:
+                return resp.status_code, resp.headers.get("Location"), ""
+            if "html" not in resp.headers.get("Content-Type", "text/html"):
+                return resp.status_code, None, ""
+            body = resp.raw.read(MAX_PAGE_BYTES, decode_content=True)
+            return resp.status_code, None, body.decode(resp.encoding or "utf-8", "replace")
+
+    def _get_robots(self, url: str) -> str | None:
+        with self.session.get(url, timeout=self.timeout) as resp:
+            return resp.text if resp.status_code == 200 else None
+
+    async def _robots(self, root: str, global_slots: asyncio.Semaphore) -> RobotFileParser | None:
+        """
+        Правила robots.txt домена; None — ограничений нет (файла нет, не 200).
+        Сетевая ошибка (requests.RequestException) пробрасывается: без известных правил сайт не обходим.
+        """
+        async with global_slots:
+            text = await self._in_thread(self._get_robots, urljoin(root, "/robots.txt"))
+        if text is None:
+            return None
+        rules = RobotFileParser()
+        rules.parse(text.splitlines())
+        return rules
+
+    async def _fetch(self, url: str, domain: str, global_slots: asyncio.Semaphore, domain_slots: asyncio.Semaphore,
+                     delay: float, last: list[float], allowed) -> tuple[int, str, str] | None:
+        """
+        (status, конечный URL, html) страницы сайта. Редиректы — вручную: каждый шаг проверяется allowed
+        (robots.txt) и идёт через Crawl-delay и per_domain. Редирект на другой домен не выполняется:
+        возвращается (status, URL цели, ""). None — шаг запрещён или слишком много редиректов;
+        сеть / таймаут — requests.RequestException.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            if not allowed(url):
+                return None
+            async with global_slots, domain_slots:
+                wait = last[0] + delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)  # Crawl-delay из robots.txt
+                last[0] = time.monotonic()
+                try:
+                    status, location, page = await self._in_thread(self._get, url)
+                except requests.RequestException:
+                    METRICS.inc("contact_crawl", result="page_error")
+                    raise
+            if location is None:
+                return status, url, page
+            url = urljoin(url, location)
+            if domain_of(url) != domain:
+                METRICS.inc("contact_crawl", result="cross_domain_redirect")
+                return status, url, ""
+        METRICS.inc("contact_crawl", result="page_error")  # больше MAX_REDIRECTS редиректов
+        return None
+
+    async def crawl_site(self, url: str, global_slots: asyncio.Semaphore) -> dict:
+        domain = domain_of(url)
+        cached = self._results.get(domain) or (self.cache.get(domain) if self.cache is not None else None)
+        if cached is not None:
+            METRICS.inc("contact_crawl", result="cache_hit")
+            self._results[domain] = cached
+            return cached
+        if is_platform(domain):
+            # страница фирмы на общей платформе: главная и /contacts дали бы контакты самой платформы
+            METRICS.inc("contact_crawl", result="platform")
+            return self._store({"domain": domain, "emails": [], "phones": [], "pages": 0,
+                                "error": "платформа, не сайт фирмы"})
+
+        split = urlsplit(url)
+        root = f"{split.scheme}://{split.netloc}"
+        try:
+            robots = await self._robots(root, global_slots) if self.respect_robots else None
+        except requests.RequestException:
+            METRICS.inc("contact_crawl", result="robots_error")
+            return self._store({"domain": domain, "emails": [], "phones": [], "pages": 0,
+                                "error": "robots.txt недоступен"})
+        delay = min(float(robots.crawl_delay(ROBOTS_AGENT) or 0), 10.0) if robots is not None else 0.0
+        # с Crawl-delay запросы к домену идут строго по одному
+        domain_slots = asyncio.Semaphore(1 if delay else self.per_domain)
+        last = [0.0]
+
+        def allowed(page_url: str) -> bool:
+            if robots is not None and not robots.can_fetch(ROBOTS_AGENT, page_url):
+                METRICS.inc("contact_crawl", result="robots_disallowed")
+                return False
+            return True
+
+        emails: dict[str, None] = {}
+        phones: dict[str, None] = {}
+        pages = 0
+        error = None
+
+        def collect(page: str) -> None:
+            found_emails, found_phones = extract_contacts(page)
+            emails.update(dict.fromkeys(found_emails))
+            phones.update(dict.fromkeys(found_phones))
+
+        # главная — первой: с неё берутся ссылки на контакты
+        home = root + "/"
+        try:
+            fetched = await self._fetch(home, domain, global_slots, domain_slots, delay, last, allowed)
+        except requests.RequestException:
+            fetched = None
+        candidates: dict[str, None] = {}
+        home_error = None
+        loaded = 0  # страниц, ответивших не ошибкой HTTP
+        if fetched is None:
+            error = "главная недоступна"
+        elif domain_of(fetched[1]) != domain:
+            # сайт уводит на чужой домен (соцсеть, маркетплейс, другой сайт) — его контакты не этой фирмы
+            error = f"редирект на {domain_of(fetched[1])}"
+        else:
+            status, final_url, page = fetched
+            pages += 1
+            if status < 400:
+                loaded += 1
+                collect(page)
+                candidates.update(dict.fromkeys(contact_links(final_url, page)))
+                root = "{0.scheme}://{0.netloc}".format(urlsplit(final_url))  # http -> https и www после редиректа
+            else:
+                home_error = f"HTTP {status}"  # без главной контакты ещё могут найтись на /contacts и /about
+        candidates.update(dict.fromkeys(root + p for p in CONTACT_PATHS[1:]))
+        candidates.pop(home, None)
+        candidates.pop(root + "/", None)
+
+        # остальные страницы — параллельно, в пределах per_domain и бюджета страниц
+        targets = [u for u in candidates if allowed(u)][:max(self.max_pages - 1, 0)] if error is None else []
+        failed = 0
+        for fetched in await asyncio.gather(*(self._fetch(u, domain, global_slots, domain_slots, delay, last, allowed)
+                                              for u in targets), return_exceptions=True):
+            if isinstance(fetched, requests.RequestException):
+                failed += 1
+            elif isinstance(fetched, BaseException):
+                raise fetched
+            elif fetched is not None and domain_of(fetched[1]) == domain:
+                pages += 1
+                if fetched[0] < 400:
+                    loaded += 1
+                    collect(fetched[2])
+        if home_error is not None and not loaded:
+            error = home_error  # ни одна страница сайта не открылась
+        if failed:
+            error = f"не загрузились страницы: {failed}"  # найденное отдаём, но неполный результат не кэшируем
+
+        METRICS.inc("contact_crawl", result="found" if emails or phones else "empty")
+        return self._store({"domain": domain, "emails": list(emails), "phones": list(phones), "pages": pages,
+                            "error": error})
+
+    def _store(self, result: dict) -> dict:
+        """Результат сайта — в память; в CrawlCache только без ошибки: сбой может быть временным."""
+        self._results[result["domain"]] = result
+        if self.cache is not None and result["error"] is None:
+            self.cache.put(result)
+        return result
+
+    async def crawl_many_async(self, urls) -> dict[str, dict]:
+        urls = [u for u in dict.fromkeys(urls) if u and domain_of(u)]
+        by_domain: dict[str, str] = {}
+        for url in urls:
+            by_domain.setdefault(domain_of(url), url)
+        global_slots = asyncio.Semaphore(self.concurrency)
+        with METRICS.timer("contact_crawl"):
+            results = await asyncio.gather(*(self.crawl_site(u, global_slots) for u in by_domain.values()))
+        by_domain_result = dict(zip(by_domain, results))
+        return {url: by_domain_result[domain_of(url)] for url in urls}
+
+    def crawl_many(self, urls) -> dict[str, dict]:
+        """Обойти сайты пачкой: url -> контакты. Один обход на домен, разные URL домена получают общий результат."""
+        return asyncio.run(self.crawl_many_async(list(urls)))
+
+    def result_for(self, url: str | None) -> dict | None:
+        """Уже найденные контакты сайта (память или кэш), без запросов в сеть."""
+        domain = domain_of(url)
+        if not domain:
+            return None
+        return self._results.get(domain) or (self.cache.get(domain) if self.cache is not None else None)
+
+    def annotate(self, row: dict) -> dict:
+        """Дописать в строку лида emails и phones (через "; ") по сайту фирмы (конечный URL, если сайт проверяли)."""
+        result = self.result_for(row.get("website_final") or row.get("website"))
+        if result is not None:
+            row["emails"] = "; ".join(result["emails"])
+            row["phones"] = "; ".join(result["phones"])
+        return row
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
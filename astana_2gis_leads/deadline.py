@@ -0,0 +1,40 @@
+import time
+
+
+class BudgetExhausted(Exception):
+    """Бюджет времени на фирму исчерпан — шаги обогащения прекращаются, возвращается то, что уже найдено."""
+
+
+class Deadline:
+    """
+    Общий бюджет времени на обогащение одной фирмы (все шаги: HTTP, переход, снимок, клики).
+    Каждый WebDriverWait берёт таймаут через timeout(cap): не больше своего обычного cap
+    и не больше остатка бюджета. seconds=None — без бюджета (таймауты как раньше).
+    """
+
+    def __init__(self, seconds: float | None):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = None if seconds is None else self.started + seconds
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def timeout(self, cap: float) -> float:
+        """Таймаут очередного ожидания; BudgetExhausted, если бюджета уже не осталось."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise BudgetExhausted
+        return min(cap, remaining)
+
+    def check(self) -> None:
+        if self.expired():
+            raise BudgetExhausted
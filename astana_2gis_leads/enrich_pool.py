@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class EnrichmentPool:
+    """
+    Пул воркеров обогащения:
+    - у каждого воркера свой драйвер (отдельный Chrome), созданный driver_factory()
+    - firm_id раздаются через общую очередь
+    - результат каждой фирмы (словарь collector.enrich_firm) возвращается через Future, чтобы вызывающий код
+      мог собрать их обратно в исходном порядке строк
+    """
+
+    def __init__(self, collector, driver_factory, workers: int = 2):
+        if workers < 1:
+            raise ValueError("workers должно быть >= 1")
+        self.collector = collector
+        self.driver_factory = driver_factory
+        self._tasks: queue.Queue = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"enrich-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, firm_id: str) -> Future:
+        """Поставить фирму в очередь на обогащение. Future вернёт результат enrich_firm."""
+        fut: Future = Future()
+        self._tasks.put((firm_id, fut))
+        return fut
+
+    def _worker(self):
+        driver = None
+        start_error: Exception | None = None
+        try:
+            driver = self.driver_factory()
+        except Exception as e:
+            # Драйвер не поднялся — задачи этого воркера завершаем с ошибкой, а не вешаем очередь
+            start_error = e
+
+        try:
+            while True:
+                item = self._tasks.get()
+                if item is None:
+                    break
+                firm_id, fut = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                if driver is None:
+                    fut.set_exception(start_error)
+                    continue
+                try:
+                    fut.set_result(self.collector.enrich_firm(driver, firm_id))
+                except Exception as e:
+                    fut.set_exception(e)
+        finally:
+            if driver is not None:
+                driver.quit()
+
+    def close(self):
+        # По одному "стоп-сигналу" на воркера: сначала дорабатываются уже поставленные задачи
+        for _ in self._threads:
+            self._tasks.put(None)
+        for t in self._threads:
+            t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
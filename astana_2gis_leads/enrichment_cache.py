@@ -0,0 +1,208 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from astana_2gis_leads.postprocess import norm_addr
+
+# Сколько живёт запись по умолчанию: контакты фирм меняются редко, неделя — разумный компромисс
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class EnrichmentCache:
+    """
+    Дисковый кэш обогащения по firm_id (SQLite):
+    - хранит primary_contact, website, primary_type и время получения (fetched_at)
+    - записи старше ttl секунд считаются промахом (ttl=None — без срока годности)
+    - считает попадания/промахи (hits / misses)
+    Он же — индекс фирм между запросами и прогонами run_batch:
+    - lookup узнаёт фирму по firm_id или по нормализованному адресу вместе с названием
+      (в ТЦ и бизнес-центрах по одному адресу много разных фирм)
+    - каждое появление фирмы в запросе прогона — тег с источником результата:
+      new — обогащали в этом прогоне, run — уже встречалась в другом запросе этого прогона,
+      prior — известна по прошлым прогонам; report(run_id) — сколько обогащений прогон не делал
+    Одно соединение на процесс, доступ под локом — кэш разделяется воркерами пула.
+    """
+
+    def __init__(self, path: str | Path, ttl: float | None = DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS enrichment (
+                firm_id TEXT PRIMARY KEY,
+                primary_contact TEXT,
+                website TEXT,
+                primary_type TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS firm_queries (
+                firm_id TEXT NOT NULL,
+                query TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                source TEXT NOT NULL,  -- new / run / prior
+                tagged_at REAL NOT NULL,
+                PRIMARY KEY (firm_id, query, run_id)
+            );
+            CREATE INDEX IF NOT EXISTS firm_queries_run ON firm_queries(run_id);
+            """
+        )
+        # кэши, созданные до индекса фирм: колонки адреса и названия добавляются на месте
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(enrichment)")}
+        for column in ("addr_norm", "name"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE enrichment ADD COLUMN {column} TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS enrichment_addr_norm ON enrichment(addr_norm) WHERE addr_norm IS NOT NULL"
+        )
+        self._conn.commit()
+
+    def get(self, firm_id: str) -> dict | None:
+        """Вернуть свежую запись или None (промах / протухла по ttl)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT primary_contact, website, primary_type, fetched_at FROM enrichment WHERE firm_id = ?",
+                (str(firm_id),),
+            ).fetchone()
+            if row is None or (self.ttl is not None and time.time() - row[3] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {
+            "primary_contact": row[0] or "",
+            "website": row[1],
+            "primary_type": row[2] or "none",
+            "fetched_at": row[3],
+        }
+
+    def put(self, firm_id: str, primary_contact: str, website: str | None, primary_type: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO enrichment (firm_id, primary_contact, website, primary_type, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (str(firm_id), primary_contact or "", website, primary_type, time.time()),
+            )
+            self._conn.commit()
+
+    def lookup(self, firm_id: str, address: str | None = None, name: str | None = None) -> dict | None:
+        """
+        Свежий результат фирмы для индекса run_batch: по firm_id, иначе по адресу, если совпадает и название.
+        None — фирма новая или запись устарела по ttl. Счётчики hits/misses не трогает.
+        """
+        addr_key = norm_addr(address or "") or None
+        name_key = norm_addr(name or "") or None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT firm_id, primary_contact, website, primary_type, fetched_at FROM enrichment WHERE firm_id = ?",
+                (str(firm_id),),
+            ).fetchone()
+            if row is None and addr_key is not None and name_key is not None:
+                for candidate in self._conn.execute(
+                    "SELECT firm_id, primary_contact, website, primary_type, fetched_at, name FROM enrichment"
+                    " WHERE addr_norm = ? ORDER BY fetched_at DESC",
+                    (addr_key,),
+                ):
+                    if norm_addr(candidate[5] or "") == name_key:
+                        row = candidate[:5]
+                        break
+        if row is None or (self.ttl is not None and time.time() - row[4] > self.ttl):
+            return None
+        return {
+            "firm_id": row[0],
+            "primary_contact": row[1] or "",
+            "website": row[2],
+            "primary_type": row[3] or "none",
+            "enrich_status": "ok" if row[1] else "no_contact",
+        }
+
+    def seen_in_run(self, firm_id: str, run_id: str) -> bool:
+        """Встречалась ли фирма в другом запросе этого прогона (есть тег с этим run_id)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM firm_queries WHERE firm_id = ? AND run_id = ? LIMIT 1", (str(firm_id), run_id)
+            ).fetchone() is not None
+
+    def tag(self, firm_id: str, query: str, run_id: str, source: str,
+            name: str | None = None, address: str | None = None) -> None:
+        """
+        Отметить появление фирмы в выдаче запроса (повторная отметка того же запроса в прогоне — без изменений).
+        name / address — запоминаются у записи фирмы для lookup по адресу.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO firm_queries (firm_id, query, run_id, source, tagged_at) VALUES (?, ?, ?, ?, ?)",
+                (str(firm_id), query, run_id, source, time.time()),
+            )
+            if address or name:
+                self._conn.execute(
+                    "UPDATE enrichment SET addr_norm = COALESCE(?, addr_norm), name = COALESCE(?, name)"
+                    " WHERE firm_id = ?",
+                    (norm_addr(address or "") or None, name or None, str(firm_id)),
+                )
+
+    def queries_of(self, firm_id: str) -> list[str]:
+        """Все запросы (по всем прогонам), в выдаче которых встречалась фирма, в порядке первого появления."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query FROM firm_queries WHERE firm_id = ? GROUP BY query ORDER BY MIN(tagged_at)",
+                (str(firm_id),),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def report(self, run_id: str) -> dict:
+        """Сколько появлений фирм в прогоне обошлись без обогащения (из этого прогона и из прошлых)."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT source, COUNT(*) FROM firm_queries WHERE run_id = ? GROUP BY source", (run_id,)
+            ).fetchall())
+            firms = self._conn.execute(
+                "SELECT COUNT(DISTINCT firm_id) FROM firm_queries WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            total_firms = self._conn.execute("SELECT COUNT(*) FROM enrichment").fetchone()[0]
+        seen = sum(counts.values())
+        avoided = counts.get("run", 0) + counts.get("prior", 0)
+        return {
+            "run_id": run_id,
+            "appearances": seen,
+            "firms": firms,
+            "enriched": counts.get("new", 0),
+            "avoided_cross_query": counts.get("run", 0),
+            "avoided_prior_runs": counts.get("prior", 0),
+            "avoided": avoided,
+            "avoided_pct": round(100 * avoided / seen, 1) if seen else 0.0,
+            "index_firms": total_firms,
+        }
+
+    def write_report(self, run_id: str, path: str | Path) -> dict:
+        report = self.report(run_id)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return report
+
+    def invalidate(self, firm_id: str | None = None) -> None:
+        """Сбросить одну запись или (firm_id=None) весь кэш."""
+        with self._lock:
+            if firm_id is None:
+                self._conn.execute("DELETE FROM enrichment")
+            else:
+                self._conn.execute("DELETE FROM enrichment WHERE firm_id = ?", (str(firm_id),))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
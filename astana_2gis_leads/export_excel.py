@@ -1,6 +1,17 @@
+from pathlib import Path
 
+import pandas as pd
 
-def save_leads_to_excel(self, leads: list[dict], filename: str = "leads_master.xlsx") -> None:
+from astana_2gis_leads.lead_store import LeadStore
+from astana_2gis_leads.postprocess import enrich_columns
+
+
+def save_leads_to_excel(self, leads: list[dict], filename: str = "leads_master.xlsx", export: bool = True) -> None:
+    """
+    Сохранить пачку лидов в мастер-хранилище (data/<filename>.sqlite) и, если export=True,
+    выгрузить мастер в data/<filename> таблицей Excel.
+    Для частых сохранений пачками — export=False, выгрузка одним вызовом в конце.
+    """
     project_root = Path(__file__).resolve().parent.parent
     data_dir = project_root / "data"
     data_dir.mkdir(exist_ok=True)
@@ -11,46 +22,28 @@ def save_leads_to_excel(self, leads: list[dict], filename: str = "leads_master.x
     #
     # print(leads[0].get("website"), leads[0].get("primary_contact"))
 
-    df_new = pd.DataFrame(leads)
-
-    if not filepath.exists():
-        # первый запуск — только новые данные
-        df_all = df_new.copy()
-    else:
-        # читаем старые, дозаписываем новые со склейкой по строкам -> строки просто идут одна под другой
-        df_old = pd.read_excel(filepath, dtype={"id": str})
-        df_all = pd.concat([df_new, df_old], ignore_index=True)
-
-    # убираем дубли по адресу
-    df_all.drop_duplicates(subset=["address"], inplace=True)
-
-    # ключевой момент: id как строка, чтобы Excel не делал 7E+16 (атрибут 'столбец' редактируется, а не добавляется)
-    # берём существующий столбец id -> приводим тип значений в этом столбце к str -> перезаписываем этот же столбец
-    df_all["id"] = df_all["id"].astype(str)
-    # Сортировка данных во фрейме по запросу и по адресу (а не по времени и источнику добавления)
-    df_all = df_all.sort_values(by=["query", "address"])
-
-    df_all.to_excel(filepath, index=False)
-    wb = load_workbook(filepath)  # Рабочая книга openpyxl - начало пути к переоформлению таблицы в Excel
-    ws = wb.active  # Рабочий лист в таблице openpyxl
-    end_row = ws.max_row  # Посчитать диапазон:  - здесь для а) строк
-    end_col = ws.max_column  # - здесь для б) столбцов
-    # Диапазон таблицы в openpyxl с учётом диапазона строк и столбцов, посчитанных выше
-    ref = f"A1:{chr(64 + end_col)}{end_row}"
-    # Создание таблицы (задаётся отображаемое имя)
-    table = Table(displayName="LeadsTable", ref=ref)
-    # Создание стиля таблицы
-    style = TableStyleInfo(
-        name="TableStyleMedium9",
-        showFirstColumn=False,
-        showLastColumn=False,
-        showRowStripes=True,
-        showColumnStripes=False,
-    )
-
-    table.tableStyleInfo = style
-    ws.add_table(table)
-    # Сохранение оформления таблицы в файл по ранее определённому пути
-    wb.save(filepath)
-
-    print(f"Всего лидов в мастер-файле: {len(df_all)}")
+    # Мастер живёт в SQLite рядом с xlsx: сохранение пачки — upsert по firm_id/адресу,
+    # без перечитывания всего мастер-файла. Excel — только выгрузка из хранилища.
+    store = LeadStore(filepath.with_suffix(".sqlite"))
+    try:
+        if store.count() == 0 and filepath.exists():
+            # первый запуск на старом мастер-файле — переносим его в хранилище один раз
+            store.upsert(pd.read_excel(filepath, dtype={"id": str}).to_dict("records"))
+
+        # новые лиды вытесняют старые с тем же firm_id или адресом;
+        # primary_type и пустые CRM-колонки досчитываются для всей пачки разом
+        if leads:
+            store.upsert(enrich_columns(pd.DataFrame(leads)).to_dict("records"))
+        total = store.count()
+
+        if not export:
+            print(f"Всего лидов в мастер-хранилище: {total}")
+            return
+
+        # потоковая выгрузка, отсортированная по запросу и по адресу, сразу таблицей LeadsTable —
+        # без повторного открытия книги ради оформления
+        store.export_excel(filepath)
+    finally:
+        store.close()
+
+    print(f"Всего лидов в мастер-файле: {total}")
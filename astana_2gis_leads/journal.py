@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class RunJournal:
+    """
+    Write-ahead журнал прогона run_batch (JSONL, одна запись — одна строка):
+    - {"type": "run", ...}                            — метаданные прогона (run_id, run_date)
+    - {"type": "page", "query", "page", "cards"}      — карточки, собранные со страницы выдачи
+    - {"type": "listing_done", "query", "pages"}      — выдача запроса пролистана до конца
+    - {"type": "enriched", "query", "firm_id", ...}   — результат обогащения фирмы
+    - {"type": "query_done", "query"}                 — запрос полностью обработан
+    Каждая запись сразу сбрасывается на диск (flush + fsync), поэтому после падения Chrome
+    или сети --resume <run_id> продолжает с того же места. Оборванная последняя строка пропускается.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta: dict = {}
+        self.pages: dict[str, dict[int, list[dict]]] = {}
+        self.listing_pages: dict[str, int] = {}
+        self.enriched: dict[str, dict] = {}
+        self.done_queries: set[str] = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._load()
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # оборванная запись в момент падения
+                kind = rec.get("type")
+                if kind == "run":
+                    self.meta.update({k: v for k, v in rec.items() if k != "type"})
+                elif kind == "page":
+                    self.pages.setdefault(rec["query"], {})[int(rec["page"])] = rec["cards"]
+                elif kind == "listing_done":
+                    self.listing_pages[rec["query"]] = int(rec["pages"])
+                elif kind == "enriched":
+                    self.enriched[str(rec["firm_id"])] = {
+                        "primary_contact": rec.get("primary_contact") or "",
+                        "website": rec.get("website"),
+                        "primary_type": rec.get("primary_type") or "none",
+                        "enrich_status": rec.get("enrich_status") or "ok",
+                    }
+                elif kind == "query_done":
+                    self.done_queries.add(rec["query"])
+
+    def _write(self, rec: dict) -> None:
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    # --- запись ---
+    def record_run(self, **meta) -> None:
+        self.meta.update(meta)
+        self._write({"type": "run", **meta})
+
+    def record_page(self, query: str, page: int, cards: list[dict]) -> None:
+        self.pages.setdefault(query, {})[page] = cards
+        self._write({"type": "page", "query": query, "page": page, "cards": cards})
+
+    def record_listing_done(self, query: str, pages: int) -> None:
+        self.listing_pages[query] = pages
+        self._write({"type": "listing_done", "query": query, "pages": pages})
+
+    def record_enriched(self, query: str, firm_id: str, primary_contact: str, website: str | None,
+                        primary_type: str, enrich_status: str = "ok") -> None:
+        result = {"primary_contact": primary_contact, "website": website, "primary_type": primary_type,
+                  "enrich_status": enrich_status}
+        with self._lock:
+            self.enriched[str(firm_id)] = result
+        self._write({"type": "enriched", "query": query, "firm_id": str(firm_id), **result})
+
+    def record_query_done(self, query: str) -> None:
+        self.done_queries.add(query)
+        self._write({"type": "query_done", "query": query})
+
+    # --- чтение состояния ---
+    def page_cards(self, query: str, page: int) -> list[dict] | None:
+        return self.pages.get(query, {}).get(page)
+
+    def listing_done(self, query: str) -> bool:
+        return query in self.listing_pages
+
+    def enriched_result(self, firm_id: str) -> dict | None:
+        with self._lock:
+            return self.enriched.get(str(firm_id))
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
@@ -0,0 +1,116 @@
+import csv
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterator
+
+from astana_2gis_leads.postprocess import norm_addr
+from astana_2gis_leads.sinks import rows_to_excel
+
+
+class LeadStore:
+    """
+    Мастер-хранилище лидов в SQLite вместо перечитывания всего leads_master.xlsx:
+    - уникальность по firm_id и по нормализованному адресу (две уникальные индексы)
+    - upsert: новая строка вытесняет старую, совпавшую по любому из ключей (как раньше drop_duplicates,
+      где новые лиды шли первыми)
+    - исходная строка целиком лежит в data (JSON), порядок колонок — в таблице columns
+    - экспорт в CSV/Excel по запросу, потоково, без загрузки всей базы в память
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY,
+                firm_id TEXT,
+                addr_norm TEXT,
+                query TEXT,
+                address TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS leads_firm_id ON leads(firm_id) WHERE firm_id IS NOT NULL;
+            CREATE UNIQUE INDEX IF NOT EXISTS leads_addr_norm ON leads(addr_norm) WHERE addr_norm IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS leads_order ON leads(query, address);
+            CREATE TABLE IF NOT EXISTS columns (
+                pos INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE
+            );
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _clean(row: dict) -> dict:
+        # NaN из pandas -> пусто; id всегда строкой, чтобы Excel не делал 7E+16
+        out = {}
+        for k, v in row.items():
+            if isinstance(v, float) and math.isnan(v):
+                v = None
+            out[str(k)] = v
+        if out.get("id") is not None:
+            out["id"] = str(out["id"])
+        if out.get("firm_id") is not None:
+            out["firm_id"] = str(out["firm_id"])
+        return out
+
+    def upsert(self, leads: list[dict]) -> int:
+        """Вставить/обновить пачку лидов одной транзакцией. Возвращает число записанных строк."""
+        now = time.time()
+        params = []
+        columns: dict[str, None] = {}
+        for lead in leads:
+            row = self._clean(lead)
+            columns.update(dict.fromkeys(row))
+            firm_id = row.get("firm_id") or row.get("id") or None
+            addr_key = norm_addr(row.get("address") or "") or None
+            params.append((firm_id, addr_key, row.get("query"), row.get("address"),
+                           json.dumps(row, ensure_ascii=False, default=str), now))
+
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO columns (name) VALUES (?)", [(c,) for c in columns])
+            # REPLACE удаляет строки, конфликтующие с новой по любому уникальному индексу
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO leads (firm_id, addr_norm, query, address, data, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                params,
+            )
+        return len(params)
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+
+    def columns(self) -> list[str]:
+        return [r[0] for r in self._conn.execute("SELECT name FROM columns ORDER BY pos")]
+
+    def iter_rows(self) -> Iterator[dict]:
+        """Все лиды, отсортированные по запросу и адресу, по одной строке (курсор, не список)."""
+        cur = self._conn.execute("SELECT data FROM leads ORDER BY query, address")
+        for (data,) in cur:
+            yield json.loads(data)
+
+    def export_csv(self, path: str | Path) -> int:
+        columns = self.columns()
+        n = 0
+        with open(path, "w", encoding="utf-8-sig", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for row in self.iter_rows():
+                writer.writerow(row)
+                n += 1
+        return n
+
+    def export_excel(self, path: str | Path) -> int:
+        """Потоковая выгрузка в .xlsx таблицей LeadsTable (write-only книга openpyxl: строки не держатся в памяти)."""
+        return rows_to_excel(self.iter_rows(), path, self.columns())
+
+    def close(self) -> None:
+        self._conn.close()
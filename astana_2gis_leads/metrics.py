@@ -0,0 +1,170 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Границы корзин гистограммы времени этапа, сек (как у Prometheus: le — «меньше или равно»)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PROM_PREFIX = "twogis"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: хранит счётчики, сумму и максимум, а не сами значения."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина — +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам: верхняя граница корзины, но не больше наблюдённого максимума."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 4),
+            "mean_s": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "max_s": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """
+    Метрики конвейера: время этапов (гистограммы по stage) и счётчики событий с метками
+    (таймауты, срабатывания fallback-кликов по типу контакта, попадания в кэш).
+    Потокобезопасно: этапы пишут и основной драйвер, и воркеры пула обогащения.
+    Выгрузка — Prometheus text format (.prom) или JSON-сводка (.json).
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.stages: dict[str, Histogram] = {}
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """with METRICS.timer("firm_navigation"): ... — время записывается и при исключении."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, name: str, n: int = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def merge(self, other: "Metrics") -> None:
+        """Добавить метрики другого реестра (сводка прогона = сумма сводок запросов)."""
+        with other._lock:
+            stages = list(other.stages.items())
+            counters = list(other.counters.items())
+        with self._lock:
+            for stage, hist in stages:
+                self.stages.setdefault(stage, Histogram(self.buckets)).merge(hist)
+            for key, n in counters:
+                self.counters[key] = self.counters.get(key, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {stage: hist.summary() for stage, hist in sorted(self.stages.items())},
+                "counters": [
+                    {"name": name, **dict(labels), "value": n}
+                    for (name, labels), n in sorted(self.counters.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            f"# HELP {PROM_PREFIX}_stage_seconds Время этапа конвейера",
+            f"# TYPE {PROM_PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for le, c in zip([*map(str, hist.buckets), "+Inf"], hist.counts):
+                    cumulative += c
+                    lines.append(f'{PROM_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{PROM_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'{PROM_PREFIX}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+
+            typed = set()
+            for (name, labels), n in sorted(self.counters.items()):
+                metric = f"{PROM_PREFIX}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{metric}{{{label_str}}} {n}" if label_str else f"{metric} {n}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path) -> Path:
+        """Записать метрики в файл: .prom — Prometheus text format, иначе JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            path.write_text(self.to_prometheus(), encoding="utf-8")
+        else:
+            path.write_text(json.dumps(self.to_json(), ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+
+# Общий реестр процесса: в него пишут сборщик, selenium_helpers и run_batch
+METRICS = Metrics()
+
+
+def timed(stage: str):
+    """Декоратор: время каждого вызова функции идёт в METRICS под именем stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
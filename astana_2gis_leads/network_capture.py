@@ -0,0 +1,134 @@
+import base64
+import json
+import re
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+from astana_2gis_leads.metrics import METRICS
+
+# Поисковые ответы каталога 2GIS, которые SPA выдачи и так скачивает (items/byid карточки фирмы — не выдача)
+CATALOG_URL_RE = re.compile(r"catalog\.api\.2gis\.[a-z]+/[\d.]+/items\?")
+# Типы контактов каталога, которые являются ссылками (телефоны и почта — не href, в primary_contact не идут)
+LINK_CONTACT_TYPES = {"website", "whatsapp", "telegram", "instagram", "facebook", "vkontakte", "twitter", "youtube"}
+
+
+def firm_id_of(item_id: str | None) -> str:
+    """id элемента каталога -> firm_id из URL /firm/<id> ("70000001012345678_abc" -> "70000001012345678")."""
+    return str(item_id or "").split("_", 1)[0]
+
+
+def items_of(payload: dict) -> list[dict]:
+    """Фирмы (type=branch) из ответа каталога; здания, районы и прочее в выдаче пропускаются."""
+    result = payload.get("result") or {}
+    return [it for it in result.get("items") or [] if it.get("type", "branch") == "branch" and it.get("id")]
+
+
+def total_of(payload: dict) -> int | None:
+    """Сколько всего фирм в выдаче запроса (по всем страницам), если каталог это сообщил."""
+    total = (payload.get("result") or {}).get("total")
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+def contact_hrefs(item: dict) -> list[str]:
+    """Ссылки из contact_groups элемента в порядке каталога (url, а если его нет — value)."""
+    hrefs = []
+    for group in item.get("contact_groups") or []:
+        for contact in group.get("contacts") or []:
+            if contact.get("type") in LINK_CONTACT_TYPES:
+                href = contact.get("url") or contact.get("value")
+                if href:
+                    hrefs.append(href)
+    return hrefs
+
+
+def card_from_item(item: dict, base_url: str) -> dict:
+    """Карточка в формате collect_cards_from_root (+ contact_hrefs) из структурированного элемента каталога."""
+    firm_id = firm_id_of(item.get("id"))
+    return {
+        "firm_url": f"{base_url}/firm/{firm_id}",
+        "firm_id": firm_id,
+        "name": (item.get("name") or "").strip(),
+        "address": (item.get("address_name") or item.get("full_address_name") or "").strip(),
+        "primary_contact": "",
+        "contact_hrefs": contact_hrefs(item),
+    }
+
+
+class NetworkCapture:
+    """
+    Ответы каталога 2GIS из performance-лога Chrome (драйвер с make_chrome_driver(perf_log=True)):
+    - drain() разбирает новые события лога: Network.responseReceived подходящего URL запоминается,
+      а после Network.loadingFinished тело берётся через CDP Network.getResponseBody
+    - wait_payloads() ждёт хотя бы один ответ (вместо ожидания отрисовки выдачи)
+    get_log забирает события из буфера chromedriver, поэтому каждый вызов видит только новое.
+    Тело запрашивается в текущей вкладке: вызывать, когда драйвер стоит на вкладке выдачи.
+    keep_responses=True — сырые ответы копятся в responses (для записи фикстур).
+    """
+
+    def __init__(self, driver, url_re: re.Pattern = CATALOG_URL_RE, keep_responses: bool = False):
+        self.driver = driver
+        self.url_re = url_re
+        self.keep_responses = keep_responses
+        self.responses: list[dict] = []
+        self.last_total: int | None = None
+        self._pending: dict[str, str] = {}  # requestId -> url: ответ пришёл, тело ещё грузится
+
+    def reset(self) -> None:
+        """Забыть всё, что было до этого момента (перед навигацией на новый запрос)."""
+        self.driver.get_log("performance")
+        self._pending.clear()
+        self.last_total = None
+
+    def drain(self) -> list[dict]:
+        """Разобранные JSON-ответы каталога, завершившиеся с прошлого вызова."""
+        finished = []
+        for entry in self.driver.get_log("performance"):
+            message = json.loads(entry["message"]).get("message") or {}
+            method = message.get("method")
+            params = message.get("params") or {}
+            request_id = params.get("requestId")
+            if method == "Network.responseReceived":
+                response = params.get("response") or {}
+                if response.get("status") == 200 and self.url_re.search(response.get("url") or ""):
+                    self._pending[request_id] = response["url"]
+            elif method == "Network.loadingFinished" and request_id in self._pending:
+                finished.append(request_id)
+            elif method == "Network.loadingFailed":
+                self._pending.pop(request_id, None)
+
+        payloads = []
+        for request_id in finished:
+            url = self._pending.pop(request_id)
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except WebDriverException:
+                # тело уже выгружено или запрос из другой вкладки (карточки фирм)
+                METRICS.inc("network_capture", result="body_error")
+                continue
+            text = base64.b64decode(body["body"]).decode("utf-8") if body.get("base64Encoded") else body["body"]
+            try:
+                payload = json.loads(text)
+            except ValueError:
+                METRICS.inc("network_capture", result="bad_json")
+                continue
+            total = total_of(payload)
+            if total is not None:
+                self.last_total = total
+            if self.keep_responses:
+                self.responses.append({"url": url, "payload": payload})
+            payloads.append(payload)
+        return payloads
+
+    def listing_complete(self, listed: int) -> bool:
+        """Каталог сообщил total, и столько фирм уже собрано — следующую страницу не листаем."""
+        return self.last_total is not None and listed >= self.last_total
+
+    def wait_payloads(self, timeout: float = 10.0, poll: float = 0.1) -> list[dict]:
+        """Дождаться ответов каталога (пустой список — за timeout ничего не пришло)."""
+        end = time.monotonic() + timeout
+        while True:
+            payloads = self.drain()
+            if payloads or time.monotonic() >= end:
+                return payloads
+            time.sleep(poll)
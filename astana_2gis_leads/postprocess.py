@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from astana_2gis_leads.sinks import CRM_COLUMNS
+from astana_2gis_leads.url_classifier import channel_patterns
+
+# Тип основного контакта по хосту/схеме ссылки (правила url_classifier) — в порядке приоритета WA -> TG -> IG -> FB -> VK
+PRIMARY_TYPE_PATTERNS = tuple(channel_patterns())
+
+# Всё, что str.split() считает пробелом (включая NBSP и узкие пробелы), явным классом:
+# \s в regex-движке pyarrow (RE2) — только ASCII
+WHITESPACE_RUN = "[\\s\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+"
+
+
+def norm_addr(s: str) -> str:
+    """Ключ дедупа по адресу для одной строки (та же нормализация, что и normalize_addresses)."""
+    return " ".join((s or "").lower().replace("\xa0", " ").split())
+
+
+def normalize_addresses(addresses: pd.Series) -> pd.Series:
+    """Векторная norm_addr: нижний регистр, NBSP и любые пробельные серии -> один пробел, без краёв."""
+    return (
+        addresses.fillna("").astype(str)
+        .str.lower()
+        .str.replace(WHITESPACE_RUN, " ", regex=True)
+        .str.strip()
+    )
+
+
+def classify_primary(contacts: pd.Series) -> pd.Series:
+    """Векторная primary_type_of: wa / tg / ig / fb / vk / none для всей колонки сразу."""
+    low = contacts.fillna("").astype(str).str.lower()
+    conditions = [low.str.contains(pattern, regex=True).to_numpy() for _t, pattern in PRIMARY_TYPE_PATTERNS]
+    choices = [t for t, _pattern in PRIMARY_TYPE_PATTERNS]
+    return pd.Series(np.select(conditions, choices, default="none"), index=contacts.index)
+
+
+def dedupe_by_address(df: pd.DataFrame, seen: set[str] | None = None) -> pd.DataFrame:
+    """
+    Строки с непустым и ещё не встречавшимся адресом (первая побеждает).
+    seen — ключи, уже встреченные раньше (например, на прошлых страницах выдачи); дополняется новыми.
+    """
+    if df.empty or "address" not in df.columns:
+        return df.iloc[0:0]
+    keys = normalize_addresses(df["address"])
+    mask = (keys != "") & ~keys.duplicated()
+    if seen:
+        mask &= ~keys.isin(seen)
+    if seen is not None:
+        seen.update(keys[mask])
+    return df[mask]
+
+
+def dedupe_cards(cards: list[dict], seen: set[str]) -> list[dict]:
+    """
+    dedupe_by_address для потоковой записи: карточки как есть, без DataFrame —
+    отсутствующие поля остаются None, а не NaN (NaN дальше попал бы в кэш, журнал и потоки).
+    """
+    fresh = []
+    for card in cards:
+        key = norm_addr(card.get("address"))
+        if key and key not in seen:
+            seen.add(key)
+            fresh.append(card)
+    return fresh
+
+
+def service_values(run_id: str | None = None, run_date: str | None = None, city: str | None = None) -> dict:
+    """Служебные колонки прогона (только заданные)."""
+    values = {"run_id": run_id, "run_date": run_date, "city": city}
+    return {k: v for k, v in values.items() if v is not None}
+
+
+def enrich_row(row: dict, run_id: str | None = None, run_date: str | None = None, city: str | None = None) -> dict:
+    """Служебные и пустые CRM-колонки для одной строки — для потоковой записи (run_batch)."""
+    row.update(service_values(run_id, run_date, city))
+    for col in CRM_COLUMNS:
+        row.setdefault(col, "")
+    return row
+
+
+def enrich_columns(df: pd.DataFrame, run_id: str | None = None, run_date: str | None = None,
+                   city: str | None = None) -> pd.DataFrame:
+    """
+    Итоговые колонки лида над всем фреймом: primary_type по primary_contact,
+    служебные (run_id / run_date / city) и пустые CRM-колонки (существующие значения не трогаются).
+    """
+    df = df.copy()
+    if "primary_contact" in df.columns:
+        df["primary_type"] = classify_primary(df["primary_contact"])
+    for col, value in service_values(run_id, run_date, city).items():
+        df[col] = value
+    for col in CRM_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+        else:
+            df[col] = df[col].fillna("")
+    return df
@@ -0,0 +1,24 @@
+import random
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Вежливость к 2GIS, отдельно от ожиданий готовности страницы:
+    между действиями (переход, смена страницы) проходит не меньше min_interval + случайный jitter секунд.
+    Время, уже потраченное на ожидание выдачи, засчитывается — спим только остаток.
+    """
+
+    def __init__(self, min_interval: float = 0.0, jitter: float = 0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_at = time.monotonic() + self.min_interval + random.uniform(0, self.jitter)
@@ -0,0 +1,76 @@
+"""
+Сравнение профилей браузера на карточках фирм: время готовности страницы и трафик на карточку.
+
+    python -m astana_2gis_leads.scripts.bench_browser_profile --firm-ids 70000001012345678 70000001087654321
+
+Готовность — от driver.get до появления ссылок в карточке.
+Трафик — сумма encodedDataLength из событий Network.loadingFinished performance-лога.
+"""
+from astana_2gis_leads.browser import make_chrome_driver
+
+from pathlib import Path
+import argparse
+import json
+import statistics
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+PROFILES = {
+    "default": {},
+    "eager": {"eager": True},
+    "light": {"headless": True, "eager": True, "block_resources": True},
+}
+
+
+def drain_transferred_bytes(driver) -> int:
+    """Забрать накопленный performance-лог и посчитать байты по завершённым загрузкам."""
+    total = 0
+    for entry in driver.get_log("performance"):
+        msg = json.loads(entry["message"])["message"]
+        if msg.get("method") == "Network.loadingFinished":
+            total += int(msg["params"].get("encodedDataLength") or 0)
+    return total
+
+
+def bench_profile(name: str, options: dict, firm_urls: list[str], disk_cache_dir: Path | None) -> dict:
+    driver = make_chrome_driver(perf_log=True, disk_cache_dir=disk_cache_dir, **options)
+    try:
+        drain_transferred_bytes(driver)
+
+        ready_s, sizes = [], []
+        for url in firm_urls:
+            t0 = time.perf_counter()
+            driver.get(url)
+            WebDriverWait(driver, 20).until(lambda d: d.execute_script("return document.links.length") > 0)
+            ready_s.append(time.perf_counter() - t0)
+            sizes.append(drain_transferred_bytes(driver))
+    finally:
+        driver.quit()
+
+    return {
+        "profile": name,
+        "cards": len(firm_urls),
+        "ready_median_s": round(statistics.median(ready_s), 3),
+        "ready_max_s": round(max(ready_s), 3),
+        "kb_per_card_median": round(statistics.median(sizes) / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк профилей Chrome на карточках 2GIS")
+    parser.add_argument("--firm-ids", nargs="+", required=True)
+    parser.add_argument("--city", default="astana")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--disk-cache-dir", type=Path, default=None,
+                        help="общий HTTP-кэш (без него каждый профиль стартует с пустым кэшем)")
+    args = parser.parse_args(argv)
+
+    firm_urls = [f"https://2gis.kz/{args.city}/firm/{fid}" for fid in args.firm_ids]
+    for name in args.profiles:
+        print(bench_profile(name, PROFILES[name], firm_urls, args.disk_cache_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Масштабирование CDP-бэкенда обогащения по числу вкладок K на локальном стенде 2GIS:
+
+    python -m astana_2gis_leads.scripts.bench_cdp_scaling --firms 40 --tabs 1 2 4 8 --latency 0.3
+
+Без --fixtures стенд отдаёт синтетические карточки (ссылки WhatsApp/сайт через редирект link.2gis.com).
+Для сравнения печатается и последовательный Selenium-путь (get_primary_contact) на тех же карточках.
+Нужны Chrome и пакет websockets.
+"""
+from astana_2gis_leads.browser import make_chrome_driver
+from astana_2gis_leads.cdp_engine import CDPEnrichmentEngine, browser_ws_url
+from astana_2gis_leads.standin_server import StandInServer
+from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+
+from pathlib import Path
+import argparse
+import asyncio
+import base64
+import tempfile
+import time
+
+
+FIRM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Фирма {firm_id}</title></head>
+<body>
+  <h1>Магазин {firm_id}</h1>
+  <a href="https://link.2gis.com/3.2/bench/{site_b64}">Сайт</a>
+  <a href="https://wa.me/7701{n:07d}">WhatsApp</a>
+  <a href="https://2gis.kz/astana/search/bench">Назад к выдаче</a>
+</body></html>
+"""
+
+
+def write_synthetic_fixtures(fixtures_dir: Path, n: int) -> list[str]:
+    firm_ids = [str(70000001000000000 + i) for i in range(n)]
+    (fixtures_dir / "firm").mkdir(parents=True, exist_ok=True)
+    for i, firm_id in enumerate(firm_ids):
+        site_b64 = base64.b64encode(f"https://shop{i}.kz\n".encode()).decode()
+        page = FIRM_PAGE.format(firm_id=firm_id, site_b64=site_b64, n=i)
+        (fixtures_dir / "firm" / f"{firm_id}.html").write_text(page, encoding="utf-8")
+    return firm_ids
+
+
+async def enrich_with_tabs(collector, ws_url: str, tabs: int, firm_ids: list[str]) -> list[dict]:
+    async with CDPEnrichmentEngine(collector, ws_url, tabs=tabs) as engine:
+        return await engine.enrich_many(firm_ids, force_refresh=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк CDP-бэкенда по числу вкладок")
+    parser.add_argument("--fixtures", type=Path, default=None, help="записанные фикстуры (по умолчанию синтетика)")
+    parser.add_argument("--firm-ids", nargs="*", default=None, help="фирмы из --fixtures (по умолчанию все)")
+    parser.add_argument("--firms", type=int, default=40, help="число синтетических карточек")
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка ответа стенда, сек")
+    parser.add_argument("--skip-selenium", action="store_true", help="не мерить последовательный Selenium-путь")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if args.fixtures is None:
+            fixtures = tmp / "fixtures"
+            firm_ids = write_synthetic_fixtures(fixtures, args.firms)
+        else:
+            fixtures = args.fixtures
+            firm_ids = args.firm_ids or sorted(p.stem for p in (fixtures / "firm").glob("*.html"))
+
+        with StandInServer(fixtures, latency=args.latency) as stand:
+            collector = TwoGisLeadCollector(["bench"], tmp / "cache", site_root=stand.base_url)
+            driver = make_chrome_driver(headless=True)
+            try:
+                ws_url = browser_ws_url(driver)
+                base = None
+                for k in args.tabs:
+                    t0 = time.perf_counter()
+                    results = asyncio.run(enrich_with_tabs(collector, ws_url, k, firm_ids))
+                    elapsed = time.perf_counter() - t0
+                    base = base or elapsed  # ускорение — относительно первого K из --tabs
+                    found = sum(bool(r["primary_contact"]) for r in results)
+                    print(f"cdp tabs={k:<3} {len(firm_ids) / elapsed:6.2f} firms/s | {elapsed:6.2f} s"
+                          f" | speedup x{base / elapsed:4.1f} | with contact {found}/{len(firm_ids)}")
+
+                if not args.skip_selenium:
+                    t0 = time.perf_counter()
+                    for firm_id in firm_ids:
+                        collector.get_primary_contact(driver, firm_id, force_refresh=True)
+                    elapsed = time.perf_counter() - t0
+                    print(f"selenium     {len(firm_ids) / elapsed:6.2f} firms/s | {elapsed:6.2f} s")
+            finally:
+                driver.quit()
+                collector.cache.close()
+
+
+if __name__ == "__main__":
+    main()
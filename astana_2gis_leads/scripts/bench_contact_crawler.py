@@ -0,0 +1,195 @@
+"""
+Замер обхода сайтов за почтой и телефонами (contact_crawler.ContactCrawler) на локальном сервере:
+
+    python -m astana_2gis_leads.scripts.bench_contact_crawler --sites 500 --latency 0.05
+
+Каждый «сайт» — свой адрес петли 127.0.x.y. Варианты по номеру сайта:
+0 — контакты на главной, 1 — на странице по ссылке «Контакты» с главной, 2 — только на /contacts (угаданный путь),
+3 — только на /contacts, но robots.txt его запрещает (контактов быть не должно), 4 — Crawl-delay в robots.txt,
+5 — главная уводит редиректом на чужой хост localhost с контактами «платформы» (контактов быть не должно),
+6 — /contacts уводит редиректом на /private/contacts, который robots.txt запрещает (контактов быть не должно),
+7 — главная отвечает 404, контакты — на /contacts (угаданный путь пробуется и без главной).
+Проверяется: найденные контакты совпадают с ожидаемыми, запрещённые страницы и чужой хост не запрашивались,
+per_domain не превышен, повторный прогон — из кэша без запросов (кроме сайтов варианта 5: ошибки не кэшируются).
+"""
+from astana_2gis_leads.contact_crawler import ContactCrawler, CrawlCache
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import tempfile
+import threading
+import time
+
+KINDS = 8  # вариантов сайтов (см. описание модуля)
+# варианты, где контактов быть не должно: robots.txt, чужой хост, редирект в запрещённое
+NO_CONTACT_KINDS = (3, 5, 6)
+
+
+def contacts_html(i: int) -> str:
+    return (f'<p>Звоните: +7 (701) {i % 1000:03d}-{i // 1000 % 100:02d}-45, '
+            f'почта <a href="mailto:info{i}@site{i}.kz">info{i}@site{i}.kz</a></p>')
+
+
+def expected_phone(i: int) -> str:
+    return f"+7701{i % 1000:03d}{i // 1000 % 100:02d}45"
+
+
+def expected_contacts(i: int) -> tuple[list[str], list[str]]:
+    """(emails, phones), которые обходчик должен найти у сайта i."""
+    return ([], []) if i % KINDS in NO_CONTACT_KINDS else ([f"info{i}@site{i}.kz"], [expected_phone(i)])
+
+
+class ShopServer(ThreadingHTTPServer):
+    # очередь accept по умолчанию (5) при сотнях одновременных соединений теряет SYN — это ошибки стенда, не обходчика
+    request_queue_size = 1024
+
+
+class LocalShops:
+    """Сайты магазинов на всех loopback-адресах; считает запросы и одновременность по хосту."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self.forbidden_hits = 0
+        self.foreign_hits = 0
+        self.active: Counter = Counter()
+        self.max_active: Counter = Counter()
+        self._lock = threading.Lock()
+        self._httpd = ShopServer(("0.0.0.0", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+    @staticmethod
+    def site_index(host: str) -> int:
+        _, _, x, y = host.split(".")
+        return int(x) * 250 + int(y) - 1
+
+    def _page(self, i: int, path: str) -> tuple[int, str]:
+        kind = i % KINDS
+        if path == "/robots.txt":
+            if kind == 3:
+                return 200, "User-agent: *\nDisallow: /contacts\n"
+            if kind == 4:
+                return 200, "User-agent: *\nCrawl-delay: 0.2\n"
+            if kind == 6:
+                return 200, "User-agent: *\nDisallow: /private\n"
+            return 404, ""
+        if path == "/" and kind == 5:
+            return 302, f"http://localhost:{self.port}/"
+        if path == "/contacts" and kind == 6:
+            return 302, "/private/contacts"
+        if path == "/" and kind == 7:
+            return 404, "<html><body>главная не найдена</body></html>"
+        if path == "/":
+            link = '<a href="/kontakty/">Контакты</a>' if kind == 1 else '<a href="/catalog">Каталог</a>'
+            return 200, f"<html><body><h1>Магазин {i}</h1>{link}{contacts_html(i) if kind == 0 else ''}</body></html>"
+        if path == "/kontakty/" and kind == 1 or path == "/contacts" and kind in (2, 3, 4, 7):
+            return 200, f"<html><body>{contacts_html(i)}</body></html>"
+        return 404, "<html><body>нет такой страницы</body></html>"
+
+    def _make_handler(self):
+        shops = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                host = self.headers.get("Host", "").split(":")[0]
+                if host == "localhost":
+                    # «платформа», на которую уводит сайт варианта 5: сюда обходчик ходить не должен
+                    with shops._lock:
+                        shops.foreign_hits += 1
+                    body = f"<html><body>{contacts_html(999999)}</body></html>".encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                i = shops.site_index(host)
+                with shops._lock:
+                    shops.requests[host] += 1
+                    shops.forbidden_hits += (i % KINDS == 3 and self.path == "/contacts"
+                                             or self.path.startswith("/private"))
+                    shops.active[host] += 1
+                    shops.max_active[host] = max(shops.max_active[host], shops.active[host])
+                try:
+                    time.sleep(shops.latency)
+                    status, text = shops._page(i, self.path)
+                    body = text.encode()
+                    self.send_response(status)
+                    if status == 302:
+                        self.send_header("Location", text)
+                        body = b""
+                    self.send_header("Content-Type", "text/plain" if self.path == "/robots.txt" else "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with shops._lock:
+                        shops.active[host] -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def shop_urls(n: int, port: int) -> list[str]:
+    """Главные n сайтов: сайт i — на своём адресе петли (LocalShops.site_index — обратное)."""
+    return [f"http://127.0.{i // 250}.{i % 250 + 1}:{port}/" for i in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк обхода сайтов за контактами на локальном сервере")
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа сервера, сек")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-domain", type=int, default=2)
+    parser.add_argument("--max-pages", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with LocalShops(args.latency) as shops, tempfile.TemporaryDirectory() as tmp:
+        urls = shop_urls(args.sites, shops.port)
+        cache_path = Path(tmp) / "site_contacts.sqlite"
+        crawler = ContactCrawler(max_pages=args.max_pages, concurrency=args.concurrency, per_domain=args.per_domain,
+                                 timeout=(1.0, 5.0), cache=CrawlCache(cache_path))
+        t0 = time.perf_counter()
+        results = crawler.crawl_many(urls)
+        elapsed = time.perf_counter() - t0
+        crawler.close()
+
+        wrong = []
+        for i, url in enumerate(urls):
+            r = results[url]
+            want = expected_contacts(i)
+            if (r["emails"], r["phones"]) != want:
+                wrong.append((url, want, (r["emails"], r["phones"])))
+        pages = sum(r["pages"] for r in results.values())
+        print(f"{args.sites} сайтов, {pages} страниц за {elapsed:.2f} с -> {60 * args.sites / elapsed:,.0f} сайтов/мин")
+        print(f"Неверных результатов: {len(wrong)}", *wrong[:5], sep="\n  ")
+        print(f"Запросов к запрещённым robots.txt страницам: {shops.forbidden_hits}, к чужому хосту: {shops.foreign_hits}")
+        print(f"Максимум одновременных запросов на домен: {max(shops.max_active.values(), default=0)} "
+              f"(per_domain={args.per_domain})")
+
+        before = sum(shops.requests.values())
+        crawler = ContactCrawler(cache=CrawlCache(cache_path))
+        t0 = time.perf_counter()
+        again = crawler.crawl_many(urls)
+        crawler.close()
+        print(f"Повтор из кэша: {time.perf_counter() - t0:.2f} с, запросов: {sum(shops.requests.values()) - before}, "
+              f"совпадает: {again == results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Замер выгрузки лидов в Excel: прежний путь против однопроходной потоковой таблицы.
+
+    python -m astana_2gis_leads.scripts.bench_excel_export --rows 100000 --extra-columns 15
+
+- legacy: df.to_excel, затем load_workbook ради LeadsTable и повторное сохранение (как было в save_leads_to_excel)
+- streaming: sinks.rows_to_excel — write-only книга, таблица добавляется до единственного сохранения
+Каждый режим — в отдельном процессе: время и пик RSS процесса (ru_maxrss, включая память C-библиотек);
+--tracemalloc дополнительно меряет пик аллокаций Python (заметно замедляет, время тогда не показательно).
+--extra-columns выводит таблицу за колонку Z
+(прежний chr(64 + end_col) давал там неверный диапазон). После замера таблица каждого файла проверяется.
+"""
+from astana_2gis_leads.sinks import LEAD_COLUMNS, TABLE_NAME, TABLE_STYLE, rows_to_excel
+
+from pathlib import Path
+import argparse
+import multiprocessing
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+
+def synthetic_rows(n: int, extra_columns: int):
+    """Строки выгрузки генератором: потоковому пути не нужен весь список в памяти."""
+    types = ["wa", "tg", "ig", "fb", "vk", "none"]
+    for i in range(n):
+        row = {
+            "firm_url": f"https://2gis.kz/astana/firm/{70000001000000000 + i}",
+            "firm_id": str(70000001000000000 + i),
+            "name": f"Магазин {i}",
+            "address": f"Проспект Туран, {i // 40}, {i % 40} этаж",
+            "primary_contact": f"https://wa.me/7701{i:07d}" if i % 3 else "",
+            "query": f"запрос {i % 25}",
+            "website": f"https://shop{i}.kz" if i % 4 == 0 else None,
+            "primary_type": types[i % len(types)],
+            "enrich_status": "ok" if i % 3 else "no_contact",
+            "run_id": "2026-01-01_00-00",
+            "run_date": "2026-01-01",
+            "city": "astana",
+        }
+        for j in range(extra_columns):
+            row[f"extra_{j}"] = f"значение {i}-{j}"
+        yield row
+
+
+def legacy_export(n: int, extra_columns: int, columns: list[str], path: Path) -> int:
+    df = pd.DataFrame(list(synthetic_rows(n, extra_columns)), columns=columns)
+    df.to_excel(path, index=False)
+    wb = load_workbook(path)
+    ws = wb.active
+    # прежний диапазон исправлен на get_column_letter, иначе файл за колонкой Z не откроется
+    table = Table(displayName=TABLE_NAME, ref=f"A1:{get_column_letter(ws.max_column)}{ws.max_row}")
+    table.tableStyleInfo = TableStyleInfo(name=TABLE_STYLE, showRowStripes=True)
+    ws.add_table(table)
+    wb.save(path)
+    return len(df)
+
+
+def streaming_export(n: int, extra_columns: int, columns: list[str], path: Path) -> int:
+    return rows_to_excel(synthetic_rows(n, extra_columns), path, columns)
+
+
+def table_ref(path: Path) -> tuple[str, int]:
+    """(ref, число колонок) первой таблицы книги — прямо из xml, без загрузки листа."""
+    with zipfile.ZipFile(path) as zf:
+        name = next(n for n in zf.namelist() if n.startswith("xl/tables/"))
+        xml = zf.read(name).decode("utf-8")
+    return re.search(r'\bref="([^"]+)"', xml).group(1), int(re.search(r'tableColumns count="(\d+)"', xml).group(1))
+
+
+def _maxrss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # macOS — байты, Linux — килобайты
+
+
+def _run_mode(fn, args: tuple, trace_python: bool, out) -> None:
+    """Тело дочернего процесса: выгрузка и замеры, результат — через очередь."""
+    base_rss = _maxrss_mb()
+    if trace_python:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn(*args)
+    elapsed = time.perf_counter() - t0
+    py_peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_python else None
+    out.put({"rows": n, "seconds": elapsed, "peak_rss_mb": _maxrss_mb(), "rss_growth_mb": _maxrss_mb() - base_rss,
+             "python_peak_mb": py_peak})
+
+
+def measure(fn, *args, trace_python: bool = False) -> dict:
+    """Замер режима в свежем процессе: пик RSS не наследует память предыдущего режима."""
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_run_mode, args=(fn, args, trace_python, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк выгрузки лидов в Excel")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--extra-columns", type=int, default=15, help="дополнительные колонки (ширина за Z)")
+    parser.add_argument("--skip-legacy", action="store_true", help="мерить только потоковую выгрузку")
+    parser.add_argument("--tracemalloc", action="store_true", help="пик аллокаций Python (медленно)")
+    args = parser.parse_args(argv)
+
+    columns = [c for c in LEAD_COLUMNS if c in next(synthetic_rows(1, 0))] + [f"extra_{j}" for j in range(args.extra_columns)]
+    expected_ref = f"A1:{get_column_letter(len(columns))}{args.rows + 1}"
+    print(f"rows={args.rows} columns={len(columns)} -> ожидаемый диапазон {expected_ref}")
+
+    modes = [("streaming", streaming_export)] + ([] if args.skip_legacy else [("legacy", legacy_export)])
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, fn in modes:
+            path = Path(tmp) / f"{label}.xlsx"
+            r = measure(fn, args.rows, args.extra_columns, columns, path, trace_python=args.tracemalloc)
+            ref, n_cols = table_ref(path)
+            ok = ref == expected_ref and n_cols == len(columns)
+            py_peak = f" | Python {r['python_peak_mb']:.1f} МБ" if r["python_peak_mb"] is not None else ""
+            print(f"{label:10} rows={r['rows']} | {r['seconds']:7.2f} с | пик RSS {r['peak_rss_mb']:7.1f} МБ "
+                  f"(+{r['rss_growth_mb']:.1f}){py_peak} | {path.stat().st_size / 2**20:.1f} МБ на диске | "
+                  f"таблица {ref} ({'OK' if ok else 'НЕВЕРНО'})")
+
+
+if __name__ == "__main__":
+    main()
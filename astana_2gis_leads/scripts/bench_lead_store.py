@@ -0,0 +1,58 @@
+"""
+Замер сохранения в мастер-хранилище: пачка лидов в уже большой мастер.
+
+    python -m astana_2gis_leads.scripts.bench_lead_store --master 200000 --batch 200
+"""
+from astana_2gis_leads.lead_store import LeadStore
+
+from pathlib import Path
+import argparse
+import random
+import tempfile
+import time
+
+
+def synthetic_leads(start: int, n: int) -> list[dict]:
+    types = ["wa", "tg", "ig", "fb", "vk", "none"]
+    return [
+        {
+            "firm_url": f"https://2gis.kz/astana/firm/{70000001000000000 + i}",
+            "firm_id": str(70000001000000000 + i),
+            "name": f"Магазин {i}",
+            "address": f"Проспект Туран, {i // 40}, {i % 40} этаж",
+            "primary_contact": f"https://wa.me/7701{i:07d}",
+            "primary_type": random.choice(types),
+            "website": None,
+            "query": f"запрос {i % 25}",
+        }
+        for i in range(start, start + n)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк upsert в LeadStore")
+    parser.add_argument("--master", type=int, default=200_000, help="размер мастер-хранилища")
+    parser.add_argument("--batch", type=int, default=200, help="размер сохраняемой пачки")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LeadStore(Path(tmp) / "leads_master.sqlite")
+        t0 = time.perf_counter()
+        for start in range(0, args.master, 10_000):
+            store.upsert(synthetic_leads(start, min(10_000, args.master - start)))
+        print(f"seed: {store.count()} лидов за {time.perf_counter() - t0:.1f} с")
+
+        for r in range(args.rounds):
+            # половина пачки — обновления существующих фирм, половина — новые
+            half = args.batch // 2
+            batch = synthetic_leads(random.randrange(args.master - half), half)
+            batch += synthetic_leads(args.master + r * args.batch, args.batch - half)
+            t0 = time.perf_counter()
+            store.upsert(batch)
+            print(f"upsert {len(batch)} -> мастер {store.count()}: {(time.perf_counter() - t0) * 1000:.1f} мс")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Офлайн-бенчмарк сборщика на локальном стенде 2GIS (без обращений к 2gis.kz):
+
+    python -m astana_2gis_leads.scripts.bench_offline --fixtures fixtures --pages 3 --firms 20
+
+Фикстуры записываются scripts/record_fixtures.py. Меряется:
+- collect_cards_from_root: карточек в секунду
+  (--network-capture: collect_cards_from_network по записанным ответам каталога + совпадение firm_id с DOM)
+- пагинация click_page -> смена first_firm_id: задержка перехода
+- get_primary_contact (без кэша): p50/p95/p99 на фирму
+- число команд WebDriver на каждый этап (WebDriverTrace; стеки пишутся в bench_results/offline.folded)
+Результат дописывается строкой в bench_results/offline.jsonl и сравнивается с прошлым прогоном.
+"""
+from astana_2gis_leads.browser import make_chrome_driver
+from astana_2gis_leads.network_capture import NetworkCapture
+from astana_2gis_leads.selenium_helpers import pick_scroll_root, first_firm_id, click_page, wait_list_stable
+from astana_2gis_leads.standin_server import StandInServer
+from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+from astana_2gis_leads.webdriver_trace import WebDriverTrace
+
+from pathlib import Path
+import argparse
+import datetime
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+RESULTS_FILE = Path("bench_results") / "offline.jsonl"
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))]
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_listing(driver, trace: WebDriverTrace, collector: TwoGisLeadCollector, search_url: str,
+                  max_pages: int, capture: NetworkCapture | None = None) -> tuple[dict, list[str]]:
+    if capture is not None:
+        capture.reset()
+    driver.get(search_url)
+    wait_list_stable(driver)
+    pick_scroll_root(driver)
+
+    collect_s, page_switch_s, firm_ids = [], [], []
+    cards_total = 0
+    collect_cmds = page_cmds = 0
+    network_pages = dom_matched = 0
+    for page in range(1, max_pages + 1):
+        before = trace.total()
+        t0 = time.perf_counter()
+        cards = collector.collect_cards_from_network(capture) if capture is not None else None
+        if cards is None:
+            cards = collector.collect_cards_from_root(driver)
+        else:
+            network_pages += 1
+        collect_s.append(time.perf_counter() - t0)
+        collect_cmds += trace.total() - before
+        cards_total += len(cards)
+        if capture is not None:
+            # структурированные данные должны дать ту же выдачу, что и DOM
+            dom_ids = {c["firm_id"] for c in collector.collect_cards_from_root(driver)}
+            dom_matched += dom_ids == {c["firm_id"] for c in cards}
+        firm_ids += [c["firm_id"] for c in cards if c["firm_id"] not in firm_ids]
+
+        if page == max_pages or not driver.find_elements(By.XPATH, f"//a[normalize-space()='{page + 1}']"):
+            break
+        before = trace.total()
+        t0 = time.perf_counter()
+        old_first = first_firm_id(driver)
+        click_page(driver, page + 1)
+        WebDriverWait(driver, 12).until(lambda d: (fid := first_firm_id(d)) and fid != old_first)
+        page_switch_s.append(time.perf_counter() - t0)
+        page_cmds += trace.total() - before
+
+    pages = len(collect_s)
+    return {
+        "pages": pages,
+        "cards": cards_total,
+        "cards_per_s": round(cards_total / sum(collect_s), 1) if sum(collect_s) else 0.0,
+        "collect_cmds_per_page": round(collect_cmds / pages, 1),
+        "page_switch_p50_s": round(percentile(page_switch_s, 50), 3),
+        "page_switch_cmds": round(page_cmds / len(page_switch_s), 1) if page_switch_s else 0,
+        **({"network_pages": network_pages, "network_dom_match_pages": dom_matched} if capture is not None else {}),
+    }, firm_ids
+
+
+def bench_enrichment(driver, trace: WebDriverTrace, collector: TwoGisLeadCollector, firm_ids: list[str]) -> dict:
+    latencies = []
+    with_contact = budget_exhausted = 0
+    for firm_id in firm_ids:
+        t0 = time.perf_counter()
+        result = collector.enrich_firm(driver, firm_id, force_refresh=True)
+        latencies.append(time.perf_counter() - t0)
+        with_contact += bool(result["primary_contact"])
+        budget_exhausted += result["enrich_status"] == "budget_exhausted"
+    # команды на фирму — из секций трассировки, которые открывает сам get_primary_contact
+    cmds = [trace.sections[f"firm:{firm_id}"]["commands"] for firm_id in firm_ids]
+    return {
+        "firms": len(firm_ids),
+        "with_contact": with_contact,
+        "budget_exhausted": budget_exhausted,
+        "enrich_p50_s": round(percentile(latencies, 50), 3),
+        "enrich_p95_s": round(percentile(latencies, 95), 3),
+        "enrich_p99_s": round(percentile(latencies, 99), 3),
+        "firms_per_min": round(60 * len(firm_ids) / sum(latencies), 1) if latencies else 0.0,
+        "cmds_per_firm": round(statistics.mean(cmds), 1) if cmds else 0,
+    }
+
+
+def previous_result(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    lines = [l for l in path.read_text(encoding="utf-8").splitlines() if l.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def print_delta(result: dict, prev: dict | None) -> None:
+    for key, value in result.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        old = (prev or {}).get(key)
+        if isinstance(old, (int, float)) and old:
+            print(f"  {key:24} {value:>10}   (было {old}, {100 * (value - old) / old:+.1f}%)")
+        else:
+            print(f"  {key:24} {value:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк сборщика 2GIS на локальном стенде")
+    parser.add_argument("--fixtures", type=Path, default=Path("fixtures"))
+    parser.add_argument("--city", default="astana")
+    parser.add_argument("--query", default="bench")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--firms", type=int, default=20)
+    parser.add_argument("--headless", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--results", type=Path, default=RESULTS_FILE)
+    parser.add_argument("--firm-budget", type=float, default=None, help="бюджет секунд на фирму (по умолчанию без)")
+    parser.add_argument("--network-capture", action="store_true",
+                        help="собирать выдачу из ответов каталога (нужны api/page<n>.json в фикстурах)")
+    parser.add_argument("--label", default="", help="метка прогона (например, имя ветки)")
+    args = parser.parse_args(argv)
+
+    with StandInServer(args.fixtures) as stand, tempfile.TemporaryDirectory() as tmp:
+        collector = TwoGisLeadCollector([args.query], tmp, place=args.city, site_root=stand.base_url,
+                                        firm_budget=args.firm_budget)
+        driver = make_chrome_driver(headless=args.headless, perf_log=args.network_capture)
+        trace = WebDriverTrace(driver, keep_records=False)
+        capture = NetworkCapture(driver) if args.network_capture else None
+        try:
+            listing, firm_ids = bench_listing(
+                driver, trace, collector, f"{collector.base_url}/search/{args.query}", args.pages, capture
+            )
+            enrichment = bench_enrichment(driver, trace, collector, firm_ids[:args.firms])
+        finally:
+            driver.quit()
+            collector.cache.close()
+        served = stand.requests_served
+
+    result = {
+        "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "label": args.label,
+        **listing,
+        **enrichment,
+        "webdriver_cmds": trace.total(),
+        "stand_requests": served,
+    }
+    prev = previous_result(args.results)
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print("Offline bench:", result["ts"], result["git"] or "", args.label)
+    print_delta(result, prev)
+    print("Top stacks:")
+    for stack, n in trace.folded.most_common(5):
+        print(f"  {n:>6}  {stack}")
+    print("Stacks:", trace.write_folded(args.results.with_suffix(".folded")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Замер проверки сайтов (site_check.SiteChecker) на локальном сервере, без обращений в интернет:
+
+    python -m astana_2gis_leads.scripts.bench_site_check --sites 2000 --latency 0.05 --workers 64
+
+Каждый «сайт» — свой адрес петли 127.0.x.y (на Linux вся 127.0.0.0/8 — loopback), поведение задаётся путём:
+/ok — 200, /moved — 301 на тот же хост, /shared — 302 на общий хост (как редиректы на одну соцсеть),
+/parked — заглушка «домен продаётся», /gone — 404, а часть сайтов смотрит на закрытый порт (мёртвые).
+Проверяется: статусы совпадают с ожидаемыми, per_host не превышен ни на одном хосте, второй проход — из кэша.
+"""
+from astana_2gis_leads.site_check import SiteCheckCache, SiteChecker
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import socket
+import tempfile
+import threading
+import time
+
+
+SHARED_HOST = "127.0.255.1"
+ROUTES = [  # путь -> ожидаемый site_status
+    ("/ok", "ok"), ("/moved", "ok"), ("/shared", "redirected"), ("/parked", "parked"), ("/gone", "http_error"),
+    (None, "dead"),
+]
+
+
+class SitesServer(ThreadingHTTPServer):
+    # очередь accept по умолчанию (5) при десятках одновременных соединений теряет SYN — это ошибки стенда, не проверки
+    request_queue_size = 1024
+
+
+class LocalSites:
+    """Многопоточный сервер на всех loopback-адресах: считает одновременные запросы на каждый хост."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.active: Counter = Counter()
+        self.max_active: Counter = Counter()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = SitesServer(("0.0.0.0", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+    def _make_handler(self):
+        sites = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: пул соединений клиента переиспользует сокеты
+
+            def do_GET(self):
+                host = self.headers.get("Host", "").split(":")[0]
+                with sites._lock:
+                    sites.requests += 1
+                    sites.active[host] += 1
+                    sites.max_active[host] = max(sites.max_active[host], sites.active[host])
+                try:
+                    time.sleep(sites.latency)
+                    if self.path == "/moved":
+                        self._redirect(301, f"http://{host}:{sites.port}/ok")
+                    elif self.path == "/shared":
+                        self._redirect(302, f"http://{SHARED_HOST}:{sites.port}/ok")
+                    elif self.path == "/gone":
+                        self._reply(404, b"not found")
+                    elif self.path == "/parked":
+                        self._reply(200, "<html><body><h1>Этот домен продаётся</h1>This domain is for sale</body></html>".encode())
+                    else:
+                        self._reply(200, b"<html><body>shop</body></html>")
+                finally:
+                    with sites._lock:
+                        sites.active[host] -= 1
+
+            def _redirect(self, code: int, location: str):
+                self.send_response(code)
+                self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _reply(self, code: int, body: bytes):
+                self.send_response(code)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def site_urls(n: int, port: int, dead_port: int) -> list[tuple[str, str]]:
+    """(url, ожидаемый статус) для n сайтов на разных loopback-адресах."""
+    urls = []
+    for i in range(n):
+        host = f"127.0.{i // 250}.{i % 250 + 1}"
+        path, expected = ROUTES[i % len(ROUTES)]
+        urls.append((f"http://{host}:{dead_port}/" if path is None else f"http://{host}:{port}{path}", expected))
+    return urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки сайтов на локальном сервере")
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа сервера, сек")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--per-host", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    with LocalSites(args.latency) as sites, tempfile.TemporaryDirectory() as tmp:
+        cases = site_urls(args.sites, sites.port, closed_port())
+        checker = SiteChecker(workers=args.workers, per_host=args.per_host, timeout=(1.0, 5.0),
+                              cache=SiteCheckCache(Path(tmp) / "site_checks.sqlite"))
+        t0 = time.perf_counter()
+        results = checker.check_many([url for url, _ in cases])
+        elapsed = time.perf_counter() - t0
+        checker.close()
+
+        wrong = [(url, expected, results[url]["site_status"]) for url, expected in cases
+                 if results[url]["site_status"] != expected]
+        print(f"{args.sites} сайтов за {elapsed:.2f} с -> {60 * args.sites / elapsed:,.0f} сайтов/мин")
+        print("Статусы:", dict(Counter(r["site_status"] for r in results.values())))
+        print(f"Неверных статусов: {len(wrong)}", *wrong[:5], sep="\n  ")
+        worst = max(sites.max_active.values(), default=0)
+        print(f"Максимум одновременных запросов на хост: {worst} (per_host={args.per_host}, "
+              f"общий хост {SHARED_HOST}: {sites.max_active[SHARED_HOST]})")
+
+        # второй проход новым проверщиком — только дисковый кэш по домену
+        checker = SiteChecker(workers=args.workers, per_host=args.per_host,
+                              cache=SiteCheckCache(Path(tmp) / "site_checks.sqlite"))
+        t0 = time.perf_counter()
+        again = checker.check_many([url for url, _ in cases])
+        print(f"Повтор из кэша: {time.perf_counter() - t0:.2f} с, совпадает: {again == results}")
+        checker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Записать страницы 2GIS для офлайн-стенда (standin_server.StandInServer):
+
+    python -m astana_2gis_leads.scripts.record_fixtures "интернет магазин" --pages 3 --firms 20 --out fixtures
+
+Сохраняется отрисованный DOM (outerHTML): search/page<n>.html и firm/<firm_id>.html,
+а также JSON-ответ каталога каждой страницы выдачи из performance-лога: api/page<n>.json.
+"""
+from astana_2gis_leads.browser import make_chrome_driver
+from astana_2gis_leads.network_capture import NetworkCapture, items_of
+from astana_2gis_leads.selenium_helpers import pick_scroll_root, first_firm_id, click_page, wait_list_stable
+from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+
+from pathlib import Path
+from urllib.parse import quote
+import argparse
+import json
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+def save_dom(driver, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    html = driver.execute_script("return '<!DOCTYPE html>' + document.documentElement.outerHTML;")
+    path.write_text(html, encoding="utf-8")
+
+
+def save_api(capture: NetworkCapture, path: Path) -> bool:
+    """Ответ каталога страницы (с наибольшим числом фирм, если их пришло несколько). False — ответа не было."""
+    payloads = capture.wait_payloads(timeout=5)
+    if not payloads:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = max(payloads, key=lambda p: len(items_of(p)))
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запись фикстур 2GIS для офлайн-бенчмарка")
+    parser.add_argument("query")
+    parser.add_argument("--city", default="astana")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--firms", type=int, default=20, help="сколько карточек фирм сохранить")
+    parser.add_argument("--out", type=Path, default=Path("fixtures"))
+    args = parser.parse_args(argv)
+
+    collector = TwoGisLeadCollector([args.query], "cache", place=args.city)
+    driver = make_chrome_driver(perf_log=True)
+    capture = NetworkCapture(driver)
+    try:
+        driver.get(f"https://2gis.kz/{args.city}/search/{quote(args.query)}")
+        wait_list_stable(driver, timeout=15)
+        pick_scroll_root(driver)
+
+        firm_ids: list[str] = []
+        for page in range(1, args.pages + 1):
+            save_dom(driver, args.out / "search" / f"page{page}.html")
+            if not save_api(capture, args.out / "api" / f"page{page}.json"):
+                print(f"WARN: нет ответа каталога для страницы {page} (выдача отрисована сервером?)")
+            firm_ids += [c["firm_id"] for c in collector.collect_cards_from_root(driver) if c["firm_id"] not in firm_ids]
+            if page == args.pages or not driver.find_elements(By.XPATH, f"//a[normalize-space()='{page + 1}']"):
+                break
+            old_first = first_firm_id(driver)
+            click_page(driver, page + 1)
+            WebDriverWait(driver, 12).until(lambda d: (fid := first_firm_id(d)) and fid != old_first)
+            wait_list_stable(driver)
+
+        for firm_id in firm_ids[:args.firms]:
+            driver.get(f"https://2gis.kz/{args.city}/firm/{firm_id}")
+            WebDriverWait(driver, 12).until(lambda d: d.execute_script("return document.links.length") > 0)
+            save_dom(driver, args.out / "firm" / f"{firm_id}.html")
+        print("Saved fixtures:", args.out, "| firms:", min(len(firm_ids), args.firms))
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
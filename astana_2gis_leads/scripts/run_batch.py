@@ -1,19 +1,32 @@
-from astana_2gis_leads.selenium_helpers import pick_scroll_root, first_firm_id, click_page
+from astana_2gis_leads.selenium_helpers import pick_scroll_root, first_firm_id, click_page, wait_list_stable
 from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
-
+from astana_2gis_leads.enrich_pool import EnrichmentPool
+from astana_2gis_leads.cdp_engine import CDPEnrichmentPool
+from astana_2gis_leads.network_capture import NetworkCapture
+from astana_2gis_leads.browser import block_resources_in_tab, make_chrome_driver
+from astana_2gis_leads.rate_limit import RateLimiter
+from astana_2gis_leads.journal import RunJournal
+from astana_2gis_leads.enrichment_cache import EnrichmentCache
+from astana_2gis_leads.work_queue import LeaseKeeper, LeaseLost, WorkQueue, default_worker_id
+from astana_2gis_leads.metrics import METRICS, Metrics
+from astana_2gis_leads.webdriver_trace import WebDriverTrace
+from astana_2gis_leads.postprocess import dedupe_cards, enrich_row
+from astana_2gis_leads.sinks import LEAD_COLUMNS, SINK_SUFFIXES, RowSink, iter_rows, open_sink, rows_to_excel
+from astana_2gis_leads.site_check import SiteCheckCache, SiteChecker
+from astana_2gis_leads.contact_crawler import ContactCrawler, CrawlCache
+
+from collections import Counter
+from functools import partial
 from pathlib import Path
 from urllib.parse import quote
-import time, random
+import argparse
+import time
 
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 
 
-collector = TwoGisLeadCollector("интернет магазин", "cache")
-
 # ===== CONFIG =====
 CITY_SLUG = "astana"
 QUERIES_PATH = Path("queries.txt")
@@ -27,6 +40,34 @@ START_LINE = 1
 END_LINE = 1          # включительно
 MAX_PAGES = 13
 MAX_ENRICH = None     # None = без лимита
+# вежливость: не чаще одной навигации (запрос / смена страницы) в MIN_INTERVAL + случайные 0..JITTER сек
+MIN_INTERVAL = 1.0
+JITTER = 0.6
+LIST_QUIET_MS = 300   # выдача считается готовой, если DOM не менялся столько миллисекунд
+CACHE_TTL_HOURS = 24 * 7
+FIRM_INDEX = True     # фирмы и их запросы между прогонами (в кэше обогащения); False = без индекса
+FIRM_BUDGET = 10.0    # секунд на обогащение одной фирмы (все шаги вместе), 0 = без бюджета
+# профиль браузера
+HEADLESS = False
+EAGER_LOAD = False
+BLOCK_RESOURCES = False
+DISK_CACHE_DIR = None  # например BASE_DIR / "chrome_cache" — HTTP-кэш Chrome между запусками
+NETWORK_CAPTURE = False  # карточки выдачи из JSON-ответов каталога (performance-лог Chrome); DOM — запасной путь
+# проверка сайтов после обогащения: статус и конечный URL в xlsx (колонки website_status / website_final)
+CHECK_SITES = False
+SITE_CHECK_WORKERS = 64
+SITE_CHECK_PER_HOST = 2
+# обход сайтов фирм за почтой и телефонами (колонки emails / phones): главная, контакты, «о нас»
+CRAWL_CONTACTS = False
+CRAWL_MAX_PAGES = 3
+CRAWL_CONCURRENCY = 32
+CRAWL_PER_DOMAIN = 2
+STREAM_FORMAT = "jsonl"  # потоки строк: jsonl / csv / parquet (нужен pyarrow)
+WORKERS = 0           # 0 = обогащение в основном драйвере (последовательно), N = пул из N отдельных Chrome
+CDP_TABS = 0          # K > 0 = обогащение K вкладками основного Chrome через CDP (нужен websockets), вместо WORKERS
+# общая очередь запросов (--queue): аренда задачи на LEASE_SECONDS, продлевается heartbeat'ом; не более MAX_ATTEMPTS попыток
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
 
 # ===== helpers =====
 def build_query_url(city_slug: str, query: str) -> str:
@@ -36,134 +77,486 @@ def read_queries(path: Path) -> list[str]:
     lines = path.read_text(encoding="utf-8").splitlines()
     return [ln.strip() for ln in lines if ln.strip() and not ln.strip().startswith("#")]
 
-def norm_addr(s: str) -> str:
-    return " ".join((s or "").lower().replace("\xa0", " ").split())
-
 # ===== REQUIRED: you already have these somewhere =====
 # pick_scroll_root(driver) -> sets window.__twogis_scroll_root
 # first_firm_id(driver) -> reads first firm_id from root
 # click_page(driver, n) -> clicks pagination
 
-def run_one_query(driver, collector, query: str, max_pages: int, max_enrich: int | None, run_id: str, run_date: str) -> pd.DataFrame:
-    query_url = build_query_url(CITY_SLUG, query)
+def journal_key(query: str, city: str) -> str:
+    """Ключ запроса в журнале: тот же запрос в другом городе (задачи очереди) — отдельная выдача."""
+    return query if city == CITY_SLUG else f"{query} @ {city}"
+
+
+def file_stem(query: str, city: str) -> str:
+    """Имя файлов запроса (xlsx, поток, метрики): город + запрос, чтобы один запрос в двух городах не затирался."""
+    return "".join(ch if ch.isalnum() else "_" for ch in f"{city}_{query}")[:60]
+
+
+def _journal_enriched(journal: RunJournal, query: str, firm_id: str, fut) -> None:
+    """Колбэк Future пула: результат фирмы пишется в журнал сразу, как только воркер его получил."""
+    if fut.cancelled() or fut.exception() is not None:
+        return
+    journal.record_enriched(query, firm_id, **fut.result())
+
+def run_one_query(driver, collector, query: str, max_pages: int, max_enrich: int | None, run_id: str, run_date: str,
+                  pool: EnrichmentPool | CDPEnrichmentPool | None = None, limiter: RateLimiter | None = None,
+                  journal: RunJournal | None = None, sink: RowSink | None = None, city: str = CITY_SLUG,
+                  index: EnrichmentCache | None = None, capture: NetworkCapture | None = None,
+                  lease: LeaseKeeper | None = None) -> int:
+    """
+    Собрать и обогатить выдачу одного запроса. Каждая готовая строка (по порядку выдачи)
+    сразу уходит в sink; возвращается число строк.
+    index — кэш обогащения как индекс фирм: фирмы, уже обогащённые в других запросах или прогонах,
+    берутся из него без браузера (кроме --refresh), каждое появление фирмы в запросе — тег.
+    capture — выдача собирается из ответов каталога, а не из DOM (отрисовку списка не ждём).
+    lease — аренда задачи очереди: если её перехватил другой воркер, запрос обрывается после страницы (LeaseLost).
+    """
+    query_url = build_query_url(city, query)
+    jkey = journal_key(query, city)
     print(f"\n=== QUERY: {query} ===")
     print("URL:", query_url)
 
-    driver.get(query_url)
-    time.sleep(2.5)
-
-    # важное: сброс root между запросами
-    driver.execute_script("window.__twogis_scroll_root = null;")
-    print("pick:", pick_scroll_root(driver))
+    limiter = limiter or RateLimiter()
 
     rows: list[dict] = []
     seen_addr: set[str] = set()
     enriched_count = 0
-    page = 1
-
-    while True:
-        cards = collector.collect_cards_from_root(driver)  # list[dict]
-        time.sleep(random.uniform(0.25, 0.6))
-
-        # 1) добавить новые строки (дедуп по адресу)
-        for c in cards:
-            addr_key = norm_addr(c.get("address", ""))
-            if not addr_key:
-                continue
-            if addr_key in seen_addr:
-                continue
-            seen_addr.add(addr_key)
+    pending = {}  # индекс строки -> Future пула
+    from_index: dict[int, str] = {}  # строка -> firm_id в индексе, если результат взят оттуда (совпадение по адресу — чужой id)
+    emitted = 0   # сколько строк (с начала) уже отдано в sink
+
+    def add_cards(cards: list[dict], page: int):
+        # 1) добавить новые строки (дедуп по адресу — и внутри страницы, и с прошлыми страницами)
+        for c in dedupe_cards(cards, seen_addr):
             c["query"] = query  # обязательная метка источника
             rows.append(c)
 
         print(f"TOTAL | query={query} | page={page} | cards={len(cards)} | rows_total={len(rows)} | seen_addr={len(seen_addr)}")
 
+    def enrich_new_rows():
         # 2) enrichment только новых строк
+        # уже обогащённые в журнале — берём оттуда; без пула — сразу в основном драйвере;
+        # с пулом — ставим в очередь и листаем дальше
+        nonlocal enriched_count
         for row in rows[enriched_count:]:
             if max_enrich is not None and enriched_count >= max_enrich:
                 break
 
-            row["primary_contact"], row["website"] = collector.get_primary_contact(driver, row["firm_id"])
-
-            pc = (row.get("primary_contact") or "").lower()
-            if ("whatsapp" in pc) or ("wa.me" in pc):
-                row["primary_type"] = "wa"
-            elif ("t.me" in pc) or pc.startswith("tg://"):
-                row["primary_type"] = "tg"
-            elif "instagram.com" in pc:
-                row["primary_type"] = "ig"
-            elif "facebook.com" in pc:
-                row["primary_type"] = "fb"
-            elif "vk.com" in pc:
-                row["primary_type"] = "vk"
+            known = journal.enriched_result(row["firm_id"]) if journal is not None else None
+            indexed = None
+            if index is not None and known is None and not collector.force_refresh:
+                indexed = index.lookup(row["firm_id"], row.get("address"), row.get("name"))
+            if known is not None and known["enrich_status"] != "budget_exhausted":
+                row.update(known)  # частичные результаты (кончился бюджет) при --resume пробуем заново
+            elif indexed is not None:
+                # фирма уже встречалась: другой запрос этого прогона или прошлый прогон — только новый тег запроса
+                source = "run" if index.seen_in_run(indexed["firm_id"], run_id) else "prior"
+                index.tag(indexed["firm_id"], query, run_id, source)
+                METRICS.inc("firm_index", result=source)
+                row.update({k: indexed[k] for k in ("primary_contact", "website", "primary_type", "enrich_status")})
+                from_index[enriched_count] = indexed["firm_id"]
+            elif row.get("primary_contact"):
+                # контакт пришёл в ответе каталога (capture) — карточку фирмы не открываем
+                row.update(collector.record_result(row["firm_id"], row["primary_contact"], row.get("website")))
+                if journal is not None:
+                    journal.record_enriched(jkey, row["firm_id"], row["primary_contact"], row["website"],
+                                            row["primary_type"], row["enrich_status"])
+            elif pool is None:
+                row.update(collector.enrich_firm(driver, row["firm_id"]))
+                if journal is not None:
+                    journal.record_enriched(jkey, row["firm_id"], row["primary_contact"], row["website"],
+                                            row["primary_type"], row["enrich_status"])
             else:
-                row["primary_type"] = "none"
+                fut = pool.submit(row["firm_id"])
+                if journal is not None:
+                    fut.add_done_callback(partial(_journal_enriched, journal, jkey, row["firm_id"]))
+                pending[enriched_count] = fut
 
             enriched_count += 1
 
-        # 3) условия остановки по страницам
-        if page >= max_pages:
-            break
-
-        next_page = page + 1
-        if not driver.find_elements(By.XPATH, f"//a[normalize-space()='{next_page}']"):
-            break
-
-        old_first = first_firm_id(driver)
-        click_page(driver, next_page)
-
-        WebDriverWait(driver, 12).until(lambda d: (fid := first_firm_id(d)) and fid != old_first)
-
-        page += 1
-        time.sleep(random.uniform(0.8, 1.6))
+    def emit_ready(final: bool = False):
+        # 4) строки уходят в sink строго в порядке выдачи: как только строка (и все до неё) готова.
+        # final=True — конец запроса: дожидаемся пула и отдаём всё, включая строки сверх max_enrich
+        nonlocal emitted
+        while emitted < len(rows):
+            row = rows[emitted]
+            fut = pending.get(emitted)
+            if fut is not None:
+                if not (final or fut.done()):
+                    break
+                row.update(fut.result())
+                del pending[emitted]
+            elif emitted >= enriched_count and not final:
+                break  # строка ещё не обогащалась
+
+            if index is not None:
+                if emitted not in from_index and row.get("enrich_status"):
+                    index.tag(row["firm_id"], query, run_id, "new", name=row.get("name"), address=row.get("address"))
+                    METRICS.inc("firm_index", result="new")
+                row["queries"] = "; ".join(index.queries_of(from_index.get(emitted, row["firm_id"]))) or query
+
+            # служебные + пустые CRM-колонки
+            enrich_row(row, run_id, run_date, city)
+
+            if sink is not None:
+                sink.write(row)
+            emitted += 1
+
+    if journal is not None and journal.listing_done(jkey):
+        # выдача пролистана в прошлом запуске — листинг восстанавливаем из журнала, браузер не нужен
+        print("RESUME: выдача из журнала, страниц:", journal.listing_pages[jkey])
+        for page in range(1, journal.listing_pages[jkey] + 1):
+            add_cards(journal.page_cards(jkey, page) or [], page)
+        enrich_new_rows()
+        emit_ready()
+    else:
+        if capture is not None:
+            capture.reset()  # ответы каталога прошлого запроса не нужны
+        limiter.wait()
+        with METRICS.timer("query_navigation"):
+            driver.get(query_url)
+
+        # важное: сброс root между запросами
+        driver.execute_script("window.__twogis_scroll_root = null;")
+        if capture is None:
+            if not wait_list_stable(driver, LIST_QUIET_MS, timeout=15):
+                print("WARN: выдача не стабилизировалась за 15 с, собираем как есть")
+            print("pick:", pick_scroll_root(driver))
+        # с capture отрисовку не ждём: карточки — из ответа каталога, root для пагинации подберёт first_firm_id
+
+        page = 1
+        listed_firms = 0  # сколько фирм уже собрано по запросу (с capture — для остановки по total каталога)
+        while True:
+            cards = journal.page_cards(jkey, page) if journal is not None else None
+            if cards is None:
+                if capture is not None:
+                    cards = collector.collect_cards_from_network(capture)
+                    if cards is None:
+                        print("WARN: ответ каталога не пойман, собираем из DOM")
+                        wait_list_stable(driver, LIST_QUIET_MS, timeout=15)
+                        pick_scroll_root(driver)
+                if cards is None:
+                    cards = collector.collect_cards_from_root(driver, incremental=True)  # только новые фирмы, list[dict]
+                if journal is not None:
+                    journal.record_page(jkey, page, cards)
+            listed_firms += len(cards)
+
+            add_cards(cards, page)
+            enrich_new_rows()
+            emit_ready()
+            if lease is not None:
+                lease.check()  # задачу отдали другому воркеру — дальше не листаем
+
+            # 3) условия остановки по страницам
+            if page >= max_pages:
+                break
 
-    return pd.DataFrame(rows)
+            next_page = page + 1
+            if capture is not None:
+                if capture.listing_complete(listed_firms):
+                    break  # каталог отдал всю выдачу
+                # карточки пришли раньше отрисовки — ссылке пагинации даём время появиться
+                try:
+                    WebDriverWait(driver, 5).until(
+                        lambda d: d.find_elements(By.XPATH, f"//a[normalize-space()='{next_page}']"))
+                except TimeoutException:
+                    break
+            elif not driver.find_elements(By.XPATH, f"//a[normalize-space()='{next_page}']"):
+                break
 
-def main():
+            old_first = first_firm_id(driver) if capture is None else None
+            limiter.wait()
+            with METRICS.timer("page_switch"):
+                click_page(driver, next_page)
+
+                # 1) выдача сменилась (первая фирма другая), 2) перерисовка закончилась;
+                # с capture смену страницы подтверждает следующий ответ каталога
+                if capture is None:
+                    try:
+                        WebDriverWait(driver, 12).until(lambda d: (fid := first_firm_id(d)) and fid != old_first)
+                    except TimeoutException:
+                        METRICS.inc("timeouts", stage="page_switch")
+                        raise
+                    wait_list_stable(driver, LIST_QUIET_MS)
+
+            page += 1
+
+        if journal is not None:
+            journal.record_listing_done(jkey, page)
+
+    # дожидаемся пула и отдаём хвост (порядок строк сохраняется)
+    emit_ready(final=True)
+
+    if journal is not None and jkey not in journal.done_queries:
+        journal.record_query_done(jkey)  # при пересборке готового запроса из журнала запись не дублируем
+
+    return len(rows)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный сбор лидов 2GIS по queries.txt")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="число отдельных Chrome для обогащения (0 = в основном драйвере)")
+    parser.add_argument("--cdp-tabs", type=int, default=CDP_TABS,
+                        help="обогащать K параллельными вкладками основного Chrome через CDP (0 = выкл.; важнее --workers)")
+    parser.add_argument("--firm-budget", type=float, default=FIRM_BUDGET,
+                        help="бюджет секунд на обогащение одной фирмы; по истечении — частичный результат (0 = без бюджета)")
+    parser.add_argument("--cache-ttl-hours", type=float, default=CACHE_TTL_HOURS,
+                        help="срок жизни кэша обогащения по firm_id (0 = без срока)")
+    parser.add_argument("--network-capture", action="store_true", default=NETWORK_CAPTURE,
+                        help="собирать выдачу из ответов каталога 2GIS (performance-лог Chrome), а не из DOM")
+    parser.add_argument("--no-firm-index", action="store_true",
+                        help="не вести индекс фирм: без тегов запросов, колонки queries по всем запросам и отчёта firm_index.json")
+    parser.add_argument("--refresh", action="store_true",
+                        help="игнорировать кэш обогащения и заново открыть карточки")
+    parser.add_argument("--http-first", action="store_true",
+                        help="сначала брать контакты из статической карточки по HTTP, Chrome — только если их нет")
+    parser.add_argument("--intercept-popups", action="store_true",
+                        help="кликать кнопки контактов за один проход с перехватом window.open, без новых вкладок")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL,
+                        help="минимум секунд между навигациями по 2GIS (вежливость)")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="случайная добавка к --min-interval, сек")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS, help="Chrome без окна")
+    parser.add_argument("--eager", action="store_true", default=EAGER_LOAD,
+                        help="pageLoadStrategy=eager: не ждать картинок и прочей догрузки")
+    parser.add_argument("--block-resources", action="store_true", default=BLOCK_RESOURCES,
+                        help="блокировать картинки, шрифты, тайлы карты и трекеры")
+    parser.add_argument("--disk-cache-dir", type=Path, default=DISK_CACHE_DIR,
+                        help="каталог HTTP-кэша Chrome, общий между запусками")
+    parser.add_argument("--check-sites", action="store_true", default=CHECK_SITES,
+                        help="проверить сайты фирм (жив / редирект / припаркован / мёртв) перед выгрузкой xlsx")
+    parser.add_argument("--crawl-contacts", action="store_true", default=CRAWL_CONTACTS,
+                        help="обойти сайты фирм (до CRAWL_MAX_PAGES страниц, с учётом robots.txt) за почтой и телефонами")
+    parser.add_argument("--stream-format", choices=sorted(SINK_SUFFIXES), default=STREAM_FORMAT,
+                        help="формат потоков строк data/streams/<run_id>/ (xlsx строятся из них)")
+    parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                        help="продолжить прерванный прогон по его журналу data/runs/<RUN_ID>.jsonl")
+    parser.add_argument("--trace-webdriver", action="store_true",
+                        help="трассировать команды WebDriver (стеки по методам, сводка по фирмам) в data/traces/<run_id>/")
+    parser.add_argument("--queue", type=Path, default=None,
+                        help="брать запросы из общей очереди (SQLite-файл, можно на общем диске) вместо START_LINE/END_LINE")
+    parser.add_argument("--seed", action="store_true",
+                        help="с --queue: добавить в очередь все запросы из queries.txt (повторы пропускаются)")
+    parser.add_argument("--worker-id", default=None, help="имя воркера в очереди (по умолчанию host:pid)")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS,
+                        help="срок аренды задачи очереди; не продлённая аренда (воркер упал) отдаётся другому")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # сборщик (и его кэш обогащения в cache/) создаётся только при запуске, не при импорте скрипта
+    collector = TwoGisLeadCollector("интернет магазин", "cache")
+    collector.cache.ttl = args.cache_ttl_hours * 3600 if args.cache_ttl_hours > 0 else None
+    collector.force_refresh = args.refresh
+    collector.http_first = args.http_first
+    collector.intercept_popups = args.intercept_popups
+    collector.firm_budget = args.firm_budget if args.firm_budget > 0 else None
     queries = read_queries(QUERIES_PATH)
-    selected = queries[START_LINE - 1: END_LINE] if False else queries[START_LINE - 1: END_LINE + 1]  # END включительно
-    print("Selected queries:", selected)
-
-    options = Options()
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_argument("--start-maximized")
-
-    driver = webdriver.Chrome(options=options)
-
-    try:
-        all_frames = []
-
-        run_id = time.strftime("%Y-%m-%d_%H-%M")
+    queue = None
+    if args.queue is not None:
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=MAX_ATTEMPTS)
+        if args.seed:
+            print("QUEUE seeded:", queue.seed(queries, CITY_SLUG), "новых задач")
+        worker_id = args.worker_id or default_worker_id()
+        print(f"QUEUE {args.queue} | worker={worker_id} |", queue.progress())
+    else:
+        selected = queries[START_LINE - 1: END_LINE] if False else queries[START_LINE - 1: END_LINE + 1]  # END включительно
+        print("Selected queries:", selected)
+
+    make_driver = partial(
+        make_chrome_driver,
+        headless=args.headless,
+        eager=args.eager,
+        block_resources=args.block_resources,
+        disk_cache_dir=args.disk_cache_dir,
+    )
+    if args.block_resources:
+        collector.new_tab_hook = block_resources_in_tab
+
+    traces: list[WebDriverTrace] = []
+    if args.trace_webdriver:
+        untraced_driver = make_driver
+
+        def make_driver(**kwargs):
+            d = untraced_driver(**kwargs)
+            traces.append(WebDriverTrace(d, keep_records=False))
+            return d
+
+    # performance-лог — только у основного драйвера: у воркеров пула его никто не читал бы
+    driver = make_driver(perf_log=args.network_capture)
+    capture = NetworkCapture(driver) if args.network_capture else None
+    limiter = RateLimiter(args.min_interval, args.jitter)
+    # листинг/пагинация идут в основном драйвере, обогащение — параллельно в пуле
+    if args.cdp_tabs > 0:
+        # один браузер: выдача — в Selenium-вкладке, карточки — в K CDP-вкладках того же Chrome
+        pool = CDPEnrichmentPool.from_driver(collector, driver, tabs=args.cdp_tabs,
+                                             block_resources=args.block_resources)
+    else:
+        pool = EnrichmentPool(collector, make_driver, args.workers) if args.workers > 0 else None
+
+    run_id = args.resume or time.strftime("%Y-%m-%d_%H-%M")
+    if queue is not None and not args.resume:
+        # несколько воркеров стартуют в одну минуту — у каждого свой журнал и свои потоки
+        run_id += "_" + "".join(ch if ch.isalnum() else "_" for ch in worker_id)
+    journal_path = OUT_DIR / "runs" / f"{run_id}.jsonl"
+    if args.resume and not journal_path.exists():
+        raise SystemExit(f"Нет журнала для --resume: {journal_path}")
+    journal = RunJournal(journal_path)
+    # индекс фирм — тот же кэш обогащения: --refresh только не берёт из него результаты, теги пишутся как обычно
+    index = collector.cache if FIRM_INDEX and not args.no_firm_index else None
+    if args.resume:
+        run_date = journal.meta.get("run_date") or time.strftime("%Y-%m-%d")
+        print(f"RESUME {run_id}: готово запросов={len(journal.done_queries)} | обогащено фирм={len(journal.enriched)}")
+    else:
         run_date = time.strftime("%Y-%m-%d")
+        journal.record_run(run_id=run_id, run_date=run_date)
+
+    # строки пишутся потоками по мере обогащения; xlsx по запросу и мастер строятся из потоков
+    stream_dir = OUT_DIR / "streams" / run_id
+    suffix = SINK_SUFFIXES[args.stream_format]
+    master_stream = stream_dir / f"master{suffix}"
+    master_sink = open_sink(master_stream, args.stream_format)
+
+    # метрики: JSON-сводка на каждый запрос и итог прогона (.prom + .json) в data/metrics/<run_id>/
+    metrics_dir = OUT_DIR / "metrics" / run_id
+    run_metrics = Metrics()
+    METRICS.reset()
+
+    # проверка и обход сайтов: кэши по домену общие между прогонами; в xlsx — колонки рядом с website
+    checker = crawler = None
+    site_columns = []
+    if args.check_sites:
+        checker = SiteChecker(workers=SITE_CHECK_WORKERS, per_host=SITE_CHECK_PER_HOST,
+                              cache=SiteCheckCache(OUT_DIR / "site_checks.sqlite"))
+        site_columns += ["website_status", "website_final"]
+    if args.crawl_contacts:
+        crawler = ContactCrawler(max_pages=CRAWL_MAX_PAGES, concurrency=CRAWL_CONCURRENCY,
+                                 per_domain=CRAWL_PER_DOMAIN, cache=CrawlCache(OUT_DIR / "site_contacts.sqlite"))
+        site_columns += ["emails", "phones"]
+    at = LEAD_COLUMNS.index("website") + 1
+    export_columns = [*LEAD_COLUMNS[:at], *site_columns, *LEAD_COLUMNS[at:]]
+
+    def site_stage(stream: Path) -> None:
+        """Проверка и обход сайтов строк потока перед выгрузкой xlsx (результаты остаются в checker / crawler)."""
+        if checker is None and crawler is None:
+            return
+        websites = [r.get("website") for r in iter_rows(stream)]
+        if checker is not None:
+            sites = checker.check_many(websites)
+            print("SITES:", dict(Counter(r["site_status"] for r in sites.values())))
+            # мёртвые и припаркованные сайты не обходим; живые — по конечному URL после редиректов
+            websites = [sites[w]["final_url"] for w in websites
+                        if w and sites[w]["site_status"] in ("ok", "redirected")]
+        if crawler is not None:
+            crawled = crawler.crawl_many(websites)
+            print("CONTACTS:", sum(bool(r["emails"] or r["phones"]) for r in crawled.values()),
+                  "сайтов с почтой/телефоном из", len(crawled))
+        run_metrics.merge(METRICS)
+        METRICS.reset()
+
+    def export_rows(stream: Path):
+        rows = iter_rows(stream)
+        if checker is not None:
+            rows = map(checker.annotate, rows)
+        if crawler is not None:
+            rows = map(crawler.annotate, rows)
+        return rows
+
+    def append_to_master(stream: Path) -> int:
+        """Строки готового запроса — в мастер-поток (только после того, как запрос принят целиком)."""
+        n = 0
+        for row in iter_rows(stream):
+            master_sink.write(row)
+            n += 1
+        return n
+
+    def process_query(q: str, city: str, lease: LeaseKeeper | None = None) -> int:
+        stem = file_stem(q, city)
+        out_path = OUT_DIR / f"firms_{stem}.xlsx"
+        query_stream = stream_dir / f"firms_{stem}{suffix}"
+
+        if journal_key(q, city) in journal.done_queries:
+            if query_stream.exists():
+                # запрос готов в этом прогоне: его поток переносится в мастер как есть, xlsx — только если его нет
+                print(f"SKIP (done in {run_id}): {q}")
+                n = append_to_master(query_stream)
+                if not out_path.exists():
+                    site_stage(query_stream)
+                    rows_to_excel(export_rows(query_stream), out_path, export_columns)
+                return n
+            print(f"REBUILD (done in {run_id}, потока нет): {q} — строки восстанавливаются из журнала без браузера")
+
+        query_sink = open_sink(query_stream, args.stream_format)
+        try:
+            run_one_query(driver, collector, q, MAX_PAGES, MAX_ENRICH, run_id, run_date, pool=pool, limiter=limiter,
+                          journal=journal, sink=query_sink, city=city, index=index, capture=capture, lease=lease)
+        finally:
+            query_sink.close()
+            METRICS.write(metrics_dir / f"firms_{stem}.json")
+            run_metrics.merge(METRICS)
+            METRICS.reset()
+        if lease is not None:
+            lease.check()  # аренду потеряли на хвосте пула — результат не наш
+
+        append_to_master(query_stream)
+        site_stage(query_stream)
+        n = rows_to_excel(export_rows(query_stream), out_path, export_columns)
+        print("Saved:", out_path, "rows:", n)
+        print("CACHE:", collector.cache.stats())
+        return n
 
-        for q in selected:
-            df = run_one_query(driver, collector, q, MAX_PAGES, MAX_ENRICH, run_id, run_date)
-
-            safe_name = "".join(ch if ch.isalnum() else "_" for ch in q)[:60]
-            out_path = OUT_DIR / f"firms_{safe_name}.xlsx"
-
-            # --- служебные ---
-            df["run_id"] = run_id
-            df["run_date"] = run_date
-            df["city"] = CITY_SLUG
-
-            # --- CRM (пустые) ---
-            for col in ["outreach_status", "outreach_date", "channel_used", "note"]:
-                if col not in df.columns:
-                    df[col] = ""
-
-            df.to_excel(out_path, index=False)
-            print("Saved:", out_path, "rows:", len(df))
-
-            all_frames.append(df)
-
-        master = pd.concat(all_frames, ignore_index=True) if all_frames else pd.DataFrame()
-        master_path = OUT_DIR / f"firms_master_{START_LINE}_{END_LINE}_{run_id}.xlsx"
-        master.to_excel(master_path, index=False)
-        print("MASTER Saved:", master_path, "rows:", len(master))
+    try:
+        if queue is None:
+            for q in selected:
+                process_query(q, CITY_SLUG)
+        else:
+            # берём задачи, пока очередь не опустеет; упавший запрос возвращается в очередь (или failed)
+            while (job := queue.lease(worker_id)) is not None:
+                print(f"QUEUE lease #{job['id']}: {job['query']} ({job['city']}), попытка {job['attempts']}")
+                try:
+                    with LeaseKeeper(queue, job) as keeper:
+                        n = process_query(job["query"], job["city"], lease=keeper)
+                except LeaseLost:
+                    # задачу уже обрабатывает другой воркер: наш частичный поток выбрасываем, в мастер он не попал
+                    stream = stream_dir / f"firms_{file_stem(job['query'], job['city'])}{suffix}"
+                    stream.unlink(missing_ok=True)
+                    print(f"QUEUE lost #{job['id']}: {job['query']} — результат отброшен")
+                    continue
+                except BaseException as e:
+                    queue.fail(job, f"{type(e).__name__}: {e}")
+                    raise  # драйвер после сбоя ненадёжен — воркер выходит, задачу возьмёт другой
+                if not queue.complete(job, rows=n):
+                    print(f"WARN: задача #{job['id']} завершена, но аренда к этому моменту уже истекла")
+                print("QUEUE:", queue.progress())
+
+        master_sink.close()
+        master_tag = "queue" if queue is not None else f"{START_LINE}_{END_LINE}"
+        master_path = OUT_DIR / f"firms_master_{master_tag}_{run_id}.xlsx"
+        site_stage(master_stream)  # сайты запросов уже в памяти — досматривается только новое
+        n = rows_to_excel(export_rows(master_stream), master_path, export_columns)
+        print("MASTER Saved:", master_path, "rows:", n)
 
     finally:
+        master_sink.close()
+        run_metrics.merge(METRICS)  # метрики оборванного запроса тоже попадают в итог
+        run_metrics.write(metrics_dir / "run.prom")
+        print("METRICS:", run_metrics.write(metrics_dir / "run.json"))
+        if pool is not None:
+            pool.close()
+        if checker is not None:
+            checker.close()
+        if crawler is not None:
+            crawler.close()
         driver.quit()
+        journal.close()
+        if index is not None:
+            print("FIRM INDEX:", index.write_report(run_id, metrics_dir / "firm_index.json"))
+        if queue is not None:
+            queue.close()
+        for i, trace in enumerate(traces):
+            trace_dir = OUT_DIR / "traces" / run_id
+            trace.write_folded(trace_dir / f"driver{i}.folded")
+            trace.write_folded(trace_dir / f"driver{i}_ms.folded", weight="ms")
+            print("TRACE:", trace.write_summary(trace_dir / f"driver{i}.json"), "| commands:", trace.total())
 
 if __name__ == "__main__":
     # selected = queries[START_LINE - 1: END_LINE + 1]  # END включительно
@@ -1,12 +1,13 @@
 import time
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 import random
 import pandas as pd
 from pathlib import Path
 from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+from astana_2gis_leads.browser import block_resources_in_tab, make_chrome_driver
+from astana_2gis_leads.postprocess import dedupe_cards, enrich_columns
+from astana_2gis_leads.sinks import rows_to_excel
 from astana_2gis_leads.selenium_helpers import (
     pick_scroll_root,
     first_firm_id,
@@ -18,6 +19,12 @@ QUERY_URL = "https://2gis.kz/astana/search/%D0%B8%D0%BD%D1%82%D0%B5%D1%80%D0%BD%
 MAX_PAGES = 3
 CITY_SLUG = "astana"
 
+# профиль браузера (см. browser.make_chrome_driver)
+HEADLESS = False
+EAGER_LOAD = False
+BLOCK_RESOURCES = False
+DISK_CACHE_DIR = None
+
 # def pick_scroll_root(driver):
 #     return driver.execute_script("""
 #     return (function () {
@@ -77,10 +84,14 @@ collector = TwoGisLeadCollector("интернет магазин", "cache")
 #     # ВАЖНО: сбрасываем кэш root, потому что выдача перерисуется
 #     driver.execute_script("window.__twogis_scroll_root = null;")
 
-options = Options()
-options.add_argument("--disable-blink-features=AutomationControlled")
-options.add_argument("--start-maximized")
-driver = webdriver.Chrome(options=options)
+driver = make_chrome_driver(
+    headless=HEADLESS,
+    eager=EAGER_LOAD,
+    block_resources=BLOCK_RESOURCES,
+    disk_cache_dir=DISK_CACHE_DIR,
+)
+if BLOCK_RESOURCES:
+    collector.new_tab_hook = block_resources_in_tab
 
 driver.get(QUERY_URL)
 time.sleep(3)
@@ -128,20 +139,9 @@ while True:
     run_id = time.strftime("%Y-%m-%d_%H-%M")
     out_path = out_dir / f"firms_firms_page__{run_id}.xlsx"
 
-    def norm_addr(s: str) -> str:
-        return " ".join((s or "").lower().replace("\xa0", " ").split())
-
-    for index, c in enumerate(cards):
-        # if index == 0:
-        #     print("RAW ADDRESS:", repr(c.get("address")))
-        addr_key = norm_addr(c.get("address", ""))
-        if not addr_key:
-            continue
-        if addr_key in seen_addr:
-            continue
-        seen_addr.add(addr_key)
-        rows.append(c)
-        print(f"TOTAL | page={page} | cards={len(cards)} | rows_total={len(rows)} | seen_addr={len(seen_addr)}")
+    # дедуп по адресу (внутри страницы и с прошлыми страницами) — см. postprocess
+    rows += dedupe_cards(cards, seen_addr)
+    print(f"TOTAL | page={page} | cards={len(cards)} | rows_total={len(rows)} | seen_addr={len(seen_addr)}")
     # Переменная определяет - сколько первых компаний будет обогащено контактами (website и мессенжеры)
     MAX_ENRICH = 750
 
@@ -150,40 +150,19 @@ while True:
             break
         # print("ENRICH PLAN", type(rows), len(rows), [r.get("firm_id") for r in rows[:3]])
         row["primary_contact"], row["website"] = collector.get_primary_contact(driver, row["firm_id"])
-        pc = (row.get("primary_contact") or "").lower()
-        if ("whatsapp" in pc) or ("wa.me" in pc):
-            row["primary_type"] = "wa"
-        elif ("t.me" in pc) or pc.startswith("tg://"):
-            row["primary_type"] = "tg"
-        elif "instagram.com" in pc:
-            row["primary_type"] = "ig"
-        elif "facebook.com" in pc:
-            row["primary_type"] = "fb"
-        elif "vk.com" in pc:
-            row["primary_type"] = "vk"
-        else:
-            row["primary_type"] = "none"
         enriched_count += 1
-        print(f"ENRICH | firm_id={row.get('firm_id')} | type={row.get('primary_type')} | primary={row.get('primary_contact')} | website={row.get('website')}")
+        print(f"ENRICH | firm_id={row.get('firm_id')} | primary={row.get('primary_contact')} | website={row.get('website')}")
 
     enriched_count = len(rows)
 
     run_id = time.strftime("%Y-%m-%d_%H-%M")
     run_date = time.strftime("%Y-%m-%d")
 
-    df = pd.DataFrame(rows)
-
-    # --- служебные ---
-    df["run_id"] = run_id
-    df["run_date"] = run_date
-    df["city"] = CITY_SLUG
-
-    # --- CRM (пустые) ---
-    for col in ["outreach_status", "outreach_date", "channel_used", "note"]:
-        if col not in df.columns:
-            df[col] = ""
+    # primary_type, служебные и пустые CRM-колонки — одной векторной операцией над фреймом
+    df = enrich_columns(pd.DataFrame(rows), run_id, run_date, CITY_SLUG)
 
-    df.to_excel(out_path, index=False)
+    # один проход write-only книгой, сразу таблицей LeadsTable (NaN -> пустая ячейка, как в to_excel)
+    rows_to_excel(df.astype(object).where(df.notna(), None).to_dict("records"), out_path, [str(c) for c in df.columns])
 
     print("Saved:", out_path, "rows:", len(rows))
 
@@ -1,5 +1,9 @@
 from selenium.webdriver.common.by import By
 
+from astana_2gis_leads.metrics import METRICS, timed
+
+
+@timed("pick_scroll_root")
 def pick_scroll_root(driver):
     return driver.execute_script("""
     return (function () {
@@ -18,6 +22,8 @@ def pick_scroll_root(driver):
     })();
     """)
 
+
+@timed("click_page")
 def click_page(driver, n: int):
     el = driver.find_element(By.XPATH, f"//a[normalize-space()='{n}']")
     driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
@@ -25,6 +31,8 @@ def click_page(driver, n: int):
     # ВАЖНО: сбрасываем кэш root, потому что выдача перерисуется
     driver.execute_script("window.__twogis_scroll_root = null;")
 
+
+@timed("first_firm_id")
 def first_firm_id(driver):
     return driver.execute_script(r"""
     function pickRoot(){
@@ -55,4 +63,96 @@ def first_firm_id(driver):
     const h = a.getAttribute("href") || "";
     const m = h.match(/\/firm\/(\d+)/);
     return m ? m[1] : null;
-    """)
\ No newline at end of file
+    """)
+
+
+# Готовность выдачи: MutationObserver на root (пока его нет — на body).
+# arguments[0] — quiet_ms, arguments[1] — timeout в мс; результат — true/false
+WAIT_LIST_STABLE_JS = r"""
+    const quietMs = arguments[0];
+    const timeoutMs = arguments[1];
+    const done = arguments[arguments.length - 1];
+
+    function pickRoot(){
+        const nodes = Array.from(document.querySelectorAll("div._jdkjbol"));
+        if (!nodes.length) return null;
+
+        let best = null;
+        let bestW = -1;
+        for (const el of nodes) {
+            const w = el.getBoundingClientRect().width || 0;
+            if (w > bestW) { bestW = w; best = el; }
+        }
+        return best;
+    }
+    function currentRoot(){
+        let root = window.__twogis_scroll_root;
+        if (!root || !root.isConnected) {
+            root = pickRoot();
+            window.__twogis_scroll_root = root;
+        }
+        return root;
+    }
+
+    let observed = null;
+    let quietTimer = null;
+    const obs = new MutationObserver(onMutations);
+    const hardTimer = setTimeout(() => finish(false), timeoutMs);
+
+    function finish(ok){
+        obs.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(hardTimer);
+        done(ok);
+    }
+    function observe(target){
+        if (observed === target) return;
+        obs.disconnect();
+        obs.observe(target, { childList: true, subtree: true, characterData: true });
+        observed = target;
+    }
+    function onMutations(){
+        // пока смотрим на body — как только root отрисовался, переключаемся на него
+        if (observed === document.body) {
+            const root = currentRoot();
+            if (root) observe(root);
+        }
+        arm();
+    }
+    function arm(){
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(check, quietMs);
+    }
+    function check(){
+        const root = currentRoot();
+        if (root && root.querySelector('a[href*="/firm/"]')) {
+            if (observed === root) { finish(true); return; }
+            observe(root);  // root появился только что — выдерживаем тишину уже на нём
+        }
+        arm();
+    }
+
+    const root = currentRoot();
+    observe(root || document.body);
+    arm();
+"""
+
+
+@timed("wait_list_stable")
+def wait_list_stable(driver, quiet_ms: int = 300, timeout: float = 12) -> bool:
+    """
+    Готовность выдачи по событиям, а не по sleep: MutationObserver на window.__twogis_scroll_root
+    ждёт, пока в выдаче появятся фирмы и DOM не меняется quiet_ms миллисекунд.
+    Пока root ещё не отрисован — наблюдаем за document.body и переключаемся на root, как только он появится.
+    True — выдача стабилизировалась, False — вышел timeout.
+    """
+    # script timeout общий на всю сессию драйвера — после ожидания возвращаем прежний
+    previous_timeout = driver.timeouts.script
+    driver.set_script_timeout(timeout + 2)
+    try:
+        ready = bool(driver.execute_async_script(WAIT_LIST_STABLE_JS, quiet_ms, int(timeout * 1000)))
+    finally:
+        driver.set_script_timeout(previous_timeout)
+    if not ready:
+        METRICS.inc("timeouts", stage="wait_list_stable")
+    return ready
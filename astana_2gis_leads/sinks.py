@@ -0,0 +1,209 @@
+import csv
+import json
+import warnings
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet — опционально, JSONL/CSV работают без pyarrow
+    pa = pq = None
+
+# Пустые колонки под ручную работу с лидом в CRM
+CRM_COLUMNS = ["outreach_status", "outreach_date", "channel_used", "note"]
+
+# Колонки лида в выгрузках run_batch (в этом порядке)
+LEAD_COLUMNS = [
+    "firm_url", "firm_id", "name", "address", "primary_contact", "query", "queries",
+    "website", "primary_type", "enrich_status",
+    "run_id", "run_date", "city",
+    *CRM_COLUMNS,
+]
+
+
+class RowSink(ABC):
+    """
+    Потоковый приёмник строк: write(row) сразу отправляет строку на диск,
+    ничего не копится в памяти дольше, чем нужно формату (Parquet — одна группа строк).
+    """
+
+    @abstractmethod
+    def write(self, row: dict) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonlSink(RowSink):
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w", encoding="utf-8")
+
+    def write(self, row: dict) -> None:
+        self._fh.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._fh.flush()  # строка видна на диске сразу, а не в конце прогона
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class CsvSink(RowSink):
+    def __init__(self, path: str | Path, columns: list[str] = LEAD_COLUMNS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.DictWriter(self._fh, fieldnames=columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, row: dict) -> None:
+        self._writer.writerow(row)
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class ParquetSink(RowSink):
+    """Parquet по группам строк: буфер до row_group_size строк, затем одна row group на диск."""
+
+    def __init__(self, path: str | Path, columns: list[str] = LEAD_COLUMNS, row_group_size: int = 5000):
+        if pa is None:
+            raise RuntimeError("Для ParquetSink нужен pyarrow: pip install pyarrow")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self._schema = pa.schema([(c, pa.string()) for c in columns])
+        self._writer = pq.ParquetWriter(str(self.path), self._schema)
+        self._buffer: list[dict] = []
+
+    def write(self, row: dict) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        data = {
+            c: [None if r.get(c) is None else str(r.get(c)) for r in self._buffer]
+            for c in self.columns
+        }
+        self._writer.write_table(pa.Table.from_pydict(data, schema=self._schema))
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+
+
+class MultiSink(RowSink):
+    """Одна строка — во все приёмники (например, поток запроса + общий поток прогона)."""
+
+    def __init__(self, *sinks: RowSink):
+        self.sinks = sinks
+
+    def write(self, row: dict) -> None:
+        for s in self.sinks:
+            s.write(row)
+
+    def close(self) -> None:
+        for s in self.sinks:
+            s.close()
+
+
+SINK_SUFFIXES = {"jsonl": ".jsonl", "csv": ".csv", "parquet": ".parquet"}
+
+
+def open_sink(path: str | Path, fmt: str = "jsonl", columns: list[str] = LEAD_COLUMNS) -> RowSink:
+    """Приёмник по имени формата: jsonl / csv / parquet."""
+    if fmt == "jsonl":
+        return JsonlSink(path)
+    if fmt == "csv":
+        return CsvSink(path, columns)
+    if fmt == "parquet":
+        return ParquetSink(path, columns)
+    raise ValueError(f"Неизвестный формат потока: {fmt}")
+
+
+def iter_rows(path: str | Path) -> Iterator[dict]:
+    """Прочитать поток обратно по одной строке (формат — по расширению файла)."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if pq is None:
+            raise RuntimeError("Для чтения Parquet нужен pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(str(path)).iter_batches():
+            yield from batch.to_pylist()
+    elif path.suffix == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            yield from csv.DictReader(fh)
+    else:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Оформление выгрузок: умная таблица Excel с фильтрами и чередованием строк
+TABLE_NAME = "LeadsTable"
+TABLE_STYLE = "TableStyleMedium9"
+
+
+def leads_table(columns: list[str], n_rows: int, name: str = TABLE_NAME, style: str = TABLE_STYLE) -> Table:
+    """
+    Таблица Excel на A1:<последняя колонка><последняя строка>.
+    Буквы колонок — get_column_letter (AA, AB, ... после Z). Колонки таблицы задаются явно:
+    write-only лист не читает заголовки обратно из ячеек. Пустая выгрузка — таблица с одной пустой строкой
+    (таблица из одного заголовка Excel считает повреждённой).
+    """
+    ref = f"A1:{get_column_letter(len(columns))}{max(n_rows, 1) + 1}"
+    table = Table(displayName=name, ref=ref)
+    table.tableColumns = [TableColumn(id=i, name=str(c)) for i, c in enumerate(columns, start=1)]
+    table.tableStyleInfo = TableStyleInfo(
+        name=style,
+        showFirstColumn=False,
+        showLastColumn=False,
+        showRowStripes=True,
+        showColumnStripes=False,
+    )
+    return table
+
+
+def rows_to_excel(rows: Iterable[dict], path: str | Path, columns: list[str] = LEAD_COLUMNS,
+                  table_name: str | None = TABLE_NAME) -> int:
+    """
+    Выгрузить поток строк в .xlsx за один проход через write-only книгу (в памяти одна строка за раз).
+    table_name — оформить лист умной таблицей (диапазон известен после последней строки, до сохранения),
+    None — просто данные.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columns)
+    n = 0
+    for row in rows:
+        ws.append([row.get(c) for c in columns])
+        n += 1
+    if table_name and columns:
+        with warnings.catch_warnings():
+            # openpyxl предупреждает о колонках таблицы в write-only режиме — leads_table задаёт их сама
+            warnings.filterwarnings("ignore", "In write-only mode", UserWarning)
+            ws.add_table(leads_table(columns, n, table_name))
+    wb.save(path)
+    return n
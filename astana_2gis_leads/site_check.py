@@ -0,0 +1,259 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from astana_2gis_leads.metrics import METRICS
+
+# Проверка сайта живёт меньше контактов: домены протухают и паркуются быстрее, чем меняются мессенджеры
+DEFAULT_TTL = 24 * 3600
+MAX_REDIRECTS = 10
+# Сколько байт тела читаем ради распознавания припаркованного домена (дальше страница не нужна)
+BODY_SNIFF_BYTES = 64 * 1024
+
+# Хостинги парковки и тексты заглушек «домен продаётся»
+PARKING_HOSTS = ("sedo.com", "sedoparking.com", "dan.com", "afternic.com", "parkingcrew.net", "bodis.com",
+                 "hugedomains.com", "parking.reg.ru", "parking.nic.ru")
+PARKED_MARKERS = (
+    "domain is for sale", "this domain may be for sale", "buy this domain", "domain parking", "parked domain",
+    "sedoparking", "parkingcrew", "домен продается", "домен продаётся", "этот домен продаётся",
+    "домен припаркован", "домен зарегистрирован", "hosting.kz/domain", "ps.kz/domains",
+)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+
+def domain_of(url: str | None) -> str:
+    """Ключ кэша: хост без www. и без порта, в нижнем регистре ("" — не URL)."""
+    host = (urlsplit(url or "").hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _is_parked(final_url: str, body: bytes) -> bool:
+    host = domain_of(final_url)
+    if any(host == h or host.endswith("." + h) for h in PARKING_HOSTS):
+        return True
+    text = body.decode("utf-8", "ignore").lower()
+    return any(marker in text for marker in PARKED_MARKERS)
+
+
+class SiteCheckCache:
+    """
+    Дисковый кэш проверок по URL (SQLite), по образцу EnrichmentCache:
+    записи старше ttl — промах, одно соединение под локом на все потоки проверки.
+    dead_domain — свежая проверка «мёртвый» любого URL домена: сеть/DNS у домена общие.
+    """
+
+    def __init__(self, path: str | Path, ttl: float | None = DEFAULT_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # прежний кэш по домену отдавал всем URL домена final_url первого из них — не переносится
+        self._conn.execute("DROP TABLE IF EXISTS site_checks")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS url_checks (
+                url TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                site_status TEXT NOT NULL,
+                http_status INTEGER,
+                final_url TEXT,
+                redirects INTEGER,
+                latency_ms REAL,
+                error TEXT,
+                checked_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS url_checks_dead ON url_checks(domain) WHERE site_status = 'dead';
+            """
+        )
+        self._conn.commit()
+
+    def _fresh(self, row) -> dict | None:
+        if row is None or (self.ttl is not None and time.time() - row[8] > self.ttl):
+            return None
+        return {"url": row[0], "domain": row[1], "site_status": row[2], "http_status": row[3], "final_url": row[4],
+                "redirects": row[5], "latency_ms": row[6], "error": row[7]}
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, domain, site_status, http_status, final_url, redirects, latency_ms, error, checked_at"
+                " FROM url_checks WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return self._fresh(row)
+
+    def dead_domain(self, domain: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, domain, site_status, http_status, final_url, redirects, latency_ms, error, checked_at"
+                " FROM url_checks WHERE domain = ? AND site_status = 'dead' ORDER BY checked_at DESC LIMIT 1",
+                (domain,),
+            ).fetchone()
+        return self._fresh(row)
+
+    def put(self, result: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO url_checks"
+                " (url, domain, site_status, http_status, final_url, redirects, latency_ms, error, checked_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result["url"], result["domain"], result["site_status"], result["http_status"], result["final_url"],
+                 result["redirects"], result["latency_ms"], result["error"], time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SiteChecker:
+    """
+    Проверка сайтов фирм после обогащения: жив ли сайт, куда ведут редиректы, не припаркован ли домен.
+    - пул keep-alive соединений requests (один Session на все потоки), workers параллельных проверок
+    - не больше per_host одновременных запросов к одному хосту — и на каждом шаге редиректа
+      (редиректы разбираются вручную, иначе общий хост парковки или соцсети получил бы всю пачку разом)
+    - каждый URL проверяется один раз: результат кэшируется по URL (в памяти и, если задан cache, на диске);
+      у разных страниц одного хоста (kaspi.kz/shop/a и kaspi.kz/shop/b) свои статус и final_url
+    - мёртвый домен (сеть, DNS, таймаут) — мёртв для всех своих URL: они не запрашиваются заново
+    Результат: {"url", "domain", "site_status", "http_status", "final_url", "redirects", "latency_ms", "error"},
+    site_status: ok / redirected (конечный домен другой) / parked / http_error (4xx/5xx) / dead (сеть, DNS, таймаут).
+    """
+
+    def __init__(self, workers: int = 64, per_host: int = 2, timeout: tuple[float, float] = (3.05, 8.0),
+                 cache: SiteCheckCache | None = None, session: requests.Session | None = None):
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._results: dict[str, dict] = {}
+        self._dead: dict[str, dict] = {}  # домен -> проверка, на которой он оказался мёртвым
+        self._host_slots: dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url: str) -> threading.Semaphore:
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.Semaphore(self.per_host)
+            return slot
+
+    def _fetch(self, url: str) -> dict:
+        """Пройти редиректы вручную (per_host на каждом шаге) и прочитать начало конечной страницы."""
+        t0 = time.perf_counter()
+        redirects = 0
+        try:
+            while True:
+                with self._slot(url):
+                    resp = self.session.get(url, timeout=self.timeout, allow_redirects=False, stream=True)
+                    try:
+                        location = resp.headers.get("Location") if resp.is_redirect else None
+                        body = b"" if location else resp.raw.read(BODY_SNIFF_BYTES, decode_content=True)
+                    finally:
+                        resp.close()
+                if location is None:
+                    break
+                redirects += 1
+                if redirects > MAX_REDIRECTS:
+                    raise requests.TooManyRedirects(f"больше {MAX_REDIRECTS} редиректов")
+                url = urljoin(url, location)
+        except requests.RequestException as e:
+            return {"site_status": "dead", "http_status": None, "final_url": None, "redirects": redirects,
+                    "latency_ms": round((time.perf_counter() - t0) * 1000, 1), "error": f"{type(e).__name__}: {e}"[:300]}
+
+        latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+        if resp.status_code >= 400:
+            status = "http_error"
+        elif _is_parked(url, body):
+            status = "parked"
+        else:
+            status = "ok"
+        return {"site_status": status, "http_status": resp.status_code, "final_url": url, "redirects": redirects,
+                "latency_ms": latency_ms, "error": None}
+
+    def _dead_domain(self, domain: str) -> dict | None:
+        with self._lock:
+            dead = self._dead.get(domain)
+        if dead is None and self.cache is not None:
+            dead = self.cache.dead_domain(domain)
+        return dead
+
+    def check(self, url: str) -> dict:
+        """Проверить сайт (из кэша, если этот URL уже проверяли; мёртвый домен — без запроса)."""
+        domain = domain_of(url)
+        if not domain:
+            return {"url": url, "domain": "", "site_status": "dead", "http_status": None, "final_url": None,
+                    "redirects": 0, "latency_ms": None, "error": "не URL"}
+        with self._lock:
+            cached = self._results.get(url)
+        if cached is None and self.cache is not None:
+            cached = self.cache.get(url)
+        if cached is not None:
+            METRICS.inc("site_check", result="cache_hit")
+            return cached
+
+        dead = self._dead_domain(domain)
+        if dead is not None:
+            METRICS.inc("site_check", result="dead_domain")
+            result = {**dead, "url": url, "redirects": 0, "latency_ms": None}
+        else:
+            with METRICS.timer("site_check"):
+                result = {"url": url, "domain": domain, **self._fetch(url)}
+            if result["site_status"] == "ok" and domain_of(result["final_url"]) != domain:
+                result["site_status"] = "redirected"
+            METRICS.inc("site_check", result=result["site_status"])
+        with self._lock:
+            self._results[url] = result
+            if result["site_status"] == "dead":
+                self._dead.setdefault(domain, result)
+        if self.cache is not None:
+            self.cache.put(result)
+        return result
+
+    def check_many(self, urls) -> dict[str, dict]:
+        """
+        Проверить пачку сайтов параллельно: url -> результат.
+        Дубли проверяются одним запросом. Сначала — по одному URL на домен, затем остальные URL доменов,
+        которые ответили: страницы мёртвого домена не ждут таймаутов заново.
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        first: dict[str, str] = {}
+        for url in urls:
+            first.setdefault(domain_of(url), url)
+        rest = [url for url in urls if first[domain_of(url)] != url]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="site-check") as ex:
+            results = dict(zip(first.values(), ex.map(self.check, first.values())))
+            results.update(zip(rest, ex.map(self.check, rest)))
+        return results
+
+    def annotate(self, row: dict) -> dict:
+        """Дописать в строку лида website_status и website_final (сайт уже проверен check_many — берётся из памяти)."""
+        website = row.get("website")
+        if website:
+            result = self.check(website)
+            row["website_status"] = result["site_status"]
+            row["website_final"] = result["final_url"]
+        return row
+
+    def close(self) -> None:
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
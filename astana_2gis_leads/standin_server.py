@@ -0,0 +1,134 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from astana_2gis_leads.url_classifier import decode_2gis_redirect
+
+# Внешние скрипты SPA на стенде не нужны (и всё равно не загрузятся); инлайн-скрипты с initial state оставляем
+EXTERNAL_SCRIPT_RE = re.compile(rb"<script\b[^>]*\bsrc=[^>]*>\s*</script>", re.IGNORECASE)
+
+SEARCH_RE = re.compile(r"^/[^/]+/search/[^/]+(?:/page/(\d+))?/?$")
+FIRM_RE = re.compile(r"^/[^/]+/firm/(\d+)")
+REDIRECT_RE = re.compile(r"^/link\.2gis\.com/")
+CATALOG_RE = re.compile(r"^/catalog\.api\.2gis\.[a-z]+/[\d.]+/items/?$")
+# Вместо SPA (её скрипты вырезаны) поисковая страница сама запрашивает записанный ответ каталога
+REPLAY_SCRIPT = '<script>fetch("/catalog.api.2gis.com/3.0/items?page={page}")</script>'
+
+
+class StandInServer:
+    """
+    Локальный стенд 2GIS для офлайн-бенчмарков и проверок без 2gis.kz.
+    Отдаёт записанные страницы из fixtures_dir:
+    - <city>/search/<query>[/page/<n>]  -> search/page<n>.html (без /page/ — page1.html)
+    - <city>/firm/<firm_id>             -> firm/<firm_id>.html
+    - /link.2gis.com/...                -> 302 на декодированную цель, как настоящий редиректор
+    - /catalog.api.2gis.com/<v>/items?page=<n> -> api/page<n>.json (записанный ответ каталога)
+    Если для страницы выдачи есть api/page<n>.json, в неё добавляется fetch этого ответа —
+    так network_capture видит в performance-логе тот же XHR, что и на живом 2GIS.
+    Абсолютные ссылки https://2gis.kz, https://link.2gis.com и https://catalog.api.2gis.com переписываются на стенд.
+    latency — искусственная задержка ответа страницы, сек (имитация сети: без неё параллелизм не виден).
+    """
+
+    def __init__(self, fixtures_dir: str | Path, host: str = "127.0.0.1", port: int = 0,
+                 strip_external_scripts: bool = True, latency: float = 0.0):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.strip_external_scripts = strip_external_scripts
+        self.latency = latency
+        self.requests_served = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def rewrite(self, body: bytes) -> bytes:
+        base = self.base_url.encode()
+        body = body.replace(b"https://link.2gis.com", base + b"/link.2gis.com")
+        body = body.replace(b"https://catalog.api.2gis.com", base + b"/catalog.api.2gis.com")
+        body = body.replace(b"https://2gis.kz", base)
+        if self.strip_external_scripts:
+            body = EXTERNAL_SCRIPT_RE.sub(b"", body)
+        return body
+
+    def resolve(self, path: str) -> Path | None:
+        """Файл фикстуры для пути запроса (None — такой страницы нет)."""
+        m = SEARCH_RE.match(path)
+        if m:
+            return self.fixtures_dir / "search" / f"page{m.group(1) or 1}.html"
+        m = FIRM_RE.match(path)
+        if m:
+            return self.fixtures_dir / "firm" / f"{m.group(1)}.html"
+        return None
+
+    def api_fixture(self, page: int) -> Path:
+        return self.fixtures_dir / "api" / f"page{page}.json"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests_served += 1
+                path = unquote(urlsplit(self.path).path)
+
+                if REDIRECT_RE.match(path):
+                    target = decode_2gis_redirect(path)
+                    if target is None:
+                        self.send_error(400, "bad redirect payload")
+                        return
+                    self.send_response(302)
+                    self.send_header("Location", target)
+                    self.end_headers()
+                    return
+
+                content_type = "text/html; charset=utf-8"
+                if CATALOG_RE.match(path):
+                    page = int((parse_qs(urlsplit(self.path).query).get("page") or ["1"])[0])
+                    file = server.api_fixture(page)
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    file = server.resolve(path)
+                if file is None or not file.exists():
+                    self.send_error(404)
+                    return
+
+                if server.latency:
+                    time.sleep(server.latency)  # сервер многопоточный: задержки запросов перекрываются
+                body = server.rewrite(file.read_bytes())
+                m = SEARCH_RE.match(path)
+                if m and server.api_fixture(int(m.group(1) or 1)).exists():
+                    script = REPLAY_SCRIPT.format(page=int(m.group(1) or 1)).encode()
+                    body = body.replace(b"</body>", script + b"</body>", 1) if b"</body>" in body else body + script
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # стенд молчит, иначе лог забивает вывод бенчмарка
+
+        return Handler
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin-2gis", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
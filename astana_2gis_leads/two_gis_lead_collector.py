@@ -1,22 +1,135 @@
-import base64
-import binascii
+import html
+import re
 from pathlib import Path
-from urllib.parse import unquote
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from astana_2gis_leads.deadline import BudgetExhausted, Deadline
+from astana_2gis_leads.enrichment_cache import DEFAULT_TTL, EnrichmentCache
+from astana_2gis_leads.metrics import METRICS, timed
+from astana_2gis_leads.network_capture import NetworkCapture, card_from_item, items_of
+from astana_2gis_leads.url_classifier import (
+    CONTACT_CHANNELS, channel_of, classify_url, decode_2gis_redirect,
+)
+from astana_2gis_leads.webdriver_trace import trace_section
+
+
+# Любая абсолютная ссылка в HTML/JSON карточки (после снятия экранирования)
+URL_IN_TEXT_RE = re.compile(r"(?:https?://|tg://)[^\s\"'<>\\]+")
+
+# Снимок карточки фирмы за один round trip: все href (уже абсолютные) и подписи ссылок/кнопок в lower-case
+LINKS_SNAPSHOT_JS = r"""
+    function clean(s){ return (s || "").replace(/\s+/g, " ").trim(); }
+
+    const hrefs = [];
+    for (const a of document.querySelectorAll("a[href]")) {
+      if (a.href) hrefs.push(a.href);
+    }
+    const labels = [];
+    for (const el of document.querySelectorAll("a, button")) {
+      const t = clean(el.textContent).toLowerCase();
+      if (t) labels.push(t);
+    }
+    return { hrefs: hrefs, labels: labels };
+"""
+
+# Перехват кликов без новых вкладок: window.open и переходы по ссылкам пишутся в буфер window.__twogis_opened,
+# затем за один проход кликаются все нужные кнопки (arguments[0] — список групп слов, по кнопке на группу).
+# Возвращает число кликнутых кнопок.
+CLICK_CAPTURE_JS = r"""
+    const groups = arguments[0];
+    window.__twogis_opened = [];
+
+    if (!window.__twogis_hooked) {
+      window.__twogis_hooked = true;
+      const push = (u) => {
+        try { window.__twogis_opened.push(new URL(String(u), location.href).href); } catch (e) {}
+      };
+      // window.open(url) или window.open() + w.location = url — ловим оба варианта
+      window.open = function (u) {
+        if (u) push(u);
+        const loc = { assign: push, replace: push, set href(v) { push(v); } };
+        const fake = { closed: false, opener: null, focus() {}, close() { this.closed = true; },
+                       document: { write() {}, close() {} } };
+        Object.defineProperty(fake, "location", { get() { return loc; }, set(v) { push(v); } });
+        return fake;
+      };
+      // переход по <a>: запоминаем href и не даём вкладке уйти со страницы карточки
+      document.addEventListener("click", (e) => {
+        const a = e.target && e.target.closest ? e.target.closest("a[href]") : null;
+        if (!a) return;
+        push(a.href);
+        e.preventDefault();
+      }, true);
+    }
+
+    function clean(s){ return (s || "").replace(/\s+/g, " ").trim(); }
+    const els = Array.from(document.querySelectorAll("a, button"));
+    let clicked = 0;
+    for (const words of groups) {
+      const el = els.find(x => {
+        const t = clean(x.textContent).toLowerCase();
+        return words.some(w => t.includes(w));
+      });
+      if (el) { el.click(); clicked++; }
+    }
+    return clicked;
+"""
+
+# XPath 1.0 не умеет lower-case(): регистр переводим через translate()
+_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+_LOWER = "abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def _xpath_text_contains(words: tuple[str, ...]) -> str:
+    """XPath ссылки или кнопки, в тексте которой (без учёта регистра) есть одно из слов."""
+    conds = " or ".join(
+        f"contains(translate(normalize-space(.), '{_UPPER}', '{_LOWER}'),'{w}')" for w in words
+    )
+    return f"//*[self::a or self::button][{conds}]"
+
+
+# Кнопка сайта: “Сайт/Website/Перейти”
+SITE_BUTTON_WORDS = ("сайт", "website", "перейти")
+
+
+def _is_channel(channel: str):
+    # URL новой вкладки подходит, если классификатор (с декодированием редиректа 2GIS) видит нужный канал
+    return lambda u: channel_of(u) == channel
+
+
+# Кнопочный fallback контактов: (канал, слова на кнопке, проверка URL новой вкладки) — в порядке приоритета
+CONTACT_BUTTONS = (
+    ("wa", ("whatsapp", "написать", "в wa"), _is_channel("wa")),
+    ("tg", ("telegram", "телеграм"), _is_channel("tg")),
+    ("ig", ("instagram", "инстаграм"), _is_channel("ig")),
+    ("fb", ("facebook", "фейсбук"), _is_channel("fb")),
+    ("vk", ("vk", "вк"), _is_channel("vk")),
+)
+
 
 class TwoGisLeadCollector:
-    def __init__(self, key_words: list, cache_path: str | Path, place: str = "astana"):
+    def __init__(self, key_words: list, cache_path: str | Path, place: str = "astana",
+                 cache_ttl: float | None = DEFAULT_TTL, force_refresh: bool = False,
+                 site_root: str = "https://2gis.kz", http_first: bool = False, http_timeout: float = 10,
+                 intercept_popups: bool = False, capture_timeout: float = 4, firm_budget: float | None = None):
         """
         Сохраняем настройки:
         - ключевые слова поиска
         - город (place)
-        - каталог для кэша (cache_dir: Path)
-        - базовый URL (base_url)
+        - каталог для кэша (cache_dir: Path) и кэш обогащения по firm_id (cache_ttl в секундах, None — бессрочно)
+        - базовый URL (base_url) от корня сайта site_root (для локального стенда — http://127.0.0.1:port)
+        - force_refresh: игнорировать кэш и заново ходить в карточку фирмы
+        - http_first: сначала пробовать карточку обычным HTTP через self.session, Selenium — только если контактов нет
+        - intercept_popups: кнопки сайта/контактов кликаются за один проход с перехватом window.open,
+          без новых вкладок; capture_timeout — общее ожидание URL на все кнопки
+        - firm_budget: общий бюджет секунд на одну фирму (все шаги обогащения), None — без бюджета
         """
         self.cache_path = Path(cache_path)
         # Формируется именно список строк из ключевых слов для формирования далее запроса
@@ -25,12 +138,34 @@ class TwoGisLeadCollector:
         # Каталог для сохраненения страницы с данными - место для кэша
         self.cache_dir = self.cache_path / 'data'
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Кэш результатов обогащения: повторные запуски по пересекающимся запросам не открывают карточку заново
+        self.cache = EnrichmentCache(self.cache_dir / "enrichment.sqlite", ttl=cache_ttl)
+        self.force_refresh = force_refresh
         # Собирается базовая часть url-адреса в зависимости от вводимой локации для гибкости
-        self.base_url = f"https://2gis.kz/{place.lower()}"
+        self.site_root = site_root.rstrip("/")
+        self.base_url = f"{self.site_root}/{place.lower()}"
+        # локальный стенд вместо 2gis.kz: его ссылки тоже «2GIS», а не сайт фирмы (только для этого сборщика)
+        self.internal_hosts: frozenset[str] = frozenset()
+        if channel_of(self.site_root) != "2gis":
+            self.internal_hosts = frozenset({(urlsplit(self.site_root).hostname or "").lower()})
+        self.http_first = http_first
+        self.http_timeout = http_timeout
+        self.intercept_popups = intercept_popups
+        self.capture_timeout = capture_timeout
+        self.firm_budget = firm_budget
+        # Постоянная вкладка карточек на каждый драйвер: session_id -> window handle
+        self._detail_tabs: dict[str, str] = {}
+        # Настройка свежесозданной вкладки карточек (например, browser.block_resources_in_tab), None — ничего
+        self.new_tab_hook = None
         self.session = requests.Session()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.session.headers.update(self.headers)
+        # Пул keep-alive соединений: воркеры пула обогащения ходят через одну сессию
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def request_preparing(self):
         """
@@ -44,75 +179,118 @@ class TwoGisLeadCollector:
         return self.query
 
     def _extract_website_from_href(self, href: str) -> str | None:
-
+        """
+        Цель редиректа link.2gis.com (декодирование с LRU-кэшем в url_classifier) или сам href, если это http.
+        None — редирект не декодировался или ссылка не http ('мусор').
+        """
         if 'link.2gis.com' in href:
-            # 1. Последний сегмент ссылки
-            b64_part = href.split('/')[-1]
-            # 2. URL-decode
-            b64_part = unquote(b64_part)
+            return decode_2gis_redirect(href)
+        return href if href.startswith('http') else None
 
-            # 3. Fix padding
-            pad = len(b64_part) % 4
-            if pad != 0:
-                b64_part += '=' * (4 - pad)
-
-            # 4. Base64 decode
-            try:
-                decoded = base64.b64decode(b64_part).decode("utf-8", errors="ignore")
-            except binascii.Error:
-                print("Invalid base64 in href")
-                return None
-
-            # 5. Берём первую непустую строку, начинающуюся с http
-            for line in decoded.splitlines():
-                line = line.strip()
-                if line.startswith("http://") or line.startswith("https://"):
-                    return line
-        # 6. Если ссылка не декодировалась, то нужно проверить её на стандарт, чтобы не собрать 'мусор'
-        else:
-            if href.startswith('http'):
-                return href
 
-        return None
-
-
-    def collect_cards_from_root(self, driver):
+    @timed("collect_cards")
+    def collect_cards_from_root(self, driver, incremental: bool = False):
+        """
+        Карточки выдачи из window.__twogis_scroll_root.
+        Одна карточка на firm_id (ссылки на отзывы и т.п. той же фирмы пропускаются).
+        incremental=True — только фирмы, которых ещё не отдавали: реестр выданных firm_id живёт на странице
+        (свойство root, новая навигация или новый root его сбрасывают), уже собранное в Python не сериализуется.
+        Граница карточки — предок ссылки на глубине «контейнер списка + 1», где контейнер — общий предок ссылок
+        двух разных фирм: подъём по parentElement без чтения innerText (и пересчёта layout) на каждом уровне.
+        """
         return driver.execute_script(r"""
+    const incremental = arguments[0];
+    const siteRoot = arguments[1];  // корень сайта сборщика (site_root): 2gis.kz или локальный стенд
     const root = window.__twogis_scroll_root;
     if (!root) return [];
 
-    const links = Array.from(root.querySelectorAll('a[href*="/firm/"]'));
+    // одна карточка на фирму; с incremental реестр переживает вызов
+    const seen = incremental ? (root.__twogis_seen = root.__twogis_seen || new Set()) : new Set();
+    const links = root.querySelectorAll('a[href*="/firm/"]');
 
     function clean(s){ return (s || "").replace(/\s+/g, " ").trim(); }
-
-    return links.map(a => {
-      const href = a.getAttribute("href") || "";
-      const url = href.startsWith("http") ? href : ("https://2gis.kz" + href);
-
-      // пробуем вытащить “карточку” вокруг ссылки
+    // /firm/<id>/tab/reviews и /firm/<id>?... — та же фирма
+    function firmIdOf(href){ return (href.split("/firm/")[1] || "").split(/[/?#]/)[0]; }
+    function depthOf(el){ let d = 0; for (; el && el !== root; el = el.parentElement) d++; return d; }
+
+    // глубина карточки: контейнер списка — общий предок первой ссылки и первой ссылки другой фирмы
+    let cardDepth = -1;
+    if (links.length) {
+      const firstId = firmIdOf(links[0].getAttribute("href") || "");
+      let other = null;
+      for (const a of links) {
+        if (firmIdOf(a.getAttribute("href") || "") !== firstId) { other = a; break; }
+      }
+      if (other) {
+        const ancestors = new Set();
+        for (let el = links[0]; el && el !== root; el = el.parentElement) ancestors.add(el);
+        let common = other;
+        while (common && common !== root && !ancestors.has(common)) common = common.parentElement;
+        cardDepth = depthOf(common) + 1;
+      }
+    }
+
+    function cardOf(a, firm_id){
+      if (cardDepth > 0) {
+        const d = depthOf(a);
+        let card = a;
+        for (let k = d - cardDepth; k > 0 && card; k--) card = card.parentElement;
+        // карточка должна начинаться со ссылки этой же фирмы (иначе вёрстка другая — запасной путь)
+        const lead = d >= cardDepth && card && card.querySelector('a[href*="/firm/"]');
+        if (lead && firmIdOf(lead.getAttribute("href") || "") === firm_id) return card;
+      }
+      // запасной путь (одна фирма в выдаче, нестандартная вёрстка): первый предок с текстом длиннее 20 символов
       let card = a;
       for (let i=0; i<8 && card; i++) {
-        const txt = clean(card.innerText);
-        if (txt.length > 20) break;
+        if (clean(card.innerText).length > 20) break;
         card = card.parentElement;
       }
-      card = card || a;
+      return card || a;
+    }
 
-      const text = clean(card.innerText);
-      // очень грубо: первая строка — название, следующая строка похожая на адрес — адрес
-      const lines = text.split("\n").map(clean).filter(Boolean);
+    const out = [];
+    for (const a of links) {
+      const href = a.getAttribute("href") || "";
+      const firm_id = firmIdOf(href);
+      if (!firm_id || seen.has(firm_id)) continue;
+      seen.add(firm_id);
+      const url = href.startsWith("http") ? href : (siteRoot + href);
 
-      const firm_id = (url.split("/firm/")[1] || "").split("?")[0];  
+      // innerText — один раз на новую карточку
+      const text = clean(cardOf(a, firm_id).innerText);
 
-      return {
+      out.push({
         firm_url: url,
         firm_id: firm_id,
         name: ((text.split("\u200b")[0] || "").replace(/\s\d+([.,]\d+)?\s\d+\sоцен.*$/u, "").trim()),
         address: ((text.split("\u200b")[1] || "").split("Закрыто")[0].trim()), // адрес часто содержит запятую
         primary_contact: ""
-      };
-    }).filter(x => x.firm_url);
-    """)
+      });
+    }
+    return out;
+    """, bool(incremental), self.site_root)
+
+    @timed("collect_cards_network")
+    def collect_cards_from_network(self, capture: NetworkCapture, timeout: float = 10.0) -> list[dict] | None:
+        """
+        Карточки выдачи из JSON-ответов каталога, перехваченных capture (без разбора innerText и без ожидания
+        отрисовки списка). Если в ответе есть ссылки контактов, primary_contact и website выбираются сразу —
+        теми же правилами, что и при обогащении. None — ответа каталога не было (тогда собирать из DOM).
+        """
+        payloads = capture.wait_payloads(timeout)
+        if not payloads:
+            METRICS.inc("network_capture", result="no_response")
+            return None
+        cards: dict[str, dict] = {}
+        for payload in payloads:
+            for item in items_of(payload):
+                card = card_from_item(item, self.base_url)
+                hrefs = card.pop("contact_hrefs")
+                card["primary_contact"] = self._pick_primary(hrefs)
+                card["website"] = self._pick_website(hrefs)
+                cards.setdefault(card["firm_id"], card)
+        METRICS.inc("network_capture", result="ok")
+        return list(cards.values())
 
     def _strip_text_param(self, url: str) -> str:
         """Стабилизируем WA-ссылку: убираем &text=..."""
@@ -136,294 +314,428 @@ class TwoGisLeadCollector:
 
     # --- ПАТТЕРН 2GIS: КЛИК -> НОВАЯ ВКЛАДКА -> URL ---
     def _click_open_newtab_and_get_url(self, driver, xpath_btn: str, url_ok, click_timeout=4, tab_timeout=8,
-                                       url_timeout=8) -> str:
+                                       url_timeout=8, deadline: Deadline | None = None) -> str:
+        deadline = deadline or Deadline(None)  # каждое ожидание — не дольше остатка бюджета фирмы
+        origin_handle = driver.current_window_handle  # Вкладка карточки — в неё вернёмся после чтения URL
         before_handles = set(driver.window_handles)  # Запоминаем, какие вкладки были до клика
 
         # Ищем по xpath_btn элемент и ждём, пока он станет доступен для клика (в пределах click_timeout секунд)
-        el = WebDriverWait(driver, click_timeout).until(EC.element_to_be_clickable((By.XPATH, xpath_btn)))
+        el = WebDriverWait(driver, deadline.timeout(click_timeout)).until(EC.element_to_be_clickable((By.XPATH, xpath_btn)))
 
         # Надёжный способ кликнуть (иногда .click() не срабатывает из-за перекрытий, а execute_script работает всегда)
         driver.execute_script("arguments[0].click();", el)
 
         # Сравниваем: появилось ли больше вкладок, чем было до клика? Если да → новая вкладка открылась
-        WebDriverWait(driver, tab_timeout).until(lambda d: len(d.window_handles) > len(before_handles))
+        WebDriverWait(driver, deadline.timeout(tab_timeout)).until(lambda d: len(d.window_handles) > len(before_handles))
 
         # Находим новую вкладку по сравнению со старым списком вкладок
         new_handle = [h for h in driver.window_handles if h not in before_handles][0]
         driver.switch_to.window(new_handle)  # Затем переключаем контекст драйвера на неё
 
-        # Проверяем URL в новой вкладке — валиден ли он? Функция url_ok(...) передаётся как аргумент
-        WebDriverWait(driver, url_timeout).until(lambda d: url_ok(d.current_url))
-        return driver.current_url
+        try:
+            # Проверяем URL в новой вкладке — валиден ли он? Функция url_ok(...) передаётся как аргумент
+            WebDriverWait(driver, deadline.timeout(url_timeout)).until(lambda d: url_ok(d.current_url))
+            return driver.current_url
+        finally:
+            # Вкладка-редирект больше не нужна: закрываем и возвращаемся в карточку для следующих шагов
+            with METRICS.timer("tab_cleanup"):
+                driver.close()
+                driver.switch_to.window(origin_handle)
 
-    def _resolve_website(self, driver) -> str | None:
-        # def _try_extract_website_from_links() -> str | None:  - хэлпер ушёл в связи с оптимизацией
+    def _fallback_click(self, driver, channel: str, words: tuple[str, ...], url_ok,
+                        deadline: Deadline | None = None) -> str | None:
         """
-        Пытаемся вытащить сайт из href (если реально присутствует в DOM).
-        ВАЖНО: здесь разрешаем и 2GIS-редиректы, потому что _extract_website_from_href умеет их декодировать.
+        Fallback-клик по кнопке канала (сайт / wa / tg / ...) с учётом в метриках:
+        время клика, таймауты и ошибки по каналу. None — URL получить не удалось.
+        Таймаут, урезанный кончившимся бюджетом фирмы, — не «нет кнопки», а BudgetExhausted.
         """
-        # --- ПЛАН А: Ищем в DOM ---
-        links = driver.find_elements(By.CSS_SELECTOR, 'a[href^="http://"], a[href^="https://"]')
-        bad = ("instagram.com", "t.me", "facebook.com", "vk.com", "wa.me", "whatsapp.com")
-        for a in links:
-            href = (a.get_attribute("href") or "").strip()
-            if not href:
-                continue
+        METRICS.inc("fallback_clicks", channel=channel)
+        try:
+            with METRICS.timer(f"fallback_click_{channel}"):
+                return self._click_open_newtab_and_get_url(driver, _xpath_text_contains(words), url_ok=url_ok,
+                                                           deadline=deadline)
+        except BudgetExhausted:
+            raise
+        except TimeoutException:
+            if deadline is not None and deadline.expired():
+                raise BudgetExhausted
+            METRICS.inc("timeouts", stage="fallback_click", channel=channel)
+        except Exception:
+            METRICS.inc("fallback_errors", channel=channel)
+        return None
 
-            # 1) пробуем декодировать (на случай редиректа)
-            raw = self._extract_website_from_href(href) or href
-            low = raw.lower()
+    # --- ПЕРЕХВАТ: КЛИК -> URL ИЗ JS-БУФЕРА (без вкладок) ---
+    def _capture_click_urls(self, driver, word_groups: list[tuple[str, ...]],
+                            deadline: Deadline | None = None) -> list[str]:
+        """
+        Кликает по одной кнопке на каждую группу слов с перехваченным window.open
+        и возвращает все URL, которые страница пыталась открыть.
+        Ждём один общий capture_timeout, а не таймаут на каждую кнопку.
+        """
+        deadline = deadline or Deadline(None)
+        timeout = deadline.timeout(self.capture_timeout)
+        clicked = driver.execute_script(CLICK_CAPTURE_JS, [list(w) for w in word_groups])
+        if not clicked:
+            return []
+        read_js = "return window.__twogis_opened || [];"
+        try:
+            # ссылки могут открываться асинхронно (после XHR) — ждём, пока каждая кнопка что-то откроет
+            WebDriverWait(driver, timeout).until(lambda d: len(d.execute_script(read_js)) >= clicked)
+        except TimeoutException:
+            METRICS.inc("timeouts", stage="capture_click")
+        # что успело открыться — отдаём даже при кончившемся бюджете (частичный результат)
+        return driver.execute_script(read_js) or []
+
+    @timed("resolve_intercepted")
+    def _resolve_intercepted(self, driver, snapshot: dict, deadline: Deadline | None = None) -> tuple[str, str | None]:
+        """Сайт и контакт: сначала по снимку ссылок, недостающее — кликами с перехватом за один проход."""
+        website_url = self._pick_website(snapshot.get("hrefs", []))
+        primary_contact = self._pick_primary(snapshot.get("hrefs", []))
+
+        groups = self._intercept_groups(snapshot, website_url, primary_contact)
+        if groups:
+            METRICS.inc("capture_clicks", n=len(groups))
+            urls = self._capture_click_urls(driver, groups, deadline)
+            website_url = website_url or self._pick_website(urls)
+            primary_contact = primary_contact or self._pick_primary(urls)
+
+        return primary_contact, website_url
+
+    def _intercept_groups(self, snapshot: dict, website_url: str | None, primary_contact: str) -> list[tuple[str, ...]]:
+        """Группы слов кнопок, которые стоит кликнуть: только для недостающего и только если кнопка есть в снимке."""
+        groups = []
+        if not website_url and self._has_button(snapshot, SITE_BUTTON_WORDS):
+            groups.append(SITE_BUTTON_WORDS)
+        if not primary_contact:
+            groups += [words for _channel, words, _url_ok in CONTACT_BUTTONS if self._has_button(snapshot, words)]
+        return groups
 
-            # 2) отсекаем мессенджеры/соцсети
-            if any(b in low for b in bad):
-                continue
+    def _pick_website(self, hrefs: list[str]) -> str | None:
+        """
+        Первый href, похожий на сайт компании: классификатор декодирует редиректы 2GIS,
+        мессенджеры/соцсети, сам 2GIS (в т.ч. недекодированный редирект) и не-http ссылки отсекаются.
+        """
+        for href in hrefs:
+            channel, url = classify_url(href or "", self.internal_hosts)
+            if channel == "website":
+                return url
+        return None
 
-            # 3) если это всё ещё 2gis и не декодировалось — пропускаем
-            if "2gis." in low:
-                continue
+    def _pick_primary(self, hrefs: list[str]) -> str:
+        """Лучший контакт из списка href по приоритету WA -> TG -> IG -> FB -> VK (или "")."""
+        found: dict[str, str] = {}
+        for href in hrefs:
+            channel, url = classify_url(href or "", self.internal_hosts)
+            if channel in CONTACT_CHANNELS:
+                found.setdefault(channel, url)  # первый href канала, редирект 2GIS — уже декодирован
+
+        if "wa" in found:
+            return self._strip_text_param(found["wa"])
+        elif "tg" in found:
+            return self._normalize_tg(found["tg"])
+        return found.get("ig") or found.get("fb") or found.get("vk") or ""
+
+    @timed("snapshot")
+    def _snapshot_links(self, driver) -> dict:
+        """
+        Один execute_script вместо find_elements + get_attribute на каждый элемент:
+        все href и подписи кнопок/ссылок карточки одним структурированным ответом.
+        """
+        return driver.execute_script(LINKS_SNAPSHOT_JS) or {"hrefs": [], "labels": []}
+
+    def _has_button(self, snapshot: dict, words: tuple[str, ...]) -> bool:
+        """Есть ли в карточке кнопка/ссылка с одним из слов — без неё кликать и ждать таймаут незачем."""
+        return any(w in label for label in snapshot.get("labels", []) for w in words)
 
+    @timed("resolve_website")
+    def _resolve_website(self, driver, snapshot: dict | None = None, deadline: Deadline | None = None) -> str | None:
+        # def _try_extract_website_from_links() -> str | None:  - хэлпер ушёл в связи с оптимизацией
+        """
+        Пытаемся вытащить сайт из href (если реально присутствует в DOM).
+        ВАЖНО: здесь разрешаем и 2GIS-редиректы, потому что _extract_website_from_href умеет их декодировать.
+        """
+        if snapshot is None:
+            snapshot = self._snapshot_links(driver)
+
+        # --- ПЛАН А: Ищем в DOM (по снимку ссылок) ---
+        raw = self._pick_website(snapshot.get("hrefs", []))
+        if raw:
             return raw
         # --- ПЛАН Б: Если мы здесь, значит План А не сработал ---
         # Если не нашли — кликом по кнопке “Сайт/Website/Перейти”:.. ВАЖНО: допускаем, что сначала откроется 2GIS-редирект.
-        xpath_site = (
-            "//*[self::a or self::button]"                                      # 1. Ищи либо ссылку (a), либо кнопку (button)
-            "[contains(translate(normalize-space(.),"                           # 2. Возьми текст с кнопки, убери лишние пробелы...
-            " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"           # ...и преврати ВСЕ БОЛЬШИЕ БУКВЫ...
-            " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'сайт')"   # ...в маленькие (это такой хак для LowerCase в XPath 1.0)
-            " or contains(translate(normalize-space(.),"                        # 3. И проверь, есть ли там слово 'сайт'
-            " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-            " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'website')"
-            " or contains(translate(normalize-space(.),"
-            " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-            " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'перейти')]"
-        )
-
-        try:
-            site_url = self._click_open_newtab_and_get_url(driver,
-                xpath_site,
-                # допускаем любой http/https (включая 2gis-редирект)
-                url_ok=lambda u: u.startswith("http")
-            )
-
-            # Декодируем внешний URL (если это 2gis redirect), иначе берём как есть
-            raw = self._extract_website_from_href(site_url) or site_url
-            low = raw.lower()
-
-            # Отсекаем мессенджеры/соцсети и случай, когда остались на 2gis
-            if any(b in low for b in bad):
-                return None
-            if "2gis." in low:
-                return None
+        if not self._has_button(snapshot, SITE_BUTTON_WORDS):
+            return None
 
-            return raw
+        # допускаем любой http/https (включая 2gis-редирект)
+        site_url = self._fallback_click(driver, "website", SITE_BUTTON_WORDS, url_ok=lambda u: u.startswith("http"),
+                                        deadline=deadline)
 
-        except Exception:
-            # Если кнопка не нажалась или таймаут — значит, сайта нет.
-            return None
+        # Декодируем внешний URL (если это 2gis redirect) и отсекаем мессенджеры/соцсети и сам 2gis.
+        # Если кнопка не нажалась или таймаут — значит, сайта нет.
+        website_url = self._pick_website([site_url]) if site_url else None
+        METRICS.inc("fallbacks", channel="website", result="hit" if website_url else "miss")
+        return website_url
 
-    def _resolve_contacts(self, driver) -> str:
+    @timed("resolve_contacts")
+    def _resolve_contacts(self, driver, snapshot: dict | None = None, deadline: Deadline | None = None) -> str:
         """
         Ищет приоритетный контакт (WA -> TG -> IG -> FB -> VK).
         Сначала сканирует ссылки (DOM), если пусто — кликает кнопки.
 
         Website — must have и собирается ОТДЕЛЬНО (не участвует в приоритете primary).
-        Возврат: (primary_contact, website_url)
 
         ВАЖНО:
         - WA возвращаем как кликабельный URL (wa.me / api.whatsapp.com/send...), а не как "голый" телефон.
-        - Для website допускаем 2GIS-редирект: кликаем -> ловим current_url -> декодируем внешний URL через _extract_website_from_href().
+        - Кнопку кликаем только если её подпись реально есть в снимке карточки.
         """
-        primary_contact = ""  # выбранный контакт по приоритету (URL)
-        website_url: str | None = None  # сайт компании (если удастся)
+        if snapshot is None:
+            snapshot = self._snapshot_links(driver)
 
         # ---------------------------------------------------------------------
         # 1) PRIMARY CONTACT (вариант B, Казахстан): WA -> TG -> IG -> FB -> VK
         # ---------------------------------------------------------------------
-        candidates = driver.find_elements(
-            By.CSS_SELECTOR,
-            'a[href*="api.whatsapp.com/send"], a[href*="wa.me"], a[href*="whatsapp.com/send"],'
-            'a[href*="t.me"], a[href*="tg://"],'
-            'a[href*="instagram.com"],'
-            'a[href*="facebook.com"],'
-            'a[href*="vk.com"]'
-        )
-        # Выбор лучшего из найденных ссылок
-        wa_href = tg_href = ig_href = fb_href = vk_href = ""
-        for a in candidates:
-            href = (a.get_attribute("href") or "").strip()
-            if not href:
-                continue
-            low = href.lower()
-            if (not wa_href) and ("whatsapp" in low or "wa.me" in low):
-                wa_href = href
-            elif (not tg_href) and ("t.me" in low or low.startswith("tg://")):
-                tg_href = href
-            elif (not ig_href) and ("instagram.com" in low):
-                ig_href = href
-            elif (not fb_href) and ("facebook.com" in low):
-                fb_href = href
-            elif (not vk_href) and ("vk.com" in low):
-                vk_href = href
-
-        if wa_href:
-            primary_contact = self._strip_text_param(wa_href)
-        elif tg_href:
-            primary_contact = self._normalize_tg(tg_href)
-        elif ig_href:
-            primary_contact = ig_href
-        elif fb_href:
-            primary_contact = fb_href
-        elif vk_href:
-            primary_contact = vk_href
+        primary_contact = self._pick_primary(snapshot.get("hrefs", []))
 
         # ---------------------------------------------------------------------
         # 2) Если ссылки не дали результата — Кликаем кнопки (Fallback)
         # ---------------------------------------------------------------------
-        # Кнопочный паттерн (если href-ов нет)
-        if not primary_contact:
-            # WA
-            xpath_wa = (
-                "//*[self::a or self::button]"
-                "[contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнoprстуфхцчшщъыьэюя'),'whatsapp')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'написать')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'в wa')]"
-            )
-            try:
-                wa_url = self._click_open_newtab_and_get_url(
-                    driver,
-                    xpath_wa,
-                    url_ok=lambda u: ("whatsapp" in u) or ("wa.me" in u)
-                )
-                primary_contact = self._strip_text_param(wa_url)
-            except Exception:
-                primary_contact = ""
+        # Кнопочный паттерн (если href-ов нет), в том же порядке приоритета
+        for channel, words, url_ok in CONTACT_BUTTONS:
+            if primary_contact:
+                break
+            if not self._has_button(snapshot, words):
+                continue
+            url = self._fallback_click(driver, channel, words, url_ok, deadline)
+            primary_contact = self._pick_primary([url]) if url else ""
+            METRICS.inc("fallbacks", channel=channel, result="hit" if primary_contact else "miss")
 
-        if not primary_contact:
-            # TG
-            xpath_tg = (
-                "//*[self::a or self::button]"
-                "[contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'telegram')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя'),'телеграм')]"
-            )
-            try:
-                tg_url = self._click_open_newtab_and_get_url(
-                    driver,
-                    xpath_tg,
-                    url_ok=lambda u: ("t.me/" in u) or u.startswith("tg://")
-                )
-                primary_contact = self._normalize_tg(tg_url)
-            except Exception:
-                primary_contact = ""
+        return primary_contact
 
-        if not primary_contact:
-            # IG
-            xpath_ig = (
-                "//*[self::a or self::button]"
-                "[contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'instagram')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'инстаграм')]"
-            )
-            try:
-                ig_url = self._click_open_newtab_and_get_url(
-                    xpath_ig,
-                    url_ok=lambda u: "instagram.com" in u
-                )
-                primary_contact = ig_url
-            except Exception:
-                primary_contact = ""
+    def primary_type_of(self, primary_contact: str | None) -> str:
+        """Тип основного контакта: wa / tg / ig / fb / vk / none."""
+        channel = channel_of(primary_contact)
+        return channel if channel in CONTACT_CHANNELS else "none"
 
-        if not primary_contact:
-            # FB
-            xpath_fb = (
-                "//*[self::a or self::button]"
-                "[contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'facebook')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'фейсбук')]"
-            )
-            try:
-                fb_url = self._click_open_newtab_and_get_url(
-                    driver,
-                    xpath_fb,
-                    url_ok=lambda u: "facebook.com" in u
-                )
-                primary_contact = fb_url
-            except Exception:
-                primary_contact = ""
+    def get_primary_contact(self, driver, firm_id: str, force_refresh: bool = False) -> tuple[str, str | None]:
+        """(primary_contact, website) для фирмы — см. enrich_firm."""
+        result = self.enrich_firm(driver, firm_id, force_refresh)
+        return result["primary_contact"], result["website"]
 
-        if not primary_contact:
-            # VK
-            xpath_vk = (
-                "//*[self::a or self::button]"
-                "[contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'vk')"
-                " or contains(translate(normalize-space(.),"
-                " 'ABCDEFGHIJKLMNOPQRSTUVWXYZАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ',"
-                " 'abcdefghijklmnopqrstuvwxyzабвгдеёжзийклmnопрстуфхцчшщъыьэюя'),'вк')]"
-            )
+    def enrich_firm(self, driver, firm_id: str, force_refresh: bool = False) -> dict:
+        """
+        Обогащение фирмы: {"primary_contact", "website", "primary_type", "enrich_status"}.
+        Сначала смотрим в кэш по firm_id, в браузер идём только при промахе
+        (или если force_refresh / self.force_refresh).
+        enrich_status: "ok" — контакт найден, "no_contact" — шаги прошли, контакта нет,
+        "budget_exhausted" — кончился бюджет firm_budget: результат частичный и в кэш не пишется.
+        """
+        cached = self.cached_result(firm_id, force_refresh)
+        if cached is not None:
+            return cached
+
+        deadline = Deadline(self.firm_budget)
+        found = {"primary_contact": "", "website": None}  # шаги дописывают сюда найденное по ходу
+        status = None
+        # при включённой трассировке все команды WebDriver этой фирмы попадают в её секцию
+        with METRICS.timer("enrich"), trace_section(driver, f"firm:{firm_id}"):
             try:
-                vk_url = self._click_open_newtab_and_get_url(
-                    driver,
-                    xpath_vk,
-                    url_ok=lambda u: "vk.com" in u
-                )
-                primary_contact = vk_url
-            except Exception:
-                primary_contact = ""
+                found["primary_contact"], found["website"] = self._fetch_primary_contact(driver, firm_id, deadline, found)
+            except BudgetExhausted:
+                status = "budget_exhausted"
+        return self.record_result(firm_id, found["primary_contact"], found["website"], status)
+
+    def cached_result(self, firm_id: str, force_refresh: bool = False) -> dict | None:
+        """Результат enrich_firm из кэша (None — промах или принудительное обновление); общий для Selenium и CDP-бэкенда."""
+        if force_refresh or self.force_refresh:
+            return None
+        cached = self.cache.get(firm_id)
+        if cached is None:
+            METRICS.inc("cache", result="miss")
+            return None
+        METRICS.inc("cache", result="hit")
+        return {
+            "primary_contact": cached["primary_contact"],
+            "website": cached["website"],
+            "primary_type": self.primary_type_of(cached["primary_contact"]),
+            "enrich_status": "ok" if cached["primary_contact"] else "no_contact",
+        }
 
-        return primary_contact
+    def record_result(self, firm_id: str, primary_contact: str, website_url: str | None,
+                      status: str | None = None) -> dict:
+        """
+        Записать уже известный результат фирмы — итог Selenium, CDP-бэкенда или контакт из ответа каталога:
+        статус, метрики, запись в кэш. Возвращает результат в форме enrich_firm.
+        """
+        primary_type = self.primary_type_of(primary_contact)
+        status = status or ("ok" if primary_contact else "no_contact")
+        METRICS.inc("contacts", type=primary_type)
+        METRICS.inc("enrich_status", status=status)
+        if status != "budget_exhausted":
+            self.cache.put(firm_id, primary_contact, website_url, primary_type)
+        return {
+            "primary_contact": primary_contact,
+            "website": website_url,
+            "primary_type": primary_type,
+            "enrich_status": status,
+        }
+
+    def _hrefs_from_html(self, page: str) -> list[str]:
+        """
+        Все абсолютные ссылки из статического HTML карточки:
+        и из href-атрибутов, и из встроенного initial-state JSON (там слэши экранированы как \\/ или \\u002F).
+        """
+        text = html.unescape(page).replace("\\u002F", "/").replace("\\/", "/")
+        return [m.group(0) for m in URL_IN_TEXT_RE.finditer(text)]
 
+    @timed("http_fetch")
+    def _resolve_via_http(self, firm_id: str, deadline: Deadline | None = None) -> tuple[str, str | None] | None:
+        """
+        Обогащение без браузера: GET карточки через пул self.session.
+        None — если страницу получить не удалось (тогда решает Selenium).
+        """
+        deadline = deadline or Deadline(None)
+        company_url = f"{self.base_url}/firm/{firm_id}"
+        try:
+            resp = self.session.get(company_url, timeout=deadline.timeout(self.http_timeout))
+            resp.raise_for_status()
+        except requests.Timeout:
+            if deadline.expired():
+                raise BudgetExhausted
+            METRICS.inc("timeouts", stage="http_fetch")
+            return None
+        except requests.RequestException:
+            METRICS.inc("http_errors")
+            return None
 
-    def get_primary_contact(self, driver, firm_id: str) -> tuple[str, str | None]:
+        hrefs = self._hrefs_from_html(resp.text)
+        # В статике кроме контактов фирмы есть ссылки на скрипты/счётчики и аккаунты самого 2GIS:
+        # сайт фирмы 2GIS всегда отдаёт через редирект link.2gis.com, соцсети самого 2GIS отсекаем по имени
+        site_hrefs = [h for h in hrefs if "link.2gis.com" in h]
+        contact_hrefs = [h for h in hrefs if not any(m in h.lower() for m in ("2gis", "twogis"))]
+        return self._pick_primary(contact_hrefs), self._pick_website(site_hrefs)
+
+    def _fetch_primary_contact(self, driver, firm_id: str, deadline: Deadline | None = None,
+                               found: dict | None = None) -> tuple[str, str | None]:
+        # found — частичный результат: его читает enrich_firm, если шаги оборвал кончившийся бюджет
+        found = {} if found is None else found
+        # 0. HTTP-путь: если в статике уже есть контакт — браузер не нужен
+        if self.http_first:
+            http_result = self._resolve_via_http(firm_id, deadline)
+            if http_result is not None:
+                found["website"] = http_result[1]
+                if http_result[0]:
+                    METRICS.inc("enrich_source", source="http")
+                    return http_result
+
+        METRICS.inc("enrich_source", source="selenium")
+        return self._fetch_primary_contact_selenium(driver, firm_id, deadline, found)
+
+    @timed("detail_tab")
+    def _detail_tab(self, driver, main_handle: str) -> str:
+        """
+        Постоянная вкладка для карточек фирм (одна на драйвер): переходим в ней от фирмы к фирме
+        вместо open/close на каждую. Пересоздаём, только если вкладку закрыли или её рендерер упал.
+        """
+        handle = self._detail_tabs.get(driver.session_id)
+        if handle is not None:
+            try:
+                driver.switch_to.window(handle)
+            except WebDriverException:
+                pass  # вкладку закрыли — откроем новую
+            else:
+                try:
+                    driver.execute_script("return 1;")  # health check: у упавшей вкладки это бросит исключение
+                    return handle
+                except WebDriverException:
+                    try:
+                        driver.close()
+                    except WebDriverException:
+                        pass
+            driver.switch_to.window(main_handle)
+
+        METRICS.inc("detail_tab_opened")
+        before_handles = set(driver.window_handles)
+        driver.execute_script("window.open('about:blank', '_blank');")
+        handle = [h for h in driver.window_handles if h not in before_handles][0]
+        driver.switch_to.window(handle)
+        if self.new_tab_hook is not None:
+            self.new_tab_hook(driver)
+        self._detail_tabs[driver.session_id] = handle
+        return handle
+
+    @timed("tab_cleanup")
+    def _close_stray_tabs(self, driver, keep: set[str]) -> None:
+        """Закрывает все вкладки драйвера, кроме keep (вкладка выдачи и вкладка карточки)."""
+        for handle in driver.window_handles:
+            if handle in keep:
+                continue
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except WebDriverException:
+                continue  # вкладка уже закрылась сама
+            METRICS.inc("stray_tabs_closed")
+
+    def _get_within_budget(self, driver, url: str, deadline: Deadline) -> None:
+        """
+        driver.get не дольше остатка бюджета фирмы: иначе медленная карточка держит переход
+        до page load timeout chromedriver (300 с). Таймаут сессии на время перехода урезается и затем восстанавливается.
+        """
+        if deadline.expires_at is None:
+            driver.get(url)
+            return
+        previous_timeout = driver.timeouts.page_load
+        driver.set_page_load_timeout(deadline.timeout(previous_timeout))
+        try:
+            driver.get(url)
+        finally:
+            driver.set_page_load_timeout(previous_timeout)
+
+    def _fetch_primary_contact_selenium(self, driver, firm_id: str, deadline: Deadline | None = None,
+                                        found: dict | None = None) -> tuple[str, str | None]:
+        deadline = deadline or Deadline(None)
+        found = {} if found is None else found
 
         # Уникальный идентификатор текущего окна/вкладки браузера, в котором Selenium сейчас работает | Якорь
         main_handle = driver.current_window_handle
-        company_url = f"https://2gis.kz/astana/firm/{firm_id}"
+        company_url = f"{self.base_url}/firm/{firm_id}"
 
-        # Это выполнение произвольного JavaScript прямо в браузере, который контролирует Selenium
-        # код исполняется в контексте текущей страницы, так же, как если бы ты открыл DevTools → Console и вставил JS.
-        # arguments[0]- это тот аргумент, который следует срау после JS - здесь 'company_url'
-        driver.execute_script("window.open(arguments[0], '_blank');", company_url) # 1. Открываем карточку
-        firm_handle = driver.window_handles[-1]
-        driver.switch_to.window(firm_handle)
+        # 1. Открываем карточку в постоянной вкладке (вкладка выдачи не трогается)
+        detail_handle = self._detail_tab(driver, main_handle)
 
         try:
-            WebDriverWait(driver, 12).until(lambda d: firm_id in d.current_url)
-
-            # 2. Делегируем поиск сайта
-            website_url = self._resolve_website(driver)
-
-            # 3. Делегируем поиск контактов
-            primary_contact = self._resolve_contacts(driver)
+            try:
+                with METRICS.timer("firm_navigation"):
+                    self._get_within_budget(driver, company_url, deadline)
+                    WebDriverWait(driver, deadline.timeout(12)).until(lambda d: firm_id in d.current_url)
+            except TimeoutException:
+                if deadline.expired():
+                    raise BudgetExhausted
+                METRICS.inc("timeouts", stage="firm_navigation")
+                raise
+
+            # 2. Один снимок ссылок карточки на оба шага (вместо find_elements + get_attribute на каждый <a>)
+            snapshot = self._snapshot_links(driver)
+            # то, что есть в снимке без кликов, — частичный результат на случай, если клики съедят бюджет
+            found["website"] = self._pick_website(snapshot.get("hrefs", [])) or found.get("website")
+            found["primary_contact"] = self._pick_primary(snapshot.get("hrefs", []))
+
+            # 3. Режим перехвата: все кнопки за один проход, без вкладок
+            if self.intercept_popups:
+                primary_contact, website_url = self._resolve_intercepted(driver, snapshot, deadline)
+                return primary_contact, website_url or found.get("website")
+
+            # 3. Делегируем поиск сайта (сайт, найденный HTTP-путём, не теряем, если в браузере его не нашлось)
+            found["website"] = website_url = self._resolve_website(driver, snapshot, deadline) or found.get("website")
+
+            # 4. Делегируем поиск контактов
+            primary_contact = self._resolve_contacts(driver, snapshot, deadline)
 
             return primary_contact, website_url
 
         finally:
-            # 4. Гарантированная уборка (Technical Debt cleanup)
-            try:
-                for h in list(driver.window_handles):
-                    if h != main_handle:
-                        driver.switch_to.window(h)
-                        driver.close()
-            finally:
+            # 5. Вкладки-редиректы, открывшиеся после ожидания клика (или оборванного бюджетом), закрываем здесь,
+            #    иначе они копятся до конца жизни драйвера. Затем возврат на вкладку выдачи
+            self._close_stray_tabs(driver, keep={main_handle, detail_handle})
+            with METRICS.timer("return_to_list"):
                 driver.switch_to.window(main_handle)
-
-
-
-
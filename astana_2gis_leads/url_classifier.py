@@ -0,0 +1,113 @@
+import base64
+import binascii
+import re
+from functools import lru_cache
+from urllib.parse import unquote
+
+from astana_2gis_leads.metrics import METRICS
+
+# Каналы основного контакта в порядке приоритета (WA -> TG -> IG -> FB -> VK)
+CONTACT_CHANNELS = ("wa", "tg", "ig", "fb", "vk")
+
+# Хост (или его суффикс по меткам) -> канал. api.whatsapp.com, m.vk.com и т.п. находятся по суффиксу
+HOST_CHANNELS = {
+    "wa.me": "wa",
+    "whatsapp.com": "wa",
+    "t.me": "tg",
+    "telegram.me": "tg",
+    "instagram.com": "ig",
+    "instagr.am": "ig",
+    "facebook.com": "fb",
+    "fb.com": "fb",
+    "vk.com": "vk",
+    "vk.ru": "vk",
+}
+
+# Схемы-диплинки мессенджеров
+SCHEME_CHANNELS = {"whatsapp": "wa", "tg": "tg"}
+
+# Метки хоста, по которым ссылка считается ссылкой на сам 2GIS (2gis.kz, 2gis.ru, m.2gis.com, ...)
+TWOGIS_LABELS = {"2gis", "twogis"}
+
+# Схема и хост за один match (без urlsplit на каждый href)
+URL_HEAD_RE = re.compile(r"^\s*(?P<scheme>[a-zA-Z][a-zA-Z0-9+.-]*):(?://(?:[^/?#@\s]*@)?(?P<host>[^/?#:\s]*))?")
+REDIRECT_RE = re.compile(r"link\.2gis\.com/", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def decode_2gis_redirect(url: str) -> str | None:
+    """
+    Цель редиректа link.2gis.com: base64 в последнем сегменте пути, первая строка с http(s).
+    Одни и те же редиректы встречаются у разных фирм и между прогонами — результат кэшируется (LRU).
+    """
+    b64_part = unquote(url.split("?", 1)[0].rstrip("/").split("/")[-1])
+    b64_part += "=" * (-len(b64_part) % 4)
+    try:
+        decoded = base64.b64decode(b64_part).decode("utf-8", errors="ignore")
+    except binascii.Error:
+        METRICS.inc("redirect_decode_errors")  # под LRU — по разу на уникальный href
+        return None
+    for line in decoded.splitlines():
+        line = line.strip()
+        if line.startswith(("http://", "https://")):
+            return line
+    return None
+
+
+def _host_channel(host: str, internal_hosts: frozenset[str] = frozenset()) -> str | None:
+    host = host.lower().rstrip(".")
+    if host in internal_hosts:
+        return "2gis"
+    labels = host.split(".")
+    if TWOGIS_LABELS.intersection(labels):
+        return "2gis"
+    for i in range(len(labels) - 1):
+        channel = HOST_CHANNELS.get(".".join(labels[i:]))
+        if channel is not None:
+            return channel
+    return None
+
+
+@lru_cache(maxsize=16384)
+def classify_url(url: str, internal_hosts: frozenset[str] = frozenset()) -> tuple[str, str]:
+    """
+    Канал ссылки за один проход: wa / tg / ig / fb / vk / website / 2gis / junk
+    и итоговый URL (для редиректа link.2gis.com — декодированная цель).
+    Недекодируемый редирект — "2gis"; не-http(s) схемы (кроме диплинков мессенджеров) — "junk".
+    internal_hosts — хосты (в нижнем регистре), которые тоже считаются «2GIS», например локальный стенд.
+    """
+    url = (url or "").strip()
+    if REDIRECT_RE.search(url):
+        target = decode_2gis_redirect(url)
+        if target is None:
+            return "2gis", url
+        return classify_url(target, internal_hosts)[0], target
+
+    m = URL_HEAD_RE.match(url)
+    if m is None:
+        return "junk", url
+    scheme = m.group("scheme").lower()
+    if scheme in SCHEME_CHANNELS:
+        return SCHEME_CHANNELS[scheme], url
+    host = m.group("host")
+    if scheme not in ("http", "https") or not host:
+        return "junk", url
+    return _host_channel(host, internal_hosts) or "website", url
+
+
+def channel_of(url: str | None, internal_hosts: frozenset[str] = frozenset()) -> str:
+    return classify_url(url or "", internal_hosts)[0]
+
+
+def channel_patterns() -> list[tuple[str, str]]:
+    """
+    Те же правила для контактных каналов в виде regex по началу URL — для векторной классификации
+    колонок (postprocess). Только конструкции, которые понимает и re, и RE2 (pyarrow).
+    """
+    patterns = []
+    for channel in CONTACT_CHANNELS:
+        hosts = "|".join(re.escape(h) for h, ch in HOST_CHANNELS.items() if ch == channel)
+        schemes = [re.escape(s) + ":" for s, ch in SCHEME_CHANNELS.items() if ch == channel]
+        head = rf"https?://(?:[^/?#@\s]*@)?(?:[^/?#:\s]*\.)?(?:{hosts})\.?(?:[:/?#]|$)"
+        patterns.append((channel, r"^\s*(?:" + "|".join([head, *schemes]) + ")"))
+    return patterns
@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from astana_2gis_leads.metrics import METRICS
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Обёртки, которые не должны появляться в стеке вызова (таймеры метрик и сам трассировщик)
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(PACKAGE_DIR, "metrics.py")}
+
+
+def _frame_name(code) -> str:
+    return getattr(code, "co_qualname", code.co_name).replace("<locals>.", "")
+
+
+class WebDriverTrace:
+    """
+    Opt-in трассировка команд WebDriver: каждая команда (один HTTP round trip до chromedriver)
+    записывается с длительностью и стеком вызовов кода проекта, который её выдал.
+    Подключается подменой driver.execute у экземпляра — через него идут и команды WebElement,
+    и switch_to, и опрос current_url внутри WebDriverWait.
+
+        trace = WebDriverTrace(driver)
+        with trace.section(firm_id):         # или collector сам открывает секцию на фирму
+            collector.get_primary_contact(driver, firm_id)
+        trace.write_folded("firm.folded")    # для flamegraph.pl / speedscope
+    """
+
+    def __init__(self, driver, keep_records: bool = True):
+        self.driver = driver
+        self.keep_records = keep_records
+        self.records: list[dict] = []
+        self.folded: Counter[str] = Counter()      # "стек;команда" -> число команд
+        self.folded_ms: Counter[str] = Counter()   # "стек;команда" -> суммарные мс
+        self.sections: dict[str, dict] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original = driver.execute
+        driver.execute = self._execute
+        driver._wd_trace = self
+
+    def detach(self) -> None:
+        self.driver.execute = self._original
+        self.driver.__dict__.pop("_wd_trace", None)
+
+    @staticmethod
+    def _caller_stack() -> list[str]:
+        """Кадры кода проекта от внешнего к внутреннему (selenium и стандартная библиотека пропускаются)."""
+        stack = []
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(PACKAGE_DIR) and filename not in _SKIP_FILES:
+                stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _execute(self, command, params=None):
+        stack = self._caller_stack()
+        t0 = time.perf_counter()
+        try:
+            return self._original(command, params)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self._record(command, ms, stack)
+
+    def _record(self, command: str, ms: float, stack: list[str]) -> None:
+        section = getattr(self._local, "section", None)
+        method = stack[-1] if stack else "<external>"
+        key = ";".join([*stack, command]) if stack else command
+        with self._lock:
+            self.folded[key] += 1
+            self.folded_ms[key] += ms
+            if section is not None:
+                s = self.sections[section]
+                s["commands"] += 1
+                s["ms"] += ms
+                s["by_method"][method] += 1
+                s["by_command"][command] += 1
+            if self.keep_records:
+                self.records.append({"command": command, "ms": round(ms, 3), "method": method, "section": section})
+
+    @contextmanager
+    def section(self, label: str):
+        """Все команды текущего потока внутри блока относятся к секции label (например, firm_id)."""
+        with self._lock:
+            self.sections.setdefault(label, {"commands": 0, "ms": 0.0, "by_method": Counter(), "by_command": Counter()})
+            before = self.sections[label]["commands"]
+        prev = getattr(self._local, "section", None)
+        self._local.section = label
+        try:
+            yield
+        finally:
+            self._local.section = prev
+            METRICS.inc("webdriver_commands", n=self.sections[label]["commands"] - before)
+
+    def total(self) -> int:
+        return sum(self.folded.values())
+
+    def section_summary(self, label: str, top: int = 5) -> dict:
+        s = self.sections[label]
+        return {
+            "section": label,
+            "commands": s["commands"],
+            "ms": round(s["ms"], 1),
+            "top_methods": s["by_method"].most_common(top),
+            "top_commands": s["by_command"].most_common(top),
+        }
+
+    def folded_lines(self, weight: str = "count") -> list[str]:
+        """Строки в формате folded stacks ("a;b;c N"): weight="count" — число команд, "ms" — время."""
+        data = self.folded if weight == "count" else self.folded_ms
+        return [f"{stack} {round(v) if weight == 'ms' else v}" for stack, v in sorted(data.items())]
+
+    def write_folded(self, path: str | Path, weight: str = "count") -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(self.folded_lines(weight)) + "\n", encoding="utf-8")
+        return path
+
+    def write_summary(self, path: str | Path) -> Path:
+        """JSON: всего команд, топ стеков и сводка по каждой секции (фирме)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        summary = {
+            "commands": self.total(),
+            "top_stacks": self.folded.most_common(20),
+            "sections": [self.section_summary(label) for label in self.sections],
+        }
+        path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+
+def trace_section(driver, label: str):
+    """Секция трассировки, если у драйвера включена WebDriverTrace, иначе пустой контекст."""
+    trace = getattr(driver, "_wd_trace", None)
+    return trace.section(label) if trace is not None else nullcontext()
@@ -0,0 +1,220 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class LeaseLost(Exception):
+    """Аренду задачи перехватил другой воркер — результат этого воркера выбрасывается."""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Общая очередь запросов (query, city) для многих run_batch на разных ядрах/машинах — SQLite-файл
+    на общем диске. Задача выдаётся в аренду (lease) на lease_seconds; воркер продлевает аренду
+    heartbeat'ом, пока работает. Аренда, которую не продлили (воркер упал), истекает, и задачу берёт
+    другой воркер — до max_attempts попыток, дальше она помечается failed.
+    Журнал — обычный rollback (не WAL): WAL требует общей памяти и не работает на сетевых дисках.
+    """
+
+    def __init__(self, path: str | Path, lease_seconds: float = 600, max_attempts: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None — транзакции вручную (BEGIN IMMEDIATE берёт блокировку записи сразу)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                query TEXT NOT NULL,
+                city TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending / leased / done / failed
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                rows INTEGER,
+                error TEXT,
+                updated_at REAL,
+                UNIQUE (query, city)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, lease_expires);
+            """
+        )
+
+    def _tx(self):
+        return _Transaction(self._conn, self._lock)
+
+    def seed(self, queries: list[str], city: str) -> int:
+        """Добавить запросы (уже известные пары query+city пропускаются). Возвращает число новых задач."""
+        now = time.time()
+        with self._tx() as cur:
+            before = cur.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            cur.executemany(
+                "INSERT OR IGNORE INTO jobs (query, city, updated_at) VALUES (?, ?, ?)",
+                [(q, city, now) for q in queries],
+            )
+            return cur.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - before
+
+    def lease(self, worker_id: str) -> dict | None:
+        """Взять следующую свободную задачу (или с истёкшей арендой). None — всё роздано или сделано."""
+        now = time.time()
+        with self._tx() as cur:
+            # истёкшие аренды с исчерпанными попытками — в failed, чтобы не выдавать их бесконечно
+            cur.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ?"
+                " WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = cur.execute(
+                "SELECT id, query, city, attempts FROM jobs"
+                " WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)"
+                " ORDER BY attempts, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            cur.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0]),
+            )
+        return {"id": row[0], "query": row[1], "city": row[2], "attempts": row[3] + 1, "worker": worker_id}
+
+    def heartbeat(self, job: dict) -> bool:
+        """Продлить аренду. False — задача уже не наша (аренда истекла и её взял другой воркер)."""
+        now = time.time()
+        with self._tx() as cur:
+            cur.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, job["id"], job["worker"]),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job: dict, rows: int | None = None) -> bool:
+        """Отметить задачу готовой. False — аренда уже не наша (задачу перехватил другой воркер)."""
+        with self._tx() as cur:
+            cur.execute(
+                "UPDATE jobs SET status = 'done', rows = ?, error = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'leased'",
+                (rows, time.time(), job["id"], job["worker"]),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job: dict, error: str) -> None:
+        """Вернуть задачу в очередь на повтор (или failed, если попытки кончились)."""
+        with self._tx() as cur:
+            cur.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                " error = ?, lease_expires = NULL, updated_at = ? WHERE id = ? AND worker = ?",
+                (self.max_attempts, error[:500], time.time(), job["id"], job["worker"]),
+            )
+
+    def progress(self) -> dict:
+        """Счётчики по статусам, просроченные аренды и строки, собранные по готовым задачам."""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).fetchone()[0]
+            rows = self._conn.execute("SELECT COALESCE(SUM(rows), 0) FROM jobs WHERE status = 'done'").fetchone()[0]
+        total = sum(counts.values())
+        return {
+            "total": total,
+            **{s: counts.get(s, 0) for s in ("pending", "leased", "done", "failed")},
+            "expired_leases": expired,
+            "rows": rows,
+            "done_pct": round(100 * counts.get("done", 0) / total, 1) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT / ROLLBACK под локом соединения."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class LeaseKeeper:
+    """
+    Фоновый heartbeat аренды, пока обрабатывается задача:
+        with LeaseKeeper(queue, job):
+            run_one_query(...)
+    lost=True — аренду перехватил другой воркер (мы слишком долго не продлевали);
+    check() между шагами работы превращает это в LeaseLost.
+    Ошибка SQLite при продлении (например, "database is locked" на общем диске) — не потеря:
+    повтор через retry_interval, пока не истёк срок последнего продления; истёк — аренда считается потерянной.
+    """
+
+    def __init__(self, queue: WorkQueue, job: dict, interval: float | None = None,
+                 retry_interval: float | None = None):
+        self.queue = queue
+        self.job = job
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self.retry_interval = retry_interval or min(self.interval, 5.0)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job['id']}", daemon=True)
+
+    def _run(self):
+        renewed_at = time.monotonic()
+        wait = self.interval
+        while not self._stop.wait(wait):
+            try:
+                renewed = self.queue.heartbeat(self.job)
+            except sqlite3.Error as e:
+                if time.monotonic() - renewed_at >= self.queue.lease_seconds:
+                    renewed = False  # повторы кончились: аренда истекла, задачу мог взять другой воркер
+                else:
+                    print(f"WARN: продление аренды задачи {self.job['id']} не удалось ({e}), повтор через"
+                          f" {self.retry_interval:g} с")
+                    wait = self.retry_interval
+                    continue
+            if not renewed:
+                self.lost = True
+                print(f"WARN: аренда задачи {self.job['id']} ({self.job['query']}) потеряна")
+                return
+            renewed_at = time.monotonic()
+            wait = self.interval
+
+    def check(self) -> None:
+        if self.lost:
+            raise LeaseLost(f"аренда задачи {self.job['id']} ({self.job['query']}) потеряна")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
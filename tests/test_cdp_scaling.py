@@ -0,0 +1,56 @@
+"""
+Масштабирование CDP-бэкенда по числу вкладок K на локальном стенде с задержкой ответа:
+K=4 вкладки должны обогащать заметно быстрее одной. Нужны Chrome и websockets — без них тест пропускается.
+"""
+import asyncio
+import shutil
+import time
+
+import pytest
+
+from astana_2gis_leads.scripts.bench_cdp_scaling import enrich_with_tabs, write_synthetic_fixtures
+from astana_2gis_leads.standin_server import StandInServer
+from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+
+pytest.importorskip("websockets")
+if not any(shutil.which(name) for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")):
+    pytest.skip("нет Chrome", allow_module_level=True)
+
+from selenium.common.exceptions import WebDriverException  # noqa: E402
+
+from astana_2gis_leads.browser import make_chrome_driver  # noqa: E402
+from astana_2gis_leads.cdp_engine import browser_ws_url  # noqa: E402
+
+FIRMS = 16
+LATENCY = 0.3  # без задержки сети параллелизм вкладок не виден
+
+
+@pytest.fixture
+def driver():
+    try:
+        d = make_chrome_driver(headless=True)
+    except WebDriverException as e:
+        pytest.skip(f"Chrome не запускается: {e.msg}")
+    yield d
+    d.quit()
+
+
+def test_four_tabs_beat_one(tmp_path, driver):
+    firm_ids = write_synthetic_fixtures(tmp_path / "fixtures", FIRMS)
+    with StandInServer(tmp_path / "fixtures", latency=LATENCY) as stand:
+        collector = TwoGisLeadCollector(["bench"], tmp_path / "cache", site_root=stand.base_url)
+        ws_url = browser_ws_url(driver)
+        elapsed = {}
+        try:
+            for tabs in (1, 4):
+                t0 = time.perf_counter()
+                results = asyncio.run(enrich_with_tabs(collector, ws_url, tabs, firm_ids))
+                elapsed[tabs] = time.perf_counter() - t0
+                assert [r["primary_contact"] for r in results] == [f"https://wa.me/7701{i:07d}" for i in range(FIRMS)]
+                assert [r["website"] for r in results] == [f"https://shop{i}.kz" for i in range(FIRMS)]
+        finally:
+            collector.cache.close()
+
+    # одна вкладка ждёт задержку стенда FIRMS раз подряд, четыре — вчетверо реже
+    assert elapsed[1] >= FIRMS * LATENCY
+    assert elapsed[1] / elapsed[4] >= 2.0, elapsed
@@ -0,0 +1,115 @@
+"""
+Обход сайтов за контактами (contact_crawler.ContactCrawler) на локальных сайтах бенчмарка, без интернета:
+варианты сайтов — см. scripts/bench_contact_crawler (KINDS), ожидаемое — expected_contacts.
+"""
+import pytest
+
+from astana_2gis_leads.contact_crawler import ContactCrawler, CrawlCache, extract_contacts, normalize_kz_phone
+from astana_2gis_leads.scripts.bench_contact_crawler import KINDS, LocalShops, expected_contacts, shop_urls
+
+SITES = 2 * KINDS  # каждый вариант — дважды
+
+
+@pytest.fixture
+def shops():
+    with LocalShops(latency=0.01) as s:
+        yield s
+
+
+@pytest.fixture
+def crawled(tmp_path, shops):
+    """Первый прогон по всем сайтам: (urls, результаты, путь к кэшу)."""
+    urls = shop_urls(SITES, shops.port)
+    cache_path = tmp_path / "site_contacts.sqlite"
+    crawler = ContactCrawler(max_pages=3, concurrency=16, per_domain=2, timeout=(1.0, 5.0), cache=CrawlCache(cache_path))
+    try:
+        results = crawler.crawl_many(urls)
+    finally:
+        crawler.close()
+    return urls, results, cache_path
+
+
+def result_of(crawled, kind: int) -> dict:
+    urls, results, _ = crawled
+    return results[urls[kind]]
+
+
+def test_contacts_found_as_expected(crawled):
+    urls, results, _ = crawled
+    assert {url: (results[url]["emails"], results[url]["phones"]) for url in urls} == {
+        url: expected_contacts(i) for i, url in enumerate(urls)
+    }
+
+
+def test_robots_disallowed_page_is_not_requested(crawled, shops):
+    # вариант 3: контакты только на /contacts, а robots.txt его запрещает
+    assert result_of(crawled, 3)["emails"] == []
+    assert result_of(crawled, 3)["error"] is None
+    assert shops.forbidden_hits == 0
+
+
+def test_redirect_into_disallowed_path_is_not_followed(crawled, shops):
+    # вариант 6: /contacts -> 302 /private/contacts, /private запрещён robots.txt
+    assert (result_of(crawled, 6)["emails"], result_of(crawled, 6)["phones"]) == ([], [])
+    assert shops.forbidden_hits == 0
+
+
+def test_redirect_to_foreign_host_is_an_error(crawled, shops):
+    # вариант 5: главная уводит на чужой хост с контактами «платформы»
+    result = result_of(crawled, 5)
+    assert result["error"] == "редирект на localhost"
+    assert (result["emails"], result["phones"], result["pages"]) == ([], [], 0)
+    assert shops.foreign_hits == 0
+
+
+def test_guessed_paths_tried_when_home_is_4xx(crawled):
+    # вариант 7: главная — 404, контакты на /contacts
+    result = result_of(crawled, 7)
+    assert result["emails"] == ["info7@site7.kz"]
+    assert result["error"] is None
+
+
+def test_per_domain_limit(crawled, shops):
+    assert max(shops.max_active.values()) <= 2
+
+
+def test_errors_are_not_cached(crawled, shops):
+    urls, results, cache_path = crawled
+    cache = CrawlCache(cache_path)
+    try:
+        cached = {url: cache.get(results[url]["domain"]) for url in urls}
+    finally:
+        cache.close()
+    assert {url for url, hit in cached.items() if hit is None} == {
+        url for url, r in results.items() if r["error"] is not None
+    } == {url for i, url in enumerate(urls) if i % KINDS == 5}
+
+    # повторный прогон: сайты без ошибок — из кэша без запросов, сайты с ошибкой обходятся заново
+    before = sum(shops.requests.values())
+    crawler = ContactCrawler(timeout=(1.0, 5.0), cache=CrawlCache(cache_path))
+    try:
+        again = crawler.crawl_many(urls)
+    finally:
+        crawler.close()
+    assert again == results
+    assert sum(shops.requests.values()) - before == 2 * 2  # robots.txt + главная у двух сайтов варианта 5
+
+
+def test_platform_sites_are_skipped(tmp_path):
+    crawler = ContactCrawler(cache=CrawlCache(tmp_path / "site_contacts.sqlite"))
+    try:
+        results = crawler.crawl_many(["https://www.instagram.com/romashka.kz/", "https://kaspi.kz/shop/c/romashka/"])
+    finally:
+        crawler.close()
+    assert [(r["domain"], r["pages"], r["error"]) for r in results.values()] == [
+        ("instagram.com", 0, "платформа, не сайт фирмы"),
+        ("kaspi.kz", 0, "платформа, не сайт фирмы"),
+    ]
+
+
+def test_extract_contacts():
+    page = ('<a href="mailto:Info@Shop.kz?subject=x">почта</a> <a href="tel:8 (7172) 12-34-56">тел</a>'
+            '<img src="logo@2x.png"> Звоните +7 701 123 45 67 или +7 495 123-45-67, sales@shop.kz'
+            '<script>var a = "js@1.2.3.js";</script>')
+    assert extract_contacts(page) == (["info@shop.kz", "sales@shop.kz"], ["+77172123456", "+77011234567"])
+    assert normalize_kz_phone("+7 (495) 123-45-67") is None
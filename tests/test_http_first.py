@@ -0,0 +1,90 @@
+"""
+HTTP-first обогащение (http_first) на записанных карточках фирм через standin_server, без Chrome:
+контакт из статики — браузер не нужен; контакта нет — решает Selenium (здесь PageDriver), сайт из статики не теряется.
+"""
+import re
+from pathlib import Path
+
+import pytest
+import requests
+
+from astana_2gis_leads.metrics import METRICS
+from astana_2gis_leads.standin_server import StandInServer
+from astana_2gis_leads.two_gis_lead_collector import LINKS_SNAPSHOT_JS, TwoGisLeadCollector
+
+FIXTURES = Path(__file__).parent / "fixtures" / "standin"
+A_HREF_RE = re.compile(r'<a\b[^>]*\bhref="(https?://[^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+
+
+class PageDriver:
+    """
+    Минимум драйвера для _fetch_primary_contact_selenium: вкладки, get и снимок ссылок карточки.
+    Снимок — только то, что видно в DOM (<a href>), как у LINKS_SNAPSHOT_JS; initial-state JSON он не видит.
+    """
+
+    session_id = "page-driver"
+
+    def __init__(self):
+        self.window_handles = ["list"]
+        self.current_window_handle = "list"
+        self.current_url = "about:blank"
+        self.visited: list[str] = []
+        self._page = ""
+        self.switch_to = self
+
+    def window(self, handle: str) -> None:
+        assert handle in self.window_handles
+        self.current_window_handle = handle
+
+    def get(self, url: str) -> None:
+        self.visited.append(url)
+        self.current_url = url
+        self._page = requests.get(url, timeout=5).text
+
+    def execute_script(self, script: str, *args):
+        if script == LINKS_SNAPSHOT_JS:
+            links = A_HREF_RE.findall(self._page)
+            return {"hrefs": [href for href, _text in links],
+                    "labels": [re.sub(r"\s+", " ", text).strip().lower() for _href, text in links]}
+        if script.startswith("window.open"):
+            self.window_handles.append(f"tab{len(self.window_handles)}")
+            return None
+        return 1
+
+
+@pytest.fixture
+def collector(tmp_path):
+    with StandInServer(FIXTURES) as stand:
+        c = TwoGisLeadCollector(["цветы"], tmp_path, site_root=stand.base_url, http_first=True)
+        yield c
+        c.cache.close()
+
+
+def test_http_hit_skips_browser(collector):
+    # драйвер не нужен вовсе: контакт есть в статике карточки
+    result = collector.enrich_firm(None, "70000001000000001")
+
+    assert result == {
+        "primary_contact": "https://wa.me/77011234567",
+        "website": "https://romashka.kz/",
+        "primary_type": "wa",
+        "enrich_status": "ok",
+    }
+    assert collector.cache.get("70000001000000001")["primary_contact"] == "https://wa.me/77011234567"
+
+
+def test_http_miss_falls_through_to_selenium_keeping_website(collector):
+    selenium_key = ("enrich_source", (("source", "selenium"),))
+    before = METRICS.counters.get(selenium_key, 0)
+    driver = PageDriver()
+
+    # в статике контакта нет, а сайт есть только в initial-state JSON: в DOM браузера его не видно
+    result = collector.enrich_firm(driver, "70000001000000003")
+
+    assert driver.visited == [f"{collector.base_url}/firm/70000001000000003"]
+    assert METRICS.counters[selenium_key] == before + 1
+    assert result["primary_contact"] == ""
+    assert result["enrich_status"] == "no_contact"
+    assert result["website"] == "https://zdorovie.kz/"  # Selenium ничего не нашёл — сайт HTTP-пути остаётся
+    assert collector.cache.get("70000001000000003")["website"] == "https://zdorovie.kz/"
+    assert driver.current_window_handle == "list"  # вернулись на вкладку выдачи
@@ -0,0 +1,135 @@
+"""
+Разбор ответов каталога 2GIS (network_capture) на записанных фикстурах, без Chrome:
+стенд standin_server отдаёт tests/fixtures/standin, а ReplayDriver подменяет браузер —
+выполняет fetch, который стенд вставляет в страницу выдачи, и отдаёт его как события performance-лога.
+"""
+import json
+import re
+from pathlib import Path
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from astana_2gis_leads.network_capture import NetworkCapture, card_from_item, firm_id_of, items_of, total_of
+from astana_2gis_leads.standin_server import StandInServer
+from astana_2gis_leads.two_gis_lead_collector import TwoGisLeadCollector
+
+FIXTURES = Path(__file__).parent / "fixtures" / "standin"
+REPLAY_FETCH_RE = re.compile(r'fetch\("([^"]+)"\)')
+
+
+class ReplayDriver:
+    """Минимум драйвера для NetworkCapture: get, get_log("performance") и CDP Network.getResponseBody."""
+
+    def __init__(self):
+        self._log: list[dict] = []
+        self._bodies: dict[str, str] = {}
+
+    def get(self, url: str) -> None:
+        page = requests.get(url, timeout=5)
+        for path in REPLAY_FETCH_RE.findall(page.text):
+            self.xhr(urljoin(url, path))
+
+    def xhr(self, url: str) -> None:
+        response = requests.get(url, timeout=5)
+        request_id = str(len(self._bodies) + 1)
+        self._bodies[request_id] = response.text
+        self._event("Network.responseReceived", requestId=request_id,
+                    response={"url": url, "status": response.status_code})
+        self._event("Network.loadingFinished", requestId=request_id)
+
+    def _event(self, method: str, **params) -> None:
+        self._log.append({"message": json.dumps({"message": {"method": method, "params": params}})})
+
+    def get_log(self, kind: str) -> list[dict]:
+        assert kind == "performance"
+        entries, self._log = self._log, []
+        return entries
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        assert cmd == "Network.getResponseBody"
+        return {"body": self._bodies[params["requestId"]], "base64Encoded": False}
+
+
+@pytest.fixture
+def stand():
+    with StandInServer(FIXTURES) as server:
+        yield server
+
+
+@pytest.fixture
+def collector(stand, tmp_path):
+    c = TwoGisLeadCollector(["цветы"], tmp_path, site_root=stand.base_url)
+    yield c
+    c.cache.close()
+
+
+def test_items_and_cards_from_recorded_payload():
+    payload = json.loads((FIXTURES / "api" / "page1.json").read_text(encoding="utf-8"))
+
+    items = items_of(payload)
+    assert [firm_id_of(it["id"]) for it in items] == ["70000001000000001", "70000001000000002", "70000001000000003"]
+    assert total_of(payload) == 3
+
+    card = card_from_item(items[0], "https://2gis.kz/astana")
+    assert card["firm_url"] == "https://2gis.kz/astana/firm/70000001000000001"
+    assert card["name"] == "Ромашка, цветочный магазин"
+    assert card["address"] == "проспект Мира, 1"
+    # телефон — не ссылка, в contact_hrefs не попадает
+    assert card["contact_hrefs"] == [
+        "https://api.whatsapp.com/send?phone=77011234567&text=Здравствуйте",
+        "https://link.2gis.com/3.2/0a1b2c3d/aHR0cHM6Ly9yb21hc2hrYS5rei8=",
+    ]
+    # без address_name — полный адрес, без url — value
+    assert card_from_item(items[2], "")["address"] == "Астана, улица Кенесары, 5"
+    assert card_from_item(items[1], "")["contact_hrefs"][1] == "tg://resolve?domain=zerno_coffee"
+
+
+def test_collect_cards_from_network_via_standin(stand, collector):
+    driver = ReplayDriver()
+    capture = NetworkCapture(driver)
+    driver.get(f"{collector.base_url}/search/цветы")
+
+    cards = collector.collect_cards_from_network(capture, timeout=1)
+
+    assert [(c["firm_id"], c["name"], c["primary_contact"], c["website"]) for c in cards] == [
+        # WA без &text=, сайт — декодированная цель редиректа link.2gis.com (переписанного на стенд)
+        ("70000001000000001", "Ромашка, цветочный магазин",
+         "https://api.whatsapp.com/send?phone=77011234567", "https://romashka.kz/"),
+        # TG важнее IG; диплинк нормализуется в t.me
+        ("70000001000000002", "Кофейня Зерно", "https://t.me/zerno_coffee", None),
+        # почта — не контакт-ссылка: только сайт
+        ("70000001000000003", "Аптека Здоровье", "", "https://zdorovie.kz/"),
+    ]
+    assert cards[0]["firm_url"] == f"{stand.base_url}/astana/firm/70000001000000001"
+    assert cards[1]["address"] == "улица Абая, 10"
+
+
+def test_total_stops_listing_after_last_firm(collector):
+    driver = ReplayDriver()
+    capture = NetworkCapture(driver)
+    driver.get(f"{collector.base_url}/search/цветы")
+
+    assert not capture.listing_complete(0)  # total ещё не пришёл
+    cards = collector.collect_cards_from_network(capture, timeout=1)
+    assert capture.last_total == 3
+    assert capture.listing_complete(len(cards))  # страница 1 — вся выдача, листать дальше не нужно
+    assert not capture.listing_complete(len(cards) - 1)
+
+    capture.reset()
+    assert capture.last_total is None
+
+
+def test_missing_catalog_response_falls_back_to_dom(stand, collector):
+    # записанного ответа для страницы 2 нет: стенд отвечает 404, страницы выдачи тоже нет
+    assert requests.get(f"{stand.base_url}/catalog.api.2gis.com/3.0/items?page=2", timeout=5).status_code == 404
+    assert requests.get(f"{collector.base_url}/search/цветы/page/2", timeout=5).status_code == 404
+
+    driver = ReplayDriver()
+    capture = NetworkCapture(driver)
+    driver.xhr(f"{stand.base_url}/catalog.api.2gis.com/3.0/items?page=2")
+
+    # ответ не 200 — не ответ каталога: None, и run_one_query собирает карточки из DOM
+    assert collector.collect_cards_from_network(capture, timeout=0.2) is None
+    assert capture.last_total is None
@@ -0,0 +1,45 @@
+"""Дедуп карточек по адресу (postprocess): потоковый dedupe_cards и векторный dedupe_by_address."""
+import pandas as pd
+
+from astana_2gis_leads.postprocess import dedupe_by_address, dedupe_cards
+
+
+def card(firm_id: str, address: str | None, primary_contact: str = "", website: str | None = None) -> dict:
+    # форма карточки из collect_cards_from_network: нет сайта — website=None
+    return {"firm_id": firm_id, "name": f"Фирма {firm_id}", "address": address,
+            "primary_contact": primary_contact, "website": website}
+
+
+def test_card_without_website_keeps_none():
+    cards = [
+        card("1", "улица Абая, 10", "https://t.me/zerno_coffee"),  # контакт есть, сайта нет
+        card("2", "проспект Мира, 1", "", "https://romashka.kz/"),
+    ]
+
+    rows = dedupe_cards(cards, set())
+
+    assert [r["firm_id"] for r in rows] == ["1", "2"]
+    assert rows[0]["website"] is None  # не NaN: дальше он идёт в кэш, журнал и потоки
+    assert rows[0] == cards[0]
+
+
+def test_dedupe_within_page_and_across_pages():
+    seen: set[str] = set()
+    page1 = [card("1", "Проспект Мира, 1"), card("2", " проспект\xa0мира,  1 "), card("3", ""), card("4", None)]
+    page2 = [card("5", "ПРОСПЕКТ МИРА, 1"), card("6", "улица Кенесары, 5")]
+
+    assert [r["firm_id"] for r in dedupe_cards(page1, seen)] == ["1"]
+    assert [r["firm_id"] for r in dedupe_cards(page2, seen)] == ["6"]
+    assert seen == {"проспект мира, 1", "улица кенесары, 5"}
+
+
+def test_same_rows_as_vectorized_dedupe():
+    cards = [card("1", "улица Абая, 10"), card("2", "Улица  Абая, 10"), card("3", "улица Кенесары, 5"), card("4", "")]
+    seen_rows: set[str] = {"улица кенесары, 5"}
+    seen_frame = set(seen_rows)
+
+    rows = dedupe_cards(cards, seen_rows)
+    frame = dedupe_by_address(pd.DataFrame(cards), seen_frame)
+
+    assert [r["firm_id"] for r in rows] == frame["firm_id"].tolist() == ["1"]
+    assert seen_rows == seen_frame
@@ -0,0 +1,103 @@
+"""
+Проверка сайтов (site_check.SiteChecker) на локальном сервере бенчмарка, без обращений в интернет:
+статусы, final_url по каждому URL, лимит per_host и повторный проход из дискового кэша.
+"""
+import pytest
+
+from astana_2gis_leads.scripts.bench_site_check import SHARED_HOST, LocalSites, closed_port
+from astana_2gis_leads.site_check import SiteCheckCache, SiteChecker
+
+
+@pytest.fixture
+def sites():
+    with LocalSites(latency=0.02) as s:
+        yield s
+
+
+def checker_for(tmp_path, **kwargs) -> SiteChecker:
+    return SiteChecker(timeout=(1.0, 5.0), cache=SiteCheckCache(tmp_path / "site_checks.sqlite"), **kwargs)
+
+
+def test_statuses(tmp_path, sites):
+    port, dead = sites.port, closed_port()
+    expected = {
+        f"http://127.0.1.1:{port}/ok": ("ok", f"http://127.0.1.1:{port}/ok", 0),
+        f"http://127.0.1.2:{port}/moved": ("ok", f"http://127.0.1.2:{port}/ok", 1),  # редирект на тот же хост
+        f"http://127.0.1.3:{port}/shared": ("redirected", f"http://{SHARED_HOST}:{port}/ok", 1),
+        f"http://127.0.1.4:{port}/parked": ("parked", f"http://127.0.1.4:{port}/parked", 0),
+        f"http://127.0.1.5:{port}/gone": ("http_error", f"http://127.0.1.5:{port}/gone", 0),
+        f"http://127.0.1.6:{dead}/": ("dead", None, 0),
+    }
+    checker = checker_for(tmp_path)
+    try:
+        results = checker.check_many(list(expected) + [None, ""])
+    finally:
+        checker.close()
+
+    assert {url: (r["site_status"], r["final_url"], r["redirects"]) for url, r in results.items()} == expected
+    assert results[f"http://127.0.1.5:{port}/gone"]["http_status"] == 404
+    assert results[f"http://127.0.1.6:{dead}/"]["error"]
+
+
+def test_pages_of_one_host_are_checked_separately(tmp_path, sites):
+    # общий хост (как kaspi.kz/shop/a и kaspi.kz/shop/b): у каждой страницы свои статус и final_url
+    port = sites.port
+    a, b, c = (f"http://127.0.2.1:{port}{path}" for path in ("/moved", "/gone", "/ok"))
+    checker = checker_for(tmp_path)
+    try:
+        results = checker.check_many([a, b, c, a])
+        rows = [checker.annotate({"website": url}) for url in (a, b, c)]
+    finally:
+        checker.close()
+
+    assert [(r["website_status"], r["website_final"]) for r in rows] == [
+        ("ok", c), ("http_error", b), ("ok", c),
+    ]
+    assert set(results) == {a, b, c}
+    assert sites.requests == 4  # /moved -> /ok, /gone, /ok; дубль a не запрашивается
+
+
+def test_dead_domain_is_not_requested_again(tmp_path, sites):
+    dead = closed_port()
+    urls = [f"http://127.0.3.1:{dead}/{page}" for page in ("a", "b", "c")]
+    checker = checker_for(tmp_path)
+    try:
+        results = checker.check_many(urls)
+    finally:
+        checker.close()
+
+    assert [results[url]["site_status"] for url in urls] == ["dead"] * 3
+    assert [results[url]["url"] for url in urls] == urls
+    assert sum(r["latency_ms"] is not None for r in results.values()) == 1  # запрос был только один
+
+
+def test_per_host_limit(tmp_path, sites):
+    # 40 сайтов, все редиректят на один общий хост: на нём не больше per_host запросов одновременно
+    urls = [f"http://127.0.4.{i}:{sites.port}/shared" for i in range(1, 41)]
+    checker = checker_for(tmp_path, workers=32, per_host=2)
+    try:
+        results = checker.check_many(urls)
+    finally:
+        checker.close()
+
+    assert {r["site_status"] for r in results.values()} == {"redirected"}
+    assert sites.max_active[SHARED_HOST] == 2
+    assert max(sites.max_active.values()) <= 2
+
+
+def test_second_pass_from_disk_cache(tmp_path, sites):
+    port = sites.port
+    urls = [f"http://127.0.5.{i}:{port}{path}" for i, path in enumerate(("/ok", "/moved", "/parked", "/gone"), 1)]
+    urls.append(f"http://127.0.5.9:{closed_port()}/")
+
+    checker = checker_for(tmp_path)
+    first = checker.check_many(urls)
+    checker.close()
+    served = sites.requests
+
+    checker = checker_for(tmp_path)  # новый проверщик: в памяти пусто, только дисковый кэш
+    again = checker.check_many(urls)
+    checker.close()
+
+    assert again == first
+    assert sites.requests == served  # на сервер второй проход не ходил
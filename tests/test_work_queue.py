@@ -0,0 +1,73 @@
+"""Аренды общей очереди (work_queue): heartbeat LeaseKeeper, перехват аренды и ошибки SQLite при продлении."""
+import sqlite3
+import time
+
+import pytest
+
+from astana_2gis_leads.work_queue import LeaseKeeper, LeaseLost, WorkQueue
+
+
+class FlakyQueue(WorkQueue):
+    """Очередь, у которой первые failures продлений падают, как "database is locked" на общем диске."""
+
+    def __init__(self, *args, failures: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.heartbeats = 0
+
+    def heartbeat(self, job: dict) -> bool:
+        self.heartbeats += 1
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().heartbeat(job)
+
+
+def leased(queue: WorkQueue, worker: str = "w1") -> dict:
+    queue.seed(["цветы"], "astana")
+    return queue.lease(worker)
+
+
+def wait_until(condition, timeout: float = 3.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_heartbeat_errors_are_retried(tmp_path):
+    queue = FlakyQueue(tmp_path / "queue.sqlite", lease_seconds=5, failures=2)
+    job = leased(queue)
+
+    with LeaseKeeper(queue, job, interval=0.05, retry_interval=0.01) as keeper:
+        assert wait_until(lambda: queue.heartbeats >= 4)
+        keeper.check()  # две ошибки SQLite — не потеря аренды
+
+    assert not keeper.lost
+    assert queue.complete(job, rows=1)
+
+
+def test_lease_lost_when_errors_outlast_lease(tmp_path):
+    queue = FlakyQueue(tmp_path / "queue.sqlite", lease_seconds=0.2, failures=10**6)
+    job = leased(queue)
+
+    with LeaseKeeper(queue, job, interval=0.05, retry_interval=0.01) as keeper:
+        assert wait_until(lambda: keeper.lost)
+        with pytest.raises(LeaseLost):
+            keeper.check()
+
+
+def test_lease_lost_when_taken_over(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=0.1)
+    job = leased(queue)
+
+    time.sleep(0.15)  # аренда истекла — задачу берёт другой воркер
+    other = queue.lease("w2")
+    assert other["id"] == job["id"]
+
+    with LeaseKeeper(queue, job, interval=0.02) as keeper:
+        assert wait_until(lambda: keeper.lost)
+    assert not queue.complete(job)  # результат потерявшего аренду не засчитывается
+    assert queue.complete(other)